@@ -10,5 +10,29 @@ CREATE TABLE `striimfieldproject.Daniel.striim_orchestration` (
     started_datetime TIMESTAMP,
     finished_datetime TIMESTAMP,
     notes STRING,
-    iscurrentrow BOOL
+    iscurrentrow BOOL,
+    est_rows INTEGER,
+    est_bytes INTEGER,
+    priority INTEGER,
+    cluster STRING,
+    leaseowner STRING,
+    leaseexpires TIMESTAMP,
+    upload_seconds FLOAT64,
+    deploy_seconds FLOAT64,
+    start_seconds FLOAT64,
+    load_seconds FLOAT64,
+    undeploy_seconds FLOAT64,
+    drop_seconds FLOAT64,
+    nsreset_seconds FLOAT64
+);
+
+-- Throughput samples of running chunks (THROUGHPUT_TRACKING); created by the first append if it does not exist
+CREATE TABLE `striimfieldproject.Daniel.striim_orchestration_throughput` (
+    uniquerunid INTEGER,
+    chunkid INTEGER,
+    sampled TIMESTAMP,
+    rate FLOAT64,
+    source_rate FLOAT64,
+    cpu_rate FLOAT64,
+    latest_activity STRING
 );
@@ -0,0 +1,657 @@
+"""
+Alternative orchestration engine, selected with config.ORCHESTRATOR_ENGINE = 'async'.
+
+Every chunk's lifecycle (create -> deploy -> start -> monitor -> undeploy -> drop -> reset namespace) runs as its
+own asyncio task on a single aiohttp session, so many lifecycles can wait on Striim at the same time instead of one
+HTTP round-trip at a time. A shared count enforces the running app target (CONCURRENT_APPS_MAX, or the adaptive
+controller's target) and a token bucket paces deploys (DEPLOY_RATE_PER_MINUTE / DEPLOY_BURST_MAX). Up to WARM_POOL_DEPTH
+more chunks are created and deployed ahead of time, so they only need a START when a running slot frees up. A single monitor task runs 'mon;' every APP_MONITOR_INTERVAL_SECONDS
+and wakes the chunk tasks whose apps have finished. It drives one Striim cluster (the first of STRIIM_CLUSTERS, if set).
+
+Rows move through the same statuses as the sync engine (NEW -> [DEPLOYED ->] RUNNING -> COMPLETED / FAILED) and are saved
+through data.update_record, so either engine can pick up a run the other one started.
+"""
+import asyncio
+import datetime
+import json
+import time
+
+# pip install aiohttp (only needed when ORCHESTRATOR_ENGINE = 'async')
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+import config
+import metrics
+from data import update_record, flush_data, split_record, add_phase_seconds
+from monitor import map_mon_json_response, split_mon_responses, merge_mon_responses, isILApp
+from ratelimit import TokenBucket
+from cluster import load_clusters
+from scheduler import schedule_order
+from planner import split_query
+from straggler import StragglerDetector, seconds_between
+from throughput import ThroughputTracker
+from packing import build_packs, source_name, follow, finished_sources
+from tqltemplate import get_template, audit_tql
+
+
+class StriimRequestError(Exception):
+    pass
+
+
+class AsyncStriimClient:
+    """
+    asyncio counterpart of striimclient.StriimClient: one pooled keep-alive aiohttp session, lazy authentication
+    and a bounded number of re-authentications on 'tkn' responses.
+    """
+
+    def __init__(self, url_prefix, node, username, password, api_token=""):
+        self.base_url = url_prefix + node
+        self.username = username
+        self.password = password
+        self.api_token = api_token
+        self.session = None
+        self.token = None
+        self.token_lock = asyncio.Lock()
+
+    async def open(self):
+        connector = aiohttp.TCPConnector(limit=config.STRIIM_HTTP_POOL_SIZE, keepalive_timeout=60)
+        self.session = aiohttp.ClientSession(connector=connector)
+
+    async def close(self):
+        if self.session is not None:
+            await self.session.close()
+
+    def timeout(self, read_timeout=None):
+        return aiohttp.ClientTimeout(sock_connect=config.STRIIM_CONNECT_TIMEOUT_SECONDS,
+                                     sock_read=read_timeout if read_timeout is not None else config.STRIIM_READ_TIMEOUT_SECONDS)
+
+    async def authenticate(self, stale_token=None):
+        async with self.token_lock:
+            if self.token is not None and stale_token is not None and self.token != stale_token:
+                return self.token
+
+            if self.api_token != "":
+                self.token = self.api_token
+            else:
+                start = time.monotonic()
+                try:
+                    async with self.session.post(self.base_url + '/security/authenticate',
+                                                 data={'username': self.username, 'password': self.password},
+                                                 timeout=self.timeout()) as resp:
+                        text = await resp.text()
+                finally:
+                    metrics.REQUEST_SECONDS.observe(time.monotonic() - start, verb='AUTHENTICATE')
+                try:
+                    self.token = json.loads(text)['token']
+                except (ValueError, KeyError, TypeError):
+                    raise StriimRequestError('Unable to authenticate to ' + self.base_url + ': ' + text)
+            return self.token
+
+    async def tungsten(self, data, timeout=None):
+        for attempt in range(config.STRIIM_TKN_MAX_RETRIES + 1):
+            token = self.token if self.token is not None else await self.authenticate()
+            headers = {'authorization': 'STRIIM-TOKEN ' + token, 'content-type': 'text/plain'}
+
+            start = time.monotonic()
+            try:
+                async with self.session.post(self.base_url + '/api/v2/tungsten', headers=headers, data=data,
+                                             timeout=self.timeout(timeout)) as resp:
+                    text = await resp.text()
+                    status = resp.status
+            finally:
+                metrics.observe_request(data, time.monotonic() - start)
+
+            if 'reason' in text and 'tkn' in text:
+                await asyncio.sleep(1)
+                await self.authenticate(stale_token=token)
+                continue
+
+            try:
+                return json.loads(text)
+            except ValueError:
+                raise StriimRequestError(f"HTTP {status}: {text[:200]}")
+
+        raise StriimRequestError(f"Token rejected after {config.STRIIM_TKN_MAX_RETRIES + 1} attempts")
+
+
+class AsyncOrchestrator:
+    def __init__(self, query_results, client, cluster):
+        self.query_results = query_results
+        self.client = client
+        self.cluster = cluster
+        self.controller = cluster.controller
+        self.capacity = asyncio.Condition()  # guards the two counts below; notified when either drops or the target moves
+        self.running = 0                     # chunks holding a running slot (at most controller.target)
+        self.staged = 0                      # chunks deployed or running (at most controller.target + WARM_POOL_DEPTH)
+        self.deploy_bucket = TokenBucket(config.DEPLOY_RATE_PER_MINUTE, config.DEPLOY_BURST_MAX)
+        self.state_lock = asyncio.Lock()
+        self.namespaces_in_use = set()
+        self.waiters = {}  # namespace -> Future resolved with the final app status (or SPLIT for a straggler)
+        self.waiting_rows = {}  # namespace -> row whose app is being waited on
+        self.packs = {}  # namespace -> running rows of a packed app (PACK_CHUNKS), each with the name of its source
+        self.throughput = ThroughputTracker()
+        self.stragglers = StragglerDetector(self.throughput)
+        self.load_clock = {}  # row id -> time.monotonic() when its app was started, for load_seconds
+        self.tasks = set()
+        self.stopping = False
+
+        self.template = get_template()
+
+    # ---- Striim helpers ----
+
+    async def run_command(self, strCmd, returnResultOnly=False, timeout=None):
+        data = strCmd + ';' if not strCmd.endswith(';') else strCmd
+        try:
+            result = await self.client.tungsten(data, timeout)
+        except Exception as e:
+            print('Error at run_command:', strCmd, e)
+            return False, 'Error occurred: ' + str(e)
+
+        if returnResultOnly:
+            return result
+
+        failureMessage = ""
+        executionStatus = "OK"
+        for row in result:
+            if executionStatus != "Failure":
+                executionStatus = row.get('executionStatus')
+            if executionStatus == "Failure":
+                failureMessage += (row.get('failureMessage') or '') + ";"
+
+        return (executionStatus != "Failure"), failureMessage
+
+    async def check_status(self, objectName, isSuccessful, failuremessage, expectedStatus, invertExpectation):
+        """
+        Async version of main.check_component_status: after a 503 / aborted connection, ask STATUS to find out
+        whether the command actually went through.
+        """
+        for _ in range(5):
+            if isSuccessful or not failuremessage or not ("503" in failuremessage or "Connection aborted" in failuremessage):
+                break
+
+            metrics.STATUS_CHECKS.inc(engine='async')
+            result = str(await self.run_command("STATUS " + objectName + ";", True))
+
+            if invertExpectation:
+                if expectedStatus not in result:
+                    isSuccessful, failuremessage = True, None
+            elif expectedStatus in result:
+                isSuccessful, failuremessage = True, None
+
+            if not ("503" in result or "Connection aborted" in result):
+                break
+
+        return isSuccessful, failuremessage
+
+    async def reset_namespace(self, namespace, createNS=False):
+        isSuccessful, failuremessage = await self.run_command('drop namespace ' + namespace + ' CASCADE;')
+        isSuccessful, failuremessage = await self.check_status(namespace, isSuccessful, failuremessage, "No objects", False)
+        if createNS:
+            isSuccessful, failuremessage = await self.run_command('create namespace ' + namespace + ';')
+        return isSuccessful, failuremessage
+
+    async def teardown(self, qry, rows=()):
+        # Pooled namespaces are kept for the next chunk and dropped at the end of the run
+        stages = ['UNDEPLOY', 'DROP'] if config.NAMESPACE_POOL else ['UNDEPLOY', 'DROP', 'NAMESPACE']
+        for stage in stages:
+            isSuccessful = False
+            stageStart = time.monotonic()
+            for attempt in range(config.TEARDOWN_MAX_ATTEMPTS):
+                if stage == 'UNDEPLOY':
+                    isSuccessful, failuremessage = await self.run_command("UNDEPLOY APPLICATION " + qry.appname + ";")
+                    isSuccessful, failuremessage = await self.check_status(qry.appname, isSuccessful, failuremessage, "CREATED", False)
+                elif stage == 'DROP':
+                    isSuccessful, failuremessage = await self.run_command("DROP APPLICATION " + qry.appname + " CASCADE;")
+                    isSuccessful, failuremessage = await self.check_status(qry.appname, isSuccessful, failuremessage, "Cannot find", False)
+                else:
+                    isSuccessful, failuremessage = await self.reset_namespace(qry.namespace)
+
+                if isSuccessful:
+                    break
+                if attempt < config.TEARDOWN_MAX_ATTEMPTS - 1:
+                    await asyncio.sleep(config.TEARDOWN_RETRY_DELAY_SECONDS)
+
+            # The rows of the app (rows, default just qry) share its teardown time
+            add_phase_seconds(list(rows) or [qry], {'UNDEPLOY': 'undeploy', 'DROP': 'drop', 'NAMESPACE': 'nsreset'}[stage],
+                              time.monotonic() - stageStart)
+
+            if not isSuccessful:
+                qry.notes += ". FAILED " + stage + (": " + failuremessage if failuremessage else "")
+                qry.status = "FAILED"
+                return
+
+    # ---- State helpers ----
+
+    async def save(self, qry):
+        # data.py backends are blocking and not thread safe, so writes are serialized and kept off the event loop
+        async with self.state_lock:
+            await asyncio.to_thread(update_record, qry)
+
+    def lease_namespace(self):
+        namespaceCount = 1
+        while self.cluster.namespace(namespaceCount) in self.namespaces_in_use:
+            namespaceCount = namespaceCount + 1
+        namespace = self.cluster.namespace(namespaceCount)
+        self.namespaces_in_use.add(namespace)
+        return namespace
+
+    async def wait_for_deploy_token(self):
+        while not self.deploy_bucket.try_acquire():
+            await asyncio.sleep(max(0.1, self.deploy_bucket.seconds_until_available()))
+
+    # ---- Lifecycle ----
+
+    async def launch(self, qry, namespace, packed=()):
+        fullAppName = namespace + "." + config.ILA_APP_NAME_BASE
+        qry.appname = fullAppName
+        qry.namespace = namespace
+        qry.cluster = self.cluster.name
+        qry.notes = qry.notes or ""
+
+        await self.wait_for_deploy_token()
+
+        rows = [qry] + list(packed)
+        if not config.NAMESPACE_POOL:
+            print("Resetting namespace for use: " + namespace)
+            started = time.monotonic()
+            await self.reset_namespace(namespace, True)
+            add_phase_seconds(rows, 'nsreset', time.monotonic() - started)
+
+        tql = self.template.render_app(namespace, [(row.query, row.targettbl) for row in rows])
+        audit_tql(namespace, tql)
+        if packed:
+            for position, row in enumerate(rows):
+                row.notes = (row.notes or "") + f"; Packed {len(rows)} chunks into {fullAppName} (source {source_name(self.template.text, position)})"
+        started = time.monotonic()
+        isSuccessful, failuremessage = await self.run_command('USE ' + namespace + '; ' + tql, timeout=config.STRIIM_TQL_TIMEOUT_SECONDS)
+        isSuccessful, failuremessage = await self.check_status(fullAppName, isSuccessful, failuremessage, "Cannot find", True)
+        add_phase_seconds(rows, 'upload', time.monotonic() - started)
+        if not isSuccessful:
+            qry.notes += "Unable to create: " + (failuremessage or "")
+            return "CREATE"
+
+        started = time.monotonic()
+        isSuccessful, failuremessage = await self.run_command(f"DEPLOY APPLICATION {fullAppName} IN {self.cluster.deployment_group};")
+        isSuccessful, failuremessage = await self.check_status(fullAppName, isSuccessful, failuremessage, "DEPLOYED", False)
+        add_phase_seconds(rows, 'deploy', time.monotonic() - started)
+        if not isSuccessful:
+            qry.notes += "Unable to deploy: " + (failuremessage or "")
+            return "DEPLOY"
+        print("Deployment successful -> " + fullAppName)
+
+        return None
+
+    async def start(self, qry, packed=()):
+        fullAppName = qry.appname
+        started = time.monotonic()
+        isSuccessful, failuremessage = await self.run_command("START APPLICATION " + fullAppName + ";")
+        isSuccessful, failuremessage = await self.check_status(fullAppName, isSuccessful, failuremessage, "DEPLOYED", True)
+        add_phase_seconds([qry] + list(packed), 'start', time.monotonic() - started)
+        if not isSuccessful:
+            qry.notes += "Start App Failed: " + (failuremessage or "")
+            return "START"
+        print("Start App successful -> " + fullAppName)
+        for row in [qry] + list(packed):
+            self.load_clock[row.id] = time.monotonic()
+
+        return None
+
+    async def save_pack(self, qry, packed):
+        # The other rows of a packed app follow its first row
+        await self.save(qry)
+        follow(qry, packed)
+        for row in packed:
+            await self.save(row)
+
+    async def run_chunk(self, qry, packed=()):
+        try:
+            await self.run_chunk_lifecycle(qry, packed)
+        except Exception as e:
+            # One chunk going wrong should not stop the others
+            print('Error at run_chunk:', qry.id, e)
+            qry.status = "FAILED"
+            qry.notes = (qry.notes or "") + ". Unexpected error: " + str(e)
+            await self.save_pack(qry, [row for row in packed if row.status not in config.DONE_STATUSES])
+
+    async def cleanup_failed(self, qry, namespace, failPoint, packed=()):
+        qry.status = "FAILED"
+        qry.finished_datetime = datetime.datetime.now()
+        print(qry.notes)
+        if failPoint == "START":
+            isSuccessful, failuremessage = await self.run_command("UNDEPLOY APPLICATION " + qry.appname + ";")
+            qry.notes += " [Cleanup: Able to UNDEPLOY]" if isSuccessful else " [Cleanup Failure: Unable to UNDEPLOY: -> " + failuremessage + "]"
+        if config.NAMESPACE_POOL:
+            await self.run_command("DROP APPLICATION " + qry.appname + " CASCADE;")
+        else:
+            await self.reset_namespace(namespace)
+        await self.save_pack(qry, packed)
+        self.namespaces_in_use.discard(namespace)
+
+    async def acquire_place(self, running, force=False):
+        """
+        Waits (in arrival order) for a running slot or a staged (running + warm) place; force is for resumed chunks
+        that already hold one on the cluster.
+        """
+        async with self.capacity:
+            if running:
+                if not force:
+                    await self.capacity.wait_for(lambda: self.running < self.controller.target)
+                self.running = self.running + 1
+            else:
+                if not force:
+                    await self.capacity.wait_for(lambda: self.staged < self.controller.target + config.WARM_POOL_DEPTH)
+                self.staged = self.staged + 1
+
+    async def release_place(self, running):
+        async with self.capacity:
+            if running:
+                self.running = self.running - 1
+            else:
+                self.staged = self.staged - 1
+            self.capacity.notify_all()
+
+    async def run_chunk_lifecycle(self, qry, packed=()):
+        # Create and deploy while holding only a staged (running + warm) place, then start once a running slot is free
+        resumed = qry.status in config.RUNNING_STATUSES and qry.namespace
+        warm = qry.status in config.WARM_STATUSES and qry.namespace
+
+        await self.acquire_place(False, resumed or warm)
+        try:
+            if resumed or warm:
+                namespace = qry.namespace
+            else:
+                namespace = self.lease_namespace()
+                failPoint = await self.launch(qry, namespace, packed)
+                if failPoint is not None:
+                    await self.cleanup_failed(qry, namespace, failPoint, packed)
+                    return
+
+                if config.WARM_POOL_DEPTH > 0:
+                    qry.status = 'DEPLOYED'
+                    await self.save_pack(qry, packed)
+
+            await self.acquire_place(True, resumed)
+            try:
+                if not resumed:
+                    failPoint = await self.start(qry, packed)
+                    if failPoint is not None:
+                        await self.cleanup_failed(qry, namespace, failPoint, packed)
+                        return
+
+                    qry.status = 'RUNNING'
+                    qry.started_datetime = datetime.datetime.now()
+                    await self.save_pack(qry, packed)
+
+                # Wait for the monitor task to see this app finish. Packed apps are not split as stragglers, but the
+                # monitor completes their rows one source at a time. A straggler that could not be stopped is waited on again.
+                while True:
+                    waiter = asyncio.get_running_loop().create_future()
+                    self.waiters[namespace] = waiter
+                    if packed:
+                        self.packs[namespace] = [(row, source_name(self.template.text, position)) for position, row in enumerate([qry] + list(packed))]
+                    else:
+                        self.waiting_rows[namespace] = qry
+                    finalStatus = await waiter
+                    self.waiting_rows.pop(namespace, None)
+                    self.packs.pop(namespace, None)
+
+                    if finalStatus != 'SPLIT':
+                        break
+                    if await self.split_straggler(qry):
+                        self.namespaces_in_use.discard(namespace)
+                        return
+
+                rows = [row for row in [qry] + list(packed) if row.status in config.RUNNING_STATUSES]
+                for row in rows:
+                    await self.complete(row)
+
+                await self.teardown(qry, rows)
+                if qry.status == "FAILED":
+                    await self.save_pack(qry, [row for row in rows if row is not qry])
+                else:
+                    # Saves the teardown timings
+                    for row in rows or [qry]:
+                        await self.save(row)
+                print("Teardown completed -> " + qry.appname)
+
+                self.namespaces_in_use.discard(namespace)
+            finally:
+                await self.release_place(True)
+        finally:
+            await self.release_place(False)
+
+    async def complete(self, qry, note=""):
+        qry.status = "COMPLETED"
+        qry.finished_datetime = datetime.datetime.now()
+        started = self.load_clock.pop(qry.id, None)
+        qry.load_seconds = time.monotonic() - started if started is not None else \
+            seconds_between(qry.started_datetime, qry.finished_datetime)
+        qry.notes = (qry.notes or "") + note + "; Total Execution time: " + \
+            str(datetime.timedelta(seconds=int(seconds_between(qry.started_datetime, qry.finished_datetime))))
+        self.stragglers.completed(qry)
+        self.throughput.completed(qry)
+        await self.save(qry)
+
+    def start_task(self, qry, packed=()):
+        self.tasks.add(asyncio.create_task(self.run_chunk(qry, packed)))
+
+    async def split_straggler(self, qry):
+        """
+        Stops a straggler's app, replaces its row by sub-chunks of its key range (see planner.split_query and
+        data.split_record), starts a task for each of them and tears the stopped app down.
+
+        Returns:
+            bool: True if the chunk was stopped and split. If the app could not be stopped, nothing is split (it would
+            load the same range again alongside the sub-chunks) and the chunk is checked again at the next mon.
+        """
+        isSuccessful, failuremessage = await self.run_command("STOP APPLICATION " + qry.appname + ";")
+        if not isSuccessful:
+            print(f"Unable to stop straggler {qry.appname}; will try again next mon: {failuremessage}")
+            return False
+
+        queries = split_query(qry.query, config.STRAGGLER_SPLIT_WAYS)
+        reason = " (straggler, stopped after " + \
+            str(datetime.timedelta(seconds=int(seconds_between(qry.started_datetime, datetime.datetime.now())))) + ")"
+        async with self.state_lock:
+            new_rows = await asyncio.to_thread(split_record, qry, queries, reason)
+        self.stragglers.split(qry, new_rows)
+        self.throughput.completed(qry)
+        print(f"Split straggler id {qry.id} into ids {', '.join(str(row.id) for row in new_rows)}")
+
+        position = self.query_results.index(qry)
+        self.query_results[position:position + 1] = new_rows
+        for row in new_rows:
+            self.start_task(row)
+
+        await self.teardown(qry)
+        print("Teardown completed -> " + qry.appname)
+        return True
+
+    async def flush(self, force):
+        async with self.state_lock:
+            await asyncio.to_thread(flush_data, force)
+
+    async def targeted_mon(self):
+        """
+        MON_MODE = 'targeted': `mon <app>` for every app a chunk task is waiting on, MON_TARGETED_BATCH_SIZE statements
+        per request and MON_TARGETED_WORKERS requests at a time. Returns (apps, {app full name: mon response}), or
+        (None, {}) if any request failed.
+        """
+        appNames = set()
+        for namespace in self.waiters:
+            qry = self.waiting_rows.get(namespace) or (self.packs[namespace][0][0] if self.packs.get(namespace) else None)
+            if qry is not None and qry.appname:
+                appNames.add(qry.appname)
+
+        slots = asyncio.Semaphore(config.MON_TARGETED_WORKERS)
+
+        async def mon_batch(batch):
+            async with slots:
+                return split_mon_responses(batch, await self.run_command(' '.join('mon ' + appName + ';' for appName in batch), True))
+
+        appNames = sorted(appNames)
+        batchSize = max(1, config.MON_TARGETED_BATCH_SIZE)
+        batches = await asyncio.gather(*[mon_batch(appNames[n:n + batchSize]) for n in range(0, len(appNames), batchSize)])
+        responses = {}
+        for batchResponses in batches:
+            if batchResponses is None:
+                responses = None
+                break
+            responses.update(batchResponses)
+
+        striim_apps = merge_mon_responses(responses) if responses is not None else None
+        if striim_apps is None:
+            print("Targeted mon failed; running a full mon instead")
+            return None, {}
+        return striim_apps, responses
+
+    async def monitor(self):
+        while not self.stopping:
+            await asyncio.sleep(config.APP_MONITOR_INTERVAL_SECONDS)
+
+            # Buffered state changes (BigQuery write-behind) go out once a size or time threshold is reached
+            await self.flush(False)
+
+            if config.THROUGHPUT_TRACKING:
+                async with self.state_lock:
+                    await asyncio.to_thread(self.throughput.flush)
+                self.throughput.progress(self.query_results)
+
+            metrics.update()
+
+            if not self.waiters:
+                continue
+
+            # With MON_MODE = 'targeted', only the apps being waited on are polled between full mons (striim_nodes stays None)
+            striim_apps, striim_nodes, monResponses = None, None, {}
+            if config.MON_MODE.lower() == 'targeted' and time.monotonic() < self.cluster.next_full_mon:
+                striim_apps, monResponses = await self.targeted_mon()
+
+            if striim_apps is None:
+                result = await self.run_command('mon;', True)
+                striim_apps, striim_nodes, es_nodes, response_valid = map_mon_json_response(result)
+                if not response_valid:
+                    print("Response from mon is invalid; will try again next interval.")
+                    continue
+                self.cluster.next_full_mon = time.monotonic() + config.MON_FULL_INTERVAL_SECONDS
+
+            metrics.observe_mon(self.cluster.name, [app for app in striim_apps if isILApp(app.full_name)], striim_nodes)
+
+            # The adaptive controller (if enabled) moves the running app target; wake chunks waiting for a slot if it grew.
+            # A targeted mon has no node metrics, so the target holds until the next full mon.
+            previousTarget = self.controller.target
+            if striim_nodes is not None and self.controller.observe(striim_nodes, self.running) > previousTarget:
+                async with self.capacity:
+                    self.capacity.notify_all()
+
+            for app in [app for app in striim_apps if isILApp(app.full_name)]:
+                if (config.THROUGHPUT_TRACKING or config.STRAGGLER_SPLIT) and app.status_change == 'RUNNING':
+                    # Keep this mon's rates of the app's running rows (see throughput.py); the straggler detector reads them too
+                    if app.namespace in self.packs:
+                        rows = [row for row, name in self.packs[app.namespace] if row.status in config.RUNNING_STATUSES]
+                    else:
+                        rows = [self.waiting_rows[app.namespace]] if app.namespace in self.waiting_rows else []
+                    if rows:
+                        self.throughput.observe(rows, app)
+
+                if app.status_change in ('QUIESCED', 'COMPLETED') and app.namespace in self.waiters:
+                    waiter = self.waiters.pop(app.namespace)
+                    if not waiter.done():
+                        waiter.set_result(app.status_change)
+                elif app.status_change == 'RUNNING' and app.namespace in self.packs:
+                    # Complete the rows of a packed app whose source has finished; the last one completes with the app
+                    running = [(row, name) for row, name in self.packs[app.namespace] if row.status in config.RUNNING_STATUSES]
+                    if len(running) < 2:
+                        continue
+                    # A targeted mon already fetched this app's components
+                    monResponse = monResponses.get(app.full_name) or await self.run_command('mon ' + app.full_name + ';', True)
+                    finished = finished_sources(monResponse, app.full_name)
+                    for row, name in [(row, name) for row, name in running if name in finished][:len(running) - 1]:
+                        await self.complete(row, "; Source finished in packed app")
+                elif config.STRAGGLER_SPLIT and app.status_change == 'RUNNING' and app.namespace in self.waiting_rows:
+                    qry = self.waiting_rows[app.namespace]
+                    if not self.stragglers.is_straggler(qry):
+                        continue
+                    if not split_query(qry.query, config.STRAGGLER_SPLIT_WAYS):
+                        print(f"Straggler id {qry.id} cannot be split (no bounded ROWID / key range in its query); leaving it running")
+                        self.stragglers.skip(qry)
+                        continue
+                    waiter = self.waiters.pop(app.namespace)
+                    if not waiter.done():
+                        waiter.set_result('SPLIT')
+
+    def collect_metrics(self):
+        pending = len([qry for qry in self.query_results if qry.status not in config.NEW_EXCLUDES_STATUSES])
+        metrics.observe_run(self.query_results, pending, [(self.cluster.name, self.running, self.controller.target)])
+
+    async def run(self):
+        metrics.add_collector(self.collect_metrics)
+        await self.client.open()
+        try:
+            # Chunks resumed from an earlier run (running or warm) keep their namespace
+            resumedStatuses = config.RUNNING_STATUSES + config.WARM_STATUSES
+            for qry in [qry for qry in self.query_results if qry.status in resumedStatuses and qry.namespace]:
+                self.namespaces_in_use.add(qry.namespace)
+
+            # One task per app: rows sharing a namespace were packed into one app, and with PACK_CHUNKS consecutive small
+            # pending rows are packed (packing.build_packs)
+            resumed = {}
+            for qry in [qry for qry in self.query_results if qry.status in config.RUNNING_STATUSES and qry.namespace]:
+                resumed.setdefault(qry.namespace, []).append(qry)
+            for qry in sorted([qry for qry in self.query_results if qry.status in config.WARM_STATUSES and qry.namespace],
+                              key=lambda qry: qry.roworder):
+                resumed.setdefault(qry.namespace, []).append(qry)
+            todo = list(resumed.values())
+            todo += build_packs(schedule_order([qry for qry in self.query_results if qry.status not in config.NEW_EXCLUDES_STATUSES]))
+
+            # With NAMESPACE_POOL, the namespaces are created once here and only dropped when the run is done.
+            # lease_namespace() always hands out the lowest free number, so (highest running target) + WARM_POOL_DEPTH namespaces are enough.
+            poolSize = self.controller.maximum + config.WARM_POOL_DEPTH
+            poolNamespaces = [self.cluster.namespace(n) for n in range(1, poolSize + 1)]
+            if config.NAMESPACE_POOL:
+                for namespace in poolNamespaces:
+                    await self.run_command('create namespace ' + namespace + ';')
+
+            # Condition waiters are woken in FIFO order, so tasks start in the order of config.CHUNK_SCHEDULER
+            monitor_task = asyncio.create_task(self.monitor())
+            for pack in todo:
+                self.start_task(pack[0], pack[1:])
+            # Split stragglers add tasks while others run, so wait until the set stays empty
+            while self.tasks:
+                done, pending = await asyncio.wait(self.tasks)
+                self.tasks -= done
+            self.stopping = True
+            monitor_task.cancel()
+            await self.flush(True)
+            async with self.state_lock:
+                await asyncio.to_thread(self.throughput.flush, True)
+
+            if config.NAMESPACE_POOL:
+                for namespace in poolNamespaces:
+                    await self.reset_namespace(namespace)
+        finally:
+            await self.client.close()
+
+
+def run(query_results, username, password):
+    """
+    Runs every pending chunk in query_results to completion with the asyncio engine.
+    """
+    if aiohttp is None:
+        raise ImportError("ORCHESTRATOR_ENGINE = 'async' requires aiohttp (pip install aiohttp)")
+    if config.SHARDED_WORKERS:
+        raise ValueError("SHARDED_WORKERS is only supported by ORCHESTRATOR_ENGINE = 'sync'")
+
+    # The async engine drives a single cluster
+    clusters = load_clusters(username, password)
+    cluster = clusters[0]
+    if len(clusters) > 1:
+        print(f"The async engine runs on one cluster; using {cluster.name}, the first of STRIIM_CLUSTERS")
+
+    async def _main():
+        client = AsyncStriimClient("", cluster.client.base_url, cluster.client.username, cluster.client.password, cluster.client.api_token)
+        await AsyncOrchestrator(query_results, client, cluster).run()
+
+    asyncio.run(_main())
@@ -0,0 +1,235 @@
+"""
+Benchmark of the orchestrator's own overhead against the local mock Striim (mockstriim.py), so regressions in
+runReview, data.py or map_mon_json_response show up without a cluster.
+
+Each case (state store backend x plan size) runs in its own process: a synthetic plan of N chunks is written to a
+fresh state store under a scratch directory, then the sync review loop of main.py runs (as in main.py's __main__,
+without the sleep between ticks) until every chunk is done or the case's time budget is used up. Reported per case:
+-> chunks/hour: completed chunks per hour of wall clock time
+-> tick latency: runReview + flush_data per tick (p50 / p95 / max, ms)
+-> REST calls per chunk: tungsten calls received by the mock, per completed chunk (and per verb), and the KB of
+   responses per chunk
+-> state store I/O: calls and seconds spent in the data.py entry points (write_data, update_record, read_data,
+   flush_data, get_next_id, ...), and the size of the store on disk
+
+--other-apps puts that many apps of other users on the mock cluster (as on a shared cluster) and --mon-mode sets
+MON_MODE, to compare full and targeted mon polling.
+
+App durations default to 0 (an app quiesces at the first mon after START), so the numbers are the orchestrator's
+ceiling, not a Striim throughput estimate. The mock runs in the same process as the orchestrator, so its own CPU is
+included in the timings. BigQuery ('BQ') needs credentials and the table from BQ_TableCreate.sql; it is only run
+when named with --backends.
+
+Usage: python benchmark.py
+       python benchmark.py --sizes 100 10000 --backends SQLite Journal --apps 50 --budget 300
+       python benchmark.py --sizes 1000 --backends SQLite --other-apps 500 --mon-mode targeted
+"""
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+DEFAULT_SIZES = [100, 10000, 100000]
+DEFAULT_BACKENDS = ['SQLite', 'Journal', 'TinyDB']
+
+# data.py entry points counted as state store I/O (looked up in both data and main, which imports them with *)
+STORE_FUNCTIONS = ['write_data', 'update_record', 'read_data', 'flush_data', 'get_next_id', 'fetch_record',
+                   'split_record', 'claim_record', 'renew_leases', 'update_and_get_current_status']
+
+
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def instrument(modules, io):
+    """
+    Wraps the STORE_FUNCTIONS in modules so every call is counted and timed in io (name -> [calls, seconds]).
+    Only outermost calls count (split_record calling update_record is one split_record).
+    """
+    wrapped = {}
+    depth = [0]
+    for module in modules:
+        for name in STORE_FUNCTIONS:
+            function = getattr(module, name, None)
+            if function is None:
+                continue
+            if name not in wrapped:
+                def timed(*args, __name=name, __function=function, **kwargs):
+                    if depth[0] > 0:
+                        return __function(*args, **kwargs)
+                    depth[0] = depth[0] + 1
+                    start = time.perf_counter()
+                    try:
+                        return __function(*args, **kwargs)
+                    finally:
+                        depth[0] = depth[0] - 1
+                        entry = io.setdefault(__name, [0, 0.0])
+                        entry[0] = entry[0] + 1
+                        entry[1] = entry[1] + time.perf_counter() - start
+                wrapped[name] = timed
+            setattr(module, name, wrapped[name])
+
+
+def run_case(backend, size, apps, budget, duration, workdir, other_apps=0, mon_mode='full'):
+    """
+    Runs one case in this process and returns its results. Must run in a fresh process: main.py reads config at import.
+    """
+    import config
+    from mockstriim import MockStriim
+
+    mock = MockStriim(duration=duration, other_apps=other_apps).start()
+
+    config.STRIIM_NODE = mock.node
+    config.STRIIM_URL_PREFIX = "http://"
+    config.STRIIM_API_TOKEN = ""
+    config.STRIIM_CLUSTERS = []
+    config.CONCURRENT_APPS_MAX = apps
+    config.APP_MONITOR_INTERVAL_SECONDS = 0
+    config.FILL_ALL_SLOTS = True
+    config.DEPLOY_RATE_PER_MINUTE = 1000000
+    config.DEPLOY_BURST_MAX = apps
+    config.ORCHESTRATOR_ENGINE = 'sync'
+    config.MON_MODE = mon_mode
+    config.SHARDED_WORKERS = False
+    config.TQL_AUDIT = False
+    config.STAGE_DB_LOCATION = backend
+    config.TINYDB_PATH = os.path.join(workdir, 'bench.json')
+    config.SQLITE_PATH = os.path.join(workdir, 'bench.db')
+    config.JOURNAL_PATH = os.path.join(workdir, 'bench.journal')
+    config.JOURNAL_SNAPSHOT_PATH = os.path.join(workdir, 'bench.snapshot')
+    config.LOG_OUTPUT_PATH = os.path.join(workdir, 'bench.log')
+    config.TARGET_TQL_PATH = workdir
+
+    # Keep the orchestrator's console output out of the report
+    sys.stdout = open(os.devnull, 'w')
+
+    import data
+    import main
+
+    io = {}
+    instrument([data, main], io)
+
+    plan = [data.QueryResult(roworder=n, query=f"SELECT * FROM BENCH.T{n % 10} WHERE ID BETWEEN {n * 1000} AND {n * 1000 + 999}",
+                             targettbl=f"BENCH.T{n % 10}", _id=n + 1, status='NEW', notes="",
+                             uniquerunid=config.UNIQUE_RUN_ID, iscurrentrow=True, est_rows=1000)
+            for n in range(size)]
+
+    start = time.perf_counter()
+    main.write_data(plan)
+    main.flush_data(True)
+    loadSeconds = time.perf_counter() - start
+
+    main.query_results = plan
+    main.query_index.rebuild(plan)
+
+    ticks = []
+    start = time.perf_counter()
+    while main.query_index.unfinished_count() > 0 and time.perf_counter() - start < budget:
+        tickStart = time.perf_counter()
+        main.runReview()
+        main.flush_data(False)
+        ticks.append(time.perf_counter() - tickStart)
+    main.applyTeardownResults(main.teardown_pipeline.wait(0.01))
+    main.flush_data(True)
+    elapsed = time.perf_counter() - start
+
+    completed = len([qry for qry in main.query_results if qry.status == 'COMPLETED'])
+    stats = mock.stats()
+    mock.stop()
+
+    storeBytes = sum(os.path.getsize(os.path.join(workdir, name)) for name in os.listdir(workdir)
+                     if name.startswith('bench.') and not name.endswith('.log'))
+
+    return {
+        'backend': backend,
+        'chunks': size,
+        'completed': completed,
+        'seconds': round(elapsed, 2),
+        'plan_load_seconds': round(loadSeconds, 2),
+        'chunks_per_hour': round(completed / elapsed * 3600) if elapsed > 0 else 0,
+        'ticks': len(ticks),
+        'tick_ms_p50': round(percentile(ticks, 0.5) * 1000, 1),
+        'tick_ms_p95': round(percentile(ticks, 0.95) * 1000, 1),
+        'tick_ms_max': round(max(ticks) * 1000, 1) if ticks else 0.0,
+        'rest_calls_per_chunk': round(stats['tungsten_calls'] / completed, 2) if completed else None,
+        'response_kb_per_chunk': round(stats['response_bytes'] / 1024 / completed, 1) if completed else None,
+        'rest_calls': stats['calls'],
+        'store_calls': {name: calls for name, (calls, seconds) in sorted(io.items())},
+        'store_seconds': round(sum(seconds for calls, seconds in io.values()), 2),
+        'store_bytes': storeBytes,
+    }
+
+
+def report(results):
+    columns = [('backend', 8), ('chunks', 8), ('completed', 10), ('seconds', 9), ('chunks_per_hour', 16),
+               ('tick_ms_p50', 12), ('tick_ms_p95', 12), ('tick_ms_max', 12), ('rest_calls_per_chunk', 21),
+               ('response_kb_per_chunk', 22), ('store_seconds', 14), ('store_bytes', 12)]
+    print(''.join(name.rjust(width) for name, width in columns))
+    for result in results:
+        print(''.join(str(result.get(name, '')).rjust(width) for name, width in columns))
+    print()
+    for result in results:
+        if 'error' in result:
+            print(f"{result['backend']} x {result['chunks']}: {result['error']}")
+            continue
+        print(f"{result['backend']} x {result['chunks']}: REST calls {result['rest_calls']}")
+        print(f"{'':>{len(result['backend']) + len(str(result['chunks'])) + 5}}store calls {result['store_calls']}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Orchestrator overhead benchmark against the mock Striim")
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES, help="Plan sizes (chunks)")
+    parser.add_argument('--backends', nargs='+', default=DEFAULT_BACKENDS, help="SQLite, Journal, TinyDB and/or BQ")
+    parser.add_argument('--apps', type=int, default=50, help="CONCURRENT_APPS_MAX")
+    parser.add_argument('--budget', type=float, default=600, help="Seconds per case before it is cut short")
+    parser.add_argument('--duration', type=float, default=0.0, help="Seconds each mock app runs")
+    parser.add_argument('--other-apps', type=int, default=0, help="Apps of other users on the mock cluster")
+    parser.add_argument('--mon-mode', default='full', help="MON_MODE: full or targeted")
+    parser.add_argument('--json', help="Also write the results to this file")
+    parser.add_argument('--case', nargs=2, metavar=('BACKEND', 'SIZE'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.case:
+        # One case, in this (child) process: results go to stdout as one JSON line
+        workdir = tempfile.mkdtemp(prefix='ila_bench_')
+        output = sys.stdout
+        try:
+            result = run_case(args.case[0], int(args.case[1]), args.apps, args.budget, args.duration, workdir,
+                              args.other_apps, args.mon_mode)
+        finally:
+            shutil.rmtree(workdir, ignore_errors=True)
+        output.write(json.dumps(result) + "\n")
+        sys.exit(0)
+
+    results = []
+    for backend in args.backends:
+        for size in args.sizes:
+            print(f"Running {backend} x {size} chunks...", flush=True)
+            process = subprocess.run([sys.executable, os.path.abspath(__file__), '--case', backend, str(size),
+                                      '--apps', str(args.apps), '--budget', str(args.budget),
+                                      '--duration', str(args.duration), '--other-apps', str(args.other_apps),
+                                      '--mon-mode', args.mon_mode],
+                                     capture_output=True, text=True, cwd=os.path.dirname(os.path.abspath(__file__)))
+            lines = [line for line in process.stdout.splitlines() if line.startswith('{')]
+            if process.returncode != 0 or not lines:
+                error = (process.stderr.strip().splitlines() or ['no output'])[-1]
+                results.append({'backend': backend, 'chunks': size, 'error': error})
+                print(f"  failed: {error}")
+                continue
+            results.append(json.loads(lines[-1]))
+            if results[-1]['completed'] < size:
+                print(f"  time budget reached after {results[-1]['completed']} of {size} chunks")
+
+    print()
+    report(results)
+
+    if args.json:
+        with open(args.json, 'w') as fout:
+            json.dump(results, fout, indent=2)
@@ -0,0 +1,107 @@
+import config
+from concurrency import AdaptiveConcurrency
+from striimclient import StriimClient
+
+
+class StriimCluster:
+    """
+    One Striim endpoint chunks can run on: its own REST client, deployment group and running app target.
+
+    Each cluster numbers its namespaces from namespace_start + 1 (ILA_<run>_<n>), in a block that does not overlap
+    the other clusters, so a namespace alone tells which cluster an app lives on and namespaces stay unique in the
+    state store across clusters.
+
+    Usage: clusters = load_clusters(username, password)
+           cluster = cluster_for_namespace(clusters, qry.namespace)
+    """
+
+    def __init__(self, name, client, deployment_group, apps_max, namespace_start=0):
+        self.name = name
+        self.client = client
+        self.deployment_group = deployment_group
+        self.apps_max = apps_max
+        self.namespace_start = namespace_start
+        self.controller = AdaptiveConcurrency(apps_max, name)
+        self.healthy = True     # False when its last mon failed; no new chunks are placed on it until mon works again
+        self.running_apps = 0   # Running apps seen in the last review
+        self.next_full_mon = 0.0  # time.monotonic() after which the next review runs a full mon (MON_MODE = 'targeted')
+        self.unpolled_running_apps = 0  # Running ILA apps of no RUNNING row in the last full mon, counted between full mons
+        self.unpolled_namespaces = set()  # Namespaces of the ILA apps of no RUNNING row in the last full mon
+
+    def namespace(self, number):
+        # With SHARDED_WORKERS each worker numbers its namespaces in its own block, so two workers never pick the same one
+        workerStart = config.WORKER_INDEX * config.WORKER_NAMESPACE_BLOCK if config.SHARDED_WORKERS else 0
+        return config.ILA_NS_BASE + str(workerStart + self.namespace_start + number)
+
+
+def namespace_number(namespace):
+    """
+    Returns n for an ILA_<run>_<n> namespace of this run, else None.
+    """
+    if not namespace or not namespace.startswith(config.ILA_NS_BASE):
+        return None
+    number = namespace[len(config.ILA_NS_BASE):]
+    return int(number) if number.isdigit() else None
+
+
+def load_clusters(username, password):
+    """
+    Builds the clusters from STRIIM_CLUSTERS, or a single one from STRIIM_NODE / DEPLOYMENT_GROUP_TARGET /
+    CONCURRENT_APPS_MAX when it is empty.
+    """
+    definitions = config.STRIIM_CLUSTERS or [{'name': 'default', 'node': config.STRIIM_NODE,
+                                              'apps_max': config.CONCURRENT_APPS_MAX}]
+
+    clusters = []
+    for position, definition in enumerate(definitions):
+        missing = [key for key in ('name', 'node', 'apps_max') if key not in definition]
+        if missing:
+            raise ValueError(f"STRIIM_CLUSTERS entry {position + 1} is missing {', '.join(missing)}")
+        if definition['name'] in [cluster.name for cluster in clusters]:
+            raise ValueError(f"STRIIM_CLUSTERS has more than one cluster named {definition['name']}")
+
+        client = StriimClient(definition.get('url_prefix', config.STRIIM_URL_PREFIX), definition['node'],
+                              definition.get('user', username), definition.get('password', password),
+                              definition.get('api_token', config.STRIIM_API_TOKEN))
+        clusters.append(StriimCluster(definition['name'], client,
+                                      definition.get('deployment_group', config.DEPLOYMENT_GROUP_TARGET),
+                                      definition['apps_max'],
+                                      definition.get('namespace_start', position * config.CLUSTER_NAMESPACE_BLOCK)))
+
+    starts = sorted(cluster.namespace_start for cluster in clusters)
+    if len(set(starts)) != len(starts):
+        raise ValueError("STRIIM_CLUSTERS namespace_start values must be different")
+    return clusters
+
+
+def cluster_for_namespace(clusters, namespace):
+    """
+    Returns the cluster whose namespace block holds namespace (the one with the highest namespace_start below its
+    number, within its worker's block), or the first cluster if it is not an ILA namespace of this run.
+    """
+    number = namespace_number(namespace)
+    if number is None:
+        return clusters[0]
+    if config.SHARDED_WORKERS:
+        number %= config.WORKER_NAMESPACE_BLOCK
+    owners = [cluster for cluster in clusters if cluster.namespace_start < number]
+    if not owners:
+        return clusters[0]
+    return max(owners, key=lambda cluster: cluster.namespace_start)
+
+
+def is_worker_namespace(namespace):
+    """
+    True if namespace belongs to this worker's block (always, unless SHARDED_WORKERS).
+    """
+    if not config.SHARDED_WORKERS:
+        return True
+    number = namespace_number(namespace)
+    return number is not None and number // config.WORKER_NAMESPACE_BLOCK == config.WORKER_INDEX
+
+
+def cluster_by_name(clusters, name):
+    for cluster in clusters:
+        if cluster.name == name:
+            return cluster
+    return None
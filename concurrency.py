@@ -0,0 +1,117 @@
+import logging
+import time
+
+import config
+from monitor import MEMORY_UNITS, parse_bytes, parse_percent
+
+
+def max_running_apps():
+    """
+    Upper bound on running apps for the whole run: ADAPTIVE_APPS_MAX when the controller is on, else CONCURRENT_APPS_MAX.
+    """
+    if config.ADAPTIVE_CONCURRENCY:
+        return max(config.CONCURRENT_APPS_MAX, config.ADAPTIVE_APPS_MAX)
+    return config.CONCURRENT_APPS_MAX
+
+
+class AdaptiveConcurrency:
+    """
+    AIMD (additive increase, multiplicative decrease) controller for the number of apps allowed to run at once.
+
+    Every mon, the busiest node's CPU and memory usage are compared against MAX_CPU_USAGE / MAX_MEMORY_USAGE:
+    -> Over either threshold: the target is multiplied by ADAPTIVE_DECREASE_FACTOR (running apps are not stopped,
+       new ones are just not started until the cluster is below target again).
+    -> Below both thresholds by at least ADAPTIVE_HEADROOM_PERCENT, and every slot of the current target in use:
+       the target grows by ADAPTIVE_INCREASE_STEP.
+    Changes are at most once per ADAPTIVE_ADJUST_INTERVAL_SECONDS, so the cluster has time to react.
+    The target stays between ADAPTIVE_APPS_MIN and ADAPTIVE_APPS_MAX and starts at CONCURRENT_APPS_MAX.
+    When ADAPTIVE_CONCURRENCY is False the target is always CONCURRENT_APPS_MAX.
+
+    With apps_max (one cluster of STRIIM_CLUSTERS), the target is at most apps_max instead, and is apps_max when
+    ADAPTIVE_CONCURRENCY is False.
+
+    Usage: controller = AdaptiveConcurrency()
+           controller.observe(striim_nodes, runningApps)
+           if runningApps < controller.target: ...start another app...
+    """
+
+    def __init__(self, apps_max=None, name=None):
+        self.enabled = config.ADAPTIVE_CONCURRENCY
+        self.name = name
+        self.minimum = max(1, config.ADAPTIVE_APPS_MIN)
+        self.maximum = apps_max if apps_max is not None else max_running_apps()
+        self.target = min(self.maximum, max(self.minimum, config.CONCURRENT_APPS_MAX))
+        if not self.enabled:
+            self.target = apps_max if apps_max is not None else config.CONCURRENT_APPS_MAX
+        self.last_change = None
+
+    def node_usage(self, node):
+        """
+        Returns (cpu percent, memory used percent) for one node; either may be None if mon did not report it.
+        """
+        cpu = parse_percent(node.cpu_rate)
+
+        memory = None
+        free = parse_bytes(node.free_memory)
+        total = config.NODE_TOTAL_MEMORY_GB * MEMORY_UNITS['GB']
+        if free is not None and total > 0:
+            memory = max(0.0, min(100.0, 100.0 * (1 - free / total)))
+
+        return cpu, memory
+
+    def observe(self, striim_nodes, runningApps):
+        """
+        Feeds the latest mon node metrics into the controller and returns the (possibly changed) target.
+        """
+        if not self.enabled:
+            return self.target
+
+        cpuValues = []
+        memoryValues = []
+        for node in striim_nodes or []:
+            cpu, memory = self.node_usage(node)
+            if cpu is not None:
+                cpuValues.append(cpu)
+            if memory is not None:
+                memoryValues.append(memory)
+
+        if not cpuValues and not memoryValues:
+            logging.info(f"Adaptive concurrency{self.label()}: no node metrics in mon; holding target at {self.target}")
+            return self.target
+
+        cpu = max(cpuValues) if cpuValues else None
+        memory = max(memoryValues) if memoryValues else None
+        usage = f"cpu {self.format_percent(cpu)}, memory {self.format_percent(memory)}, running {runningApps}"
+
+        now = time.monotonic()
+        settled = self.last_change is None or now - self.last_change >= config.ADAPTIVE_ADJUST_INTERVAL_SECONDS
+
+        overloaded = (cpu is not None and cpu > config.MAX_CPU_USAGE) or \
+                     (memory is not None and memory > config.MAX_MEMORY_USAGE)
+        headroom = (cpu is None or cpu <= config.MAX_CPU_USAGE - config.ADAPTIVE_HEADROOM_PERCENT) and \
+                   (memory is None or memory <= config.MAX_MEMORY_USAGE - config.ADAPTIVE_HEADROOM_PERCENT)
+
+        if overloaded and settled and self.target > self.minimum:
+            newTarget = max(self.minimum, int(self.target * config.ADAPTIVE_DECREASE_FACTOR))
+            self.change(newTarget, "backing off", usage)
+        elif headroom and settled and runningApps >= self.target and self.target < self.maximum:
+            newTarget = min(self.maximum, self.target + config.ADAPTIVE_INCREASE_STEP)
+            self.change(newTarget, "raising", usage)
+        else:
+            logging.info(f"Adaptive concurrency{self.label()}: holding target at {self.target} ({usage})")
+
+        return self.target
+
+    def change(self, newTarget, reason, usage):
+        message = f"Adaptive concurrency{self.label()}: {reason} target {self.target} -> {newTarget} ({usage})"
+        print(message)
+        logging.info(message)
+        self.target = newTarget
+        self.last_change = time.monotonic()
+
+    def label(self):
+        return f" [{self.name}]" if self.name else ""
+
+    @staticmethod
+    def format_percent(value):
+        return "n/a" if value is None else f"{value:.0f}%"
@@ -10,20 +10,130 @@ QUERY_FILE_DELIMITER = "|"                                              # In you
 SOURCE_TQL_FILE = "admin.SW.tql"
 # The name of your Striim application (do not include the namespace)
 ILA_APP_NAME_BASE = "OracleInitialLoadApp"
-
-# Not yet implemented ****************** To-do:
-TABLE_LIST = ["source.tbl", "source.tbl2", "source.tbl3"]
+# The template is loaded and checked once. Besides ~QUERYTEXT~, ~TARGETTABLE~ and ~NAMESPACE~ (filled in per chunk), it may use
+# other ~NAME~ placeholders with their values set here, e.g. {'FETCHSIZE': 10000}
+TQL_TEMPLATE_VALUES = {}
+TQL_AUDIT = False                                                       # Also write each chunk's rendered TQL to TARGET_TQL_PATH (stage/) for debugging
+
+# Chunk planner (planner.py) - When PLAN_FROM_TABLE_LIST is True, a new run plans its chunks from TABLE_LIST and the exported
+# table statistics below instead of reading QUERY_FILE. Run `python planner.py` to preview the plan in queryfile.txt format.
+PLAN_FROM_TABLE_LIST = False
+TABLE_LIST = ["source.tbl", "source.tbl2", "source.tbl3"]                # OWNER.TABLE names to plan
+PLANNER_STATS_PATH = os.path.join(BASE_PATH, "table_stats.json")       # Per-table stats (JSON or CSV): strategy, key, min, max, num_rows, ...
+PLANNER_EXTENTS_PATH = os.path.join(BASE_PATH, "extents.csv")          # CSV export of dba_extents (owner, segment_name, relative_fno, block_id, blocks); only for 'rowid'
+PLANNER_DEFAULT_STRATEGY = "rowid"                                      # Options: rowid, numeric, date, hash or mod (used when a table's stats do not name one)
+PLANNER_CHUNKS_PER_TABLE = 10                                           # Chunks per table when its stats give neither chunks nor num_rows
+PLANNER_ROWS_PER_CHUNK = 0                                              # If > 0, chunks = num_rows / PLANNER_ROWS_PER_CHUNK for tables with num_rows
+PLANNER_BLOCK_SIZE = 8192                                               # Oracle block size, used for est_bytes of rowid chunks
+PLANNER_TARGET_TABLE_FORMAT = "{owner}.{table}"                         # Target table name for each source table, e.g. "QATEST2.{table}"
 
 # Session details
 UNIQUE_RUN_ID = 100                 # Unique Run ID (per user/session. Keep static to use existing session. Creating a new one will NOT erase old session.)
 CONCURRENT_APPS_MAX = 5             # This controls the maximum number of running, quiescing, or completed apps that can run at the same time (in parallel)
-MAX_MEMORY_USAGE = 80               # Not yet implemented ******************
+MAX_MEMORY_USAGE = 80               # Percent of node memory in use above which the adaptive controller backs off (only used when ADAPTIVE_CONCURRENCY = True)
+MAX_CPU_USAGE = 80                  # Percent of node CPU in use above which the adaptive controller backs off (only used when ADAPTIVE_CONCURRENCY = True)
 APP_MONITOR_INTERVAL_SECONDS = 15   # Controls how often we monitor app status. Should not be less than 15 seconds, and usually much greater (at least 60 seconds).
 DEPLOY_WAIT_TIME_SECONDS = 20       # Controls minimum time on how long to wait between deploying new apps, so we do not overload Striim
 
+# Orchestration engine - 'sync' runs the review loop in main.py (one REST call at a time).
+# 'async' runs every chunk's lifecycle as its own asyncio task (requires aiohttp and Python 3.9+); uses CONCURRENT_APPS_MAX,
+# DEPLOY_RATE_PER_MINUTE / DEPLOY_BURST_MAX and the TEARDOWN_* settings below.
+ORCHESTRATOR_ENGINE = 'sync'        # Options: sync or async
+
+# Slot filling - When True, each review tick launches up to (CONCURRENT_APPS_MAX - running apps) chunks instead of only one.
+# Deploys are then paced by the token bucket below instead of DEPLOY_WAIT_TIME_SECONDS, so slot count and deploy pacing are separate.
+FILL_ALL_SLOTS = False
+DEPLOY_RATE_PER_MINUTE = 6          # Sustained number of deploys allowed per minute (only used when FILL_ALL_SLOTS = True)
+DEPLOY_BURST_MAX = 3                # Max number of deploys allowed back-to-back before the rate above applies (only used when FILL_ALL_SLOTS = True)
+
+# Namespace pool - When True, CONCURRENT_APPS_MAX + WARM_POOL_DEPTH namespaces (plus TEARDOWN_WORKERS with TEARDOWN_ASYNC) are created once at the start of the run and reused:
+# each chunk's app is created in a free one with CREATE OR REPLACE and only the application is dropped when it finishes.
+# The namespaces are dropped at the end of the run (doNSClean). When False, every chunk drops and recreates its namespace.
+NAMESPACE_POOL = False
+
+# Adaptive concurrency - When True, the number of running apps is adjusted every review tick from the node CPU / memory in mon (AIMD):
+# it starts at CONCURRENT_APPS_MAX, grows by ADAPTIVE_INCREASE_STEP while all nodes are below MAX_CPU_USAGE / MAX_MEMORY_USAGE
+# (minus ADAPTIVE_HEADROOM_PERCENT) and all slots are in use, and is multiplied by ADAPTIVE_DECREASE_FACTOR when any node is above them.
+# Running apps are never stopped; the controller only holds back new starts. Decisions are written to the log.
+ADAPTIVE_CONCURRENCY = False
+ADAPTIVE_APPS_MIN = 1               # Lowest the running app target can go
+ADAPTIVE_APPS_MAX = 20              # Highest the running app target can go
+ADAPTIVE_INCREASE_STEP = 1          # Apps added to the target while there is headroom
+ADAPTIVE_DECREASE_FACTOR = 0.5      # Target is multiplied by this when a node is over a threshold
+ADAPTIVE_HEADROOM_PERCENT = 10      # How far below the thresholds usage must be before the target grows
+ADAPTIVE_ADJUST_INTERVAL_SECONDS = 120  # Minimum time between two target changes, so load can settle
+NODE_TOTAL_MEMORY_GB = 0            # Memory per Striim node (mon only reports free memory). 0 = unknown, so only CPU is used
+
+# Mon polling - 'full' runs one `mon;` (every application and node on the cluster) per cluster every review. 'targeted' runs `mon <app>`
+# only for this run's running apps, MON_TARGETED_BATCH_SIZE statements per request and MON_TARGETED_WORKERS requests at a time, and
+# the full `mon;` (node health for the adaptive controller and metrics) only every MON_FULL_INTERVAL_SECONDS, or when a targeted
+# request fails. Use 'targeted' on clusters shared with many other apps. Between full mons, ILA apps of no RUNNING row (e.g. stuck or failed
+# apps left on the cluster) count against CONCURRENT_APPS_MAX as they were in the last full mon.
+MON_MODE = 'full'                   # Options: full or targeted
+MON_TARGETED_BATCH_SIZE = 20        # `mon <app>;` statements sent in one request (1 = one request per app)
+MON_TARGETED_WORKERS = 4            # Concurrent targeted mon requests per cluster (keep below STRIIM_HTTP_POOL_SIZE)
+MON_FULL_INTERVAL_SECONDS = 300     # Time between full mons in targeted mode
+
+# Chunk scheduler - Order pending chunks are launched in. Chunks with a higher priority (queryfile.txt column 5) always go first.
+# 'strict' = queryfile.txt order, 'lpt' = largest first by est_bytes / est_rows (columns 3-4; shortens the long tail of mixed-size plans),
+# 'round_robin' = one chunk per source table in turn.
+CHUNK_SCHEDULER = 'strict'          # Options: strict, lpt or round_robin
+
+# Straggler splitting - When True, a running chunk whose predicted duration (from its est_rows and the app's rate in mon) is more than
+# STRAGGLER_FACTOR times the median of finished chunks is stopped, and its key range (ROWID, numeric or date range; see planner.split_query)
+# is split into STRAGGLER_SPLIT_WAYS new chunks. The old row is kept as history with status SPLIT.
+# The sub-chunks re-load the whole range of the stopped chunk, so the target must tolerate rows loaded twice (e.g. merge / upsert mode).
+STRAGGLER_SPLIT = False
+STRAGGLER_FACTOR = 3.0              # How many times the median duration a chunk must be predicted to take before it is split
+STRAGGLER_MIN_COMPLETED = 3         # Finished chunks needed (same target table, else any table) before the median is trusted
+STRAGGLER_MIN_RUNTIME_SECONDS = 900 # Chunks that have run less than this are never split
+STRAGGLER_SPLIT_WAYS = 2            # Number of sub-chunks a straggler is split into
+STRAGGLER_MAX_SPLIT_DEPTH = 2       # How many times a chunk (and then its sub-chunks) can be split
+
+# Throughput history - Keeps the rate / sourceRate / cpuRate / latestActivity that mon reports for every running chunk (see throughput.py):
+# in memory for a live ETA and rows/sec per target table, and appended in batches to the state store (BigQuery: table <TABLE_ID>_throughput)
+# for the throughput report at the end of the run. The in-memory samples are also kept when STRAGGLER_SPLIT is True, which predicts from them.
+THROUGHPUT_TRACKING = False
+THROUGHPUT_SAMPLES_PER_CHUNK = 120  # Samples kept in memory per running chunk (oldest dropped first)
+THROUGHPUT_FLUSH_ROWS = 500         # Buffered samples that trigger an append to the state store
+THROUGHPUT_FLUSH_INTERVAL_SECONDS = 60 # Max time a sample stays buffered before it is appended
+THROUGHPUT_STATUS_INTERVAL_SECONDS = 60 # How often the ETA and rows/sec per target table are printed and logged
+THROUGHPUT_REPORT_PATH = os.path.join(BASE_PATH,'logging','throughput_{run}.csv') # Per-chunk throughput written at the end of the run ({run} = UNIQUE_RUN_ID); '' skips it
+
+# Warm pool - Number of chunks kept created and deployed (but not started) ahead of the running ones, so a freed slot is filled
+# with a single START instead of a full create/deploy. Separate from CONCURRENT_APPS_MAX: warm apps are deployed on the cluster
+# but do not count as running. Warm deploys are paced the same way as normal deploys. 0 disables the warm pool.
+WARM_POOL_DEPTH = 0
+
+# Chunk packing - When True, consecutive pending chunks with est_rows / est_bytes under the limits below are loaded by one app with one
+# source / target flow per chunk (copies of the template's flow), instead of one app each. Each chunk keeps its own row and is marked
+# COMPLETED when its own source finishes. Packing needs the queryfile.txt estimate columns; chunks without them get their own app.
+PACK_CHUNKS = False
+PACK_MAX_CHUNKS = 10                # Most chunks loaded by one app
+PACK_MAX_ROWS = 1000000             # Largest total est_rows of one app (0 = no limit)
+PACK_MAX_BYTES = 0                  # Largest total est_bytes of one app (0 = no limit)
+
+# Startup reconciliation - When True, a restarted run first matches the apps on every cluster (one mon each) to its rows: apps that
+# finished while the orchestrator was down are completed and torn down, ILA apps with no row are torn down, and RUNNING / DEPLOYED
+# rows whose app is gone are re-queued, all before the first review tick.
+STARTUP_RECONCILE = True
+
+# Teardown - When True, UNDEPLOY / DROP APPLICATION / namespace reset of finished apps runs in background workers, so the slot is freed right away
+TEARDOWN_ASYNC = True
+TEARDOWN_WORKERS = 4                # Number of background teardown workers
+TEARDOWN_MAX_ATTEMPTS = 3           # Number of times a failed teardown is retried (from the stage that failed) before the row is marked FAILED
+TEARDOWN_RETRY_DELAY_SECONDS = 30   # How long a failed teardown waits on the retry queue before it is tried again
+
 # # Not yet implemented ******************: Uncomment if you want this to automatically stop, undeploy, and remove all existing apps in this run
 # CLEANUP_RUN_ID = 100      # Not yet implemented ******************
 
+# Striim REST client - A single pooled, keep-alive HTTP session is shared by every call
+STRIIM_HTTP_POOL_SIZE = 20          # Max pooled connections to the Striim node (keep above TEARDOWN_WORKERS + 1)
+STRIIM_CONNECT_TIMEOUT_SECONDS = 10 # Time allowed to open a connection
+STRIIM_READ_TIMEOUT_SECONDS = 180   # Time allowed for a single command to answer
+STRIIM_TQL_TIMEOUT_SECONDS = 300    # Time allowed for uploading a TQL application
+STRIIM_TKN_MAX_RETRIES = 3          # How many times a call re-authenticates after a 'tkn' (token) response before failing
+
 # Logging
 LOG_OUTPUT_NAME = os.path.join('logging','striimautoloader.log')
 LOG_OUTPUT_PATH = os.path.join(BASE_PATH, LOG_OUTPUT_NAME)  # By default, create a lot in the same directory the app runs in
@@ -38,17 +148,65 @@ SOURCE_TQL_PATH = BASE_PATH
 TARGET_TQL_PATH = os.path.join(BASE_PATH, "stage")
 
 # Do not change these
-DONE_STATUSES = ['COMPLETED', 'FAILED']
+DONE_STATUSES = ['COMPLETED', 'FAILED', 'SPLIT']
 RUNNING_STATUSES = ['RUNNING']
-NEW_EXCLUDES_STATUSES = ['RUNNING', 'COMPLETED', 'FAILED']
+NEW_EXCLUDES_STATUSES = ['RUNNING', 'DEPLOYED', 'COMPLETED', 'FAILED', 'SPLIT']
+WARM_STATUSES = ['DEPLOYED']
 APP_RUNNING_STATUSES = ['RUNNING', 'QUIESCING', 'COMPLETED']
 
-# Defines where to orchestrate. Currently supports BigQuery (BQ) or TinyDB (default: stores locally as a file):
-STAGE_DB_LOCATION = 'TinyDB' #Options: BQ or TinyDB
+# Defines where to orchestrate. Currently supports BigQuery (BQ), TinyDB (default: stores locally as a file)
+# Journal (stores locally as an append-only log of state changes, compacted periodically; much cheaper per update than TinyDB on large plans)
+# or SQLite (stores locally in an indexed SQLite database in WAL mode; other processes can read progress while this one writes):
+STAGE_DB_LOCATION = 'TinyDB' #Options: BQ, TinyDB, Journal or SQLite
 TINYDB_PATH = os.path.join(BASE_PATH,'logging','current_position.json')
+SQLITE_PATH = os.path.join(BASE_PATH,'logging','current_position.db')
+
+# Journal settings (only used when STAGE_DB_LOCATION = 'Journal')
+JOURNAL_PATH = os.path.join(BASE_PATH,'logging','current_position.journal')
+JOURNAL_SNAPSHOT_PATH = os.path.join(BASE_PATH,'logging','current_position.snapshot.json')
+JOURNAL_COMPACT_EVERY = 5000        # Number of journal entries after which the journal is folded into the snapshot
+JOURNAL_FSYNC = False               # When True, fsync after every entry (slower, survives host crashes and power loss; without it only process crashes)
+
+# BigQuery write-behind (only used when STAGE_DB_LOCATION = 'BQ') - When True, state updates are buffered and merged into BigQuery
+# as one MERGE job at the end of each review tick (or sooner, once either threshold below is reached), instead of one UPDATE job per change
+BQ_WRITE_BEHIND = True
+BQ_FLUSH_INTERVAL_SECONDS = 30      # Max time a buffered update waits before being merged
+BQ_FLUSH_MAX_ROWS = 500             # Max number of buffered rows before they are merged
+BQ_MERGE_PARAM_MAX_ROWS = 1000      # Merges of up to this many rows pass them as a query parameter; larger ones go through a load job into a staging table
 
 DEPLOYMENT_GROUP_TARGET = 'default'
 
+# Multiple Striim clusters - When empty, every chunk runs on STRIIM_NODE in DEPLOYMENT_GROUP_TARGET, with CONCURRENT_APPS_MAX running apps.
+# Otherwise a list of clusters, each with its own running app cap; each new chunk goes to the healthy cluster with the most free slots.
+# Keys: name, node and apps_max (required); deployment_group (default DEPLOYMENT_GROUP_TARGET); url_prefix, user, password and api_token
+# (default the STRIIM_* settings below); namespace_start (namespaces are numbered from namespace_start + 1, default position in the list
+# * CLUSTER_NAMESPACE_BLOCK; do not change it while a run is in progress). For example:
+# STRIIM_CLUSTERS = [{'name': 'east', 'node': 'striim-east:9080', 'apps_max': 5},
+#                    {'name': 'west', 'node': 'striim-west:9080', 'apps_max': 3, 'deployment_group': 'ilgroup'}]
+STRIIM_CLUSTERS = []
+CLUSTER_NAMESPACE_BLOCK = 1000      # Namespace numbers reserved per cluster
+
+# Sharded workers - When True, several orchestrator processes (same config and RUN_ID, each with its own WORKER_INDEX) share one run
+# through a shared state store (SQLite on a shared disk, TinyDB or BQ; not Journal). A worker takes a chunk with a lease before launching
+# it and renews its leases while the app runs; chunks of a worker that stops renewing are picked up by the others once the lease expires.
+# CONCURRENT_APPS_MAX / apps_max stay caps of the whole cluster, shared by all workers.
+# With BQ, every claim is its own conditional UPDATE job (one per chunk launched, so N sequential jobs per tick with FILL_ALL_SLOTS),
+# plus a MERGE first if that row has an update buffered by BQ_WRITE_BEHIND. Keep ticks launching few chunks, or use SQLite / TinyDB.
+SHARDED_WORKERS = False
+WORKER_ID = ""                      # Name of this worker in the leaseowner column; empty uses <host>-<pid>
+WORKER_INDEX = 0                    # 0, 1, 2, ... per worker; worker 0 loads queryfile.txt, each worker gets its own namespace numbers
+WORKER_NAMESPACE_BLOCK = 100000     # Namespace numbers reserved per worker (must be above the cluster blocks used)
+WORKER_ID_STRIDE = 100              # New row ids (split chunks) of worker n are n modulo this; must be more than the number of workers
+LEASE_SECONDS = 300                 # A chunk whose lease is not renewed for this long can be taken by another worker
+LEASE_HEARTBEAT_SECONDS = 60        # How often a worker renews the leases of its running chunks
+
+# Metrics - Prometheus metrics of the run (chunks by status, running apps against the cap, pending chunks, REST latency per command,
+# STATUS re-checks, state store flush time, per-app rate / source_rate / cpu_rate and node free memory from mon), see metrics.py.
+# Served at http://<host>:METRICS_PORT/metrics and / or written to METRICS_TEXTFILE_PATH every review tick. Both are off by default.
+METRICS_PORT = 0                    # Port of the /metrics endpoint; 0 disables it
+METRICS_BIND_ADDRESS = ''           # Address the endpoint listens on ('' = all interfaces)
+METRICS_TEXTFILE_PATH = ''          # For example os.path.join(BASE_PATH,'logging','striimautoloader.prom') for the node_exporter textfile collector
+
 # DEV and PROD Environments
 ENV = "DEV"  # Set to "PROD" for production environment, provide PROD details below
 
@@ -86,3 +244,4 @@ elif ENV == "PROD":
     # For PROD, we should allow more time between deployment, since the workload may be greater.
     APP_MONITOR_INTERVAL_SECONDS = 60
     DEPLOY_WAIT_TIME_SECONDS = 120
+    DEPLOY_RATE_PER_MINUTE = 2
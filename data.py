@@ -1,5 +1,14 @@
 import csv
 import datetime
+import heapq
+import copy
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
 from functools import reduce
 
 # pip install google google.cloud google-cloud-bigquery
@@ -7,14 +16,19 @@ from google.cloud import bigquery
 from typing import List
 from tinydb import TinyDB, Query
 
+import contextlib
 import re
 
 import config
+import metrics
+from scheduler import get_scheduler
 
 class QueryResult:
     def __init__(self, roworder, query, targettbl, appname = None, _id = None, status = None, namespace = None,
                  started_datetime = None, finished_datetime = None, notes = None, uniquerunid=None,
-                 iscurrentrow=True):
+                 iscurrentrow=True, est_rows=None, est_bytes=None, priority=None, cluster=None,
+                 leaseowner=None, leaseexpires=None, upload_seconds=None, deploy_seconds=None, start_seconds=None,
+                 load_seconds=None, undeploy_seconds=None, drop_seconds=None, nsreset_seconds=None):
         self.roworder = roworder
         self.id = _id
         self.query = query
@@ -27,30 +41,310 @@ class QueryResult:
         self.notes = notes
         self.uniquerunid = uniquerunid
         self.iscurrentrow = iscurrentrow
+        self.est_rows = est_rows        # Optional estimates from queryfile.txt, used by the lpt scheduler
+        self.est_bytes = est_bytes
+        self.priority = priority        # Optional; higher priority chunks are launched first
+        self.cluster = cluster          # Name of the Striim cluster (STRIIM_CLUSTERS) the chunk's app was created on
+        self.leaseowner = leaseowner    # SHARDED_WORKERS: worker currently responsible for the chunk (see claim_record)
+        self.leaseexpires = leaseexpires  # ... until this time (naive UTC), unless the worker renews it
+        # Seconds spent in each lifecycle phase (see PHASES), from a monotonic clock; retries add up
+        self.upload_seconds = upload_seconds        # TQL sent to Striim (CREATE APPLICATION ...)
+        self.deploy_seconds = deploy_seconds        # DEPLOY APPLICATION
+        self.start_seconds = start_seconds          # START APPLICATION
+        self.load_seconds = load_seconds            # START until the app (or its source, if packed) was seen finished
+        self.undeploy_seconds = undeploy_seconds    # UNDEPLOY APPLICATION
+        self.drop_seconds = drop_seconds            # DROP APPLICATION
+        self.nsreset_seconds = nsreset_seconds      # namespace drop / create, before the upload and after the drop
+
+
+# Lifecycle phases timed for every chunk, each stored in a <phase>_seconds column
+PHASES = ['upload', 'deploy', 'start', 'load', 'undeploy', 'drop', 'nsreset']
+
+
+def add_phase_seconds(query_results, phase, seconds):
+    """
+    Adds seconds spent in phase (see PHASES) to each row, e.g. the rows of a packed app share its deploy.
+    """
+    column = phase + '_seconds'
+    for query_result in query_results:
+        setattr(query_result, column, (getattr(query_result, column) or 0.0) + seconds)
 
 
 current_status: List[QueryResult] = []
 
+
+class QueryResultIndex:
+    """
+    In-memory lookups over the current query_results list, so a review tick costs O(changes) instead of
+    O(apps x chunks).
+
+    Keeps rows by id, RUNNING rows by namespace, warm (deployed, not started) rows, a heap of pending rows in launch
+    order (see scheduler.py, config.CHUNK_SCHEDULER), and a count of rows that are not yet done. Any row whose status or
+    namespace changes must be passed to refresh() (main.saveQueryResult does this on every save).
+
+    Usage: query_index = QueryResultIndex(query_results)
+           qry = query_index.running_in_namespace(app.namespace)
+    """
+
+    def __init__(self, query_results, scheduler=None):
+        self.scheduler = scheduler or get_scheduler()
+        self.rebuild(query_results)
+
+    def rebuild(self, query_results):
+        self.scheduler.reset()
+        self.query_results = query_results
+        self.positions = {}     # id -> position in query_results
+        self.running = {}       # namespace -> {id: RUNNING QueryResult} (several rows when chunks are packed into one app)
+        self.warm = {}          # id -> DEPLOYED (warm pool) QueryResult
+        self.indexed = {}       # id -> (status, namespace) as last indexed
+        self.pending = []       # heap of (scheduler key, id)
+        self.unfinished = 0
+        for position, qry in enumerate(query_results):
+            self.positions[qry.id] = position
+            self._add(qry)
+
+    def _is_pending(self, qry):
+        return qry.status not in config.NEW_EXCLUDES_STATUSES and not lease_held_by_other(qry)
+
+    def _add(self, qry):
+        self.indexed[qry.id] = (qry.status, qry.namespace)
+        if qry.status in config.RUNNING_STATUSES and qry.namespace:
+            self.running.setdefault(qry.namespace, {})[qry.id] = qry
+        if qry.status in config.WARM_STATUSES:
+            self.warm[qry.id] = qry
+        if self._is_pending(qry):
+            heapq.heappush(self.pending, (self.scheduler.key(qry), qry.id))
+        if qry.status not in config.DONE_STATUSES:
+            self.unfinished = self.unfinished + 1
+
+    def _remove(self, record_id):
+        status, namespace = self.indexed.pop(record_id)
+        if status in config.RUNNING_STATUSES and namespace and record_id in self.running.get(namespace, {}):
+            del self.running[namespace][record_id]
+            if not self.running[namespace]:
+                del self.running[namespace]
+        self.warm.pop(record_id, None)
+        if status not in config.DONE_STATUSES:
+            self.unfinished = self.unfinished - 1
+        # Stale pending heap entries are skipped lazily in peek_pending()
+
+    def get(self, record_id):
+        position = self.positions.get(record_id)
+        return self.query_results[position] if position is not None else None
+
+    def running_in_namespace(self, namespace):
+        rows = self.running_rows_in_namespace(namespace)
+        return rows[0] if rows else None
+
+    def running_rows_in_namespace(self, namespace):
+        """
+        Returns every RUNNING row of the app in namespace (more than one for a packed app), in id order.
+        """
+        return sorted(self.running.get(namespace, {}).values(), key=lambda qry: qry.id)
+
+    def running_namespaces(self):
+        return set(self.running.keys())
+
+    def warm_rows(self):
+        """
+        Returns the deployed but not yet started rows, in roworder.
+        """
+        return sorted(self.warm.values(), key=lambda qry: qry.roworder)
+
+    def warm_namespaces(self):
+        return set(qry.namespace for qry in self.warm.values() if qry.namespace)
+
+    def warm_count(self):
+        # Apps, not rows: the rows of a packed app share one namespace
+        return len(self.warm_namespaces())
+
+    def refresh(self, qry):
+        """
+        Re-indexes a row after its status or namespace changed.
+        """
+        if qry.id in self.indexed:
+            self._remove(qry.id)
+        self._add(qry)
+
+    def replace(self, old_id, new_result):
+        """
+        Puts new_result in place of the row with old_id (for example a new version of the same chunk).
+        """
+        position = self.positions.pop(old_id, None)
+        if old_id in self.indexed:
+            self._remove(old_id)
+        if position is None:
+            position = len(self.query_results)
+            self.query_results.append(new_result)
+        else:
+            self.query_results[position] = new_result
+        self.positions[new_result.id] = position
+        self._add(new_result)
+
+    def append(self, new_result):
+        """
+        Adds a new row (for example one piece of a split chunk) to the end of query_results.
+        """
+        self.replace(new_result.id, new_result)
+
+    def peek_pending(self):
+        """
+        Returns the next pending row in launch order without removing it, or None.
+        """
+        while self.pending:
+            key, record_id = self.pending[0]
+            qry = self.get(record_id)
+            if qry is not None and self._is_pending(qry):
+                return qry
+            heapq.heappop(self.pending)
+        return None
+
+    def pop_pending(self):
+        qry = self.peek_pending()
+        if qry is not None:
+            heapq.heappop(self.pending)
+        return qry
+
+    def unfinished_count(self):
+        return self.unfinished
+
+    def pending_count(self):
+        # A full pass over the rows (the pending heap keeps stale entries); for metrics, not the review loop
+        return len([qry for qry in self.query_results if self._is_pending(qry)])
+
+# Columns persisted for every QueryResult, with their BigQuery type (see BQ_TableCreate.sql)
+STATE_COLUMNS = [
+    ('id', 'INTEGER'),
+    ('roworder', 'INTEGER'),
+    ('uniquerunid', 'INTEGER'),
+    ('query', 'STRING'),
+    ('appname', 'STRING'),
+    ('targettbl', 'STRING'),
+    ('status', 'STRING'),
+    ('namespace', 'STRING'),
+    ('started_datetime', 'TIMESTAMP'),
+    ('finished_datetime', 'TIMESTAMP'),
+    ('notes', 'STRING'),
+    ('iscurrentrow', 'BOOL'),
+    ('est_rows', 'INTEGER'),
+    ('est_bytes', 'INTEGER'),
+    ('priority', 'INTEGER'),
+    ('cluster', 'STRING'),
+    ('leaseowner', 'STRING'),
+    ('leaseexpires', 'TIMESTAMP'),
+] + [(phase + '_seconds', 'FLOAT') for phase in PHASES]
+
 # Function to determine which database to use
 def get_database():
     if config.STAGE_DB_LOCATION.upper() in ('BQ', 'BIGQUERY'):
         return 'BQ'
+    elif config.STAGE_DB_LOCATION.upper() == 'JOURNAL':
+        return 'Journal'
+    elif config.STAGE_DB_LOCATION.upper() == 'SQLITE':
+        return 'SQLite'
     else:
         return 'TinyDB'
 
+DATETIME_FORMAT = '%Y-%m-%d %H:%M:%S.%f'
+
+def query_result_to_dict(query_result):
+    """
+    Converts a QueryResult into a JSON friendly dict (datetimes as strings), as stored by the local backends.
+    """
+    result_dict = query_result.__dict__.copy()
+    if result_dict.get('started_datetime'):
+        result_dict['started_datetime'] = result_dict['started_datetime'].strftime(DATETIME_FORMAT)
+    if result_dict.get('finished_datetime'):
+        result_dict['finished_datetime'] = result_dict['finished_datetime'].strftime(DATETIME_FORMAT)
+    if result_dict.get('leaseexpires'):
+        result_dict['leaseexpires'] = result_dict['leaseexpires'].strftime(DATETIME_FORMAT)
+    return result_dict
+
+def query_result_from_dict(row_dict):
+    """
+    Builds a QueryResult from a dict written by query_result_to_dict.
+    """
+    started_datetime_str = row_dict.get('started_datetime')
+    started_datetime = datetime.datetime.strptime(started_datetime_str, DATETIME_FORMAT) if started_datetime_str else None
+
+    finished_datetime_str = row_dict.get('finished_datetime')
+    finished_datetime = datetime.datetime.strptime(finished_datetime_str, DATETIME_FORMAT) if finished_datetime_str else None
+
+    leaseexpires_str = row_dict.get('leaseexpires')
+    leaseexpires = datetime.datetime.strptime(leaseexpires_str, DATETIME_FORMAT) if leaseexpires_str else None
+
+    # Ensure all necessary fields from QueryResult are handled, using .get() for robustness
+    return QueryResult(
+        roworder=row_dict.get('roworder'),
+        _id=row_dict.get('id'),  # In TinyDB, documents have 'doc_id', but you store your own 'id'
+        uniquerunid=row_dict.get('uniquerunid'),
+        query=row_dict.get('query'),
+        appname=row_dict.get('appname'),
+        targettbl=row_dict.get('targettbl'),
+        status=row_dict.get('status'),
+        namespace=row_dict.get('namespace'),
+        started_datetime=started_datetime,
+        finished_datetime=finished_datetime,
+        notes=row_dict.get('notes'),
+        iscurrentrow=row_dict.get('iscurrentrow', False),  # Default to False if missing
+        est_rows=row_dict.get('est_rows'),
+        est_bytes=row_dict.get('est_bytes'),
+        priority=row_dict.get('priority'),
+        cluster=row_dict.get('cluster'),
+        leaseowner=row_dict.get('leaseowner'),
+        leaseexpires=leaseexpires,
+        **{phase + '_seconds': row_dict.get(phase + '_seconds') for phase in PHASES}
+    )
+
+def parse_where_clause(where_clause_str):
+    """
+    Parses the simple where clauses used by this program (iscurrentrow / uniquerunid) for the local backends.
+
+    Returns:
+        dict: field -> required value. Empty dict for an empty where clause, None if the clause is not understood.
+    """
+    conditions = {}
+
+    # Parse "iscurrentrow = True" or "iscurrentrow = False"
+    is_current_match = re.search(r"iscurrentrow\s*=\s*(True|False)", where_clause_str, re.IGNORECASE)
+    if is_current_match:
+        conditions['iscurrentrow'] = is_current_match.group(1).lower() == 'true'
+
+    # Parse "uniquerunid = <number>"
+    unique_run_id_match = re.search(r"uniquerunid\s*=\s*(\d+)", where_clause_str)
+    if unique_run_id_match:
+        conditions['uniquerunid'] = int(unique_run_id_match.group(1))
+
+    # Add more parsers for other fields if needed in the future
+
+    if not conditions and where_clause_str.strip():
+        return None
+    return conditions
+
+def _optional_int(row, column, order):
+    if len(row) <= column or not row[column].strip():
+        return None
+    try:
+        return int(float(row[column].strip().replace(',', '')))
+    except ValueError:
+        raise ValueError(f"{config.QUERY_FILE} line {order}, column {column + 1}: expected a number, got '{row[column]}'")
+
 def read_csv_to_query_results():
     query_results = []
     with open(config.QUERY_FILE_PATH, 'r') as csvfile:
         reader = csv.reader(csvfile, delimiter=config.QUERY_FILE_DELIMITER)
 
-        # New file requires only two columns on import.
+        # New file requires only two columns on import. Optional 3rd-5th columns: est_rows|est_bytes|priority (blank = unknown)
         for order, row in enumerate(reader, start=1):
             # Skip any empty row
             if len(row) > 0:
                 query_result = QueryResult(
                     roworder=order,
                     query=row[0],
-                    targettbl=row[1]
+                    targettbl=row[1],
+                    est_rows=_optional_int(row, 2, order),
+                    est_bytes=_optional_int(row, 3, order),
+                    priority=_optional_int(row, 4, order)
                 )
                 query_results.append(query_result)
     return query_results
@@ -61,23 +355,49 @@ def read_csv_to_query_results():
 # ************************************************************************************
 # ************************************************************************************
 
+@contextlib.contextmanager
+def tinydb_process_lock():
+    """
+    With SHARDED_WORKERS, serializes TinyDB access across orchestrator processes (TinyDB rewrites the whole file on
+    every change) through an exclusive lock file next to TINYDB_PATH. A lock older than LEASE_SECONDS is assumed to be
+    left behind by a crashed worker and is broken.
+    """
+    if not config.SHARDED_WORKERS:
+        yield
+        return
+
+    lock_path = config.TINYDB_PATH + '.lock'
+    while True:
+        try:
+            fd = os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            break
+        except FileExistsError:
+            try:
+                if time.time() - os.path.getmtime(lock_path) > config.LEASE_SECONDS:
+                    os.remove(lock_path)
+                    continue
+            except OSError:
+                continue
+            time.sleep(0.05)
+    try:
+        yield
+    finally:
+        os.close(fd)
+        os.remove(lock_path)
+
 # New functions to write data to TinyDB
 def write_to_tinydb(query_results):
-    db = TinyDB(config.TINYDB_PATH)
+    with tinydb_process_lock():
+        db = TinyDB(config.TINYDB_PATH)
 
-    for result in query_results:
-        result_dict = result.__dict__.copy()
-        if result_dict.get('started_datetime'):
-            result_dict['started_datetime'] = result_dict['started_datetime'].strftime('%Y-%m-%d %H:%M:%S.%f')
-        if result_dict.get('finished_datetime'):
-            result_dict['finished_datetime'] = result_dict['finished_datetime'].strftime('%Y-%m-%d %H:%M:%S.%f')
-        db.insert(result_dict)
+        db.insert_multiple([query_result_to_dict(result) for result in query_results])
 
 
 def fetch_record_from_tinydb(record_id):
-    db = TinyDB(config.TINYDB_PATH)
-    Record = Query()
-    result = db.search(Record.id == record_id)
+    with tinydb_process_lock():
+        db = TinyDB(config.TINYDB_PATH)
+        Record = Query()
+        result = db.search(Record.id == record_id)
     if result:
         return result[0]  # Return the first match
     else:
@@ -85,61 +405,71 @@ def fetch_record_from_tinydb(record_id):
 
 
 def get_next_id_tinydb():
-    db = TinyDB(config.TINYDB_PATH)
-    if db.all():
-        max_id = max(item['id'] for item in db.all())
+    with tinydb_process_lock():
+        db = TinyDB(config.TINYDB_PATH)
+        rows = db.all()
+    if rows:
+        max_id = max(item['id'] for item in rows)
         return max_id + 1
     else:
         return 1
 
 
 def update_record_in_tinydb(query_result):
-    db = TinyDB(config.TINYDB_PATH)
-    Record = Query()
-    result_dict = query_result.__dict__.copy()
-    if result_dict.get('started_datetime'):
-        result_dict['started_datetime'] = result_dict['started_datetime'].strftime('%Y-%m-%d %H:%M:%S.%f')
-    if result_dict.get('finished_datetime'):
-        result_dict['finished_datetime'] = result_dict['finished_datetime'].strftime('%Y-%m-%d %H:%M:%S.%f')
-    db.update(result_dict, Record.id == query_result.id)
+    with tinydb_process_lock():
+        db = TinyDB(config.TINYDB_PATH)
+        Record = Query()
+        db.update(query_result_to_dict(query_result), Record.id == query_result.id)
 
 
 def clear_runid_tinydb(uniquerunid):
-    db = TinyDB(config.TINYDB_PATH)
-    Record = Query()
-    db.update({'iscurrentrow': False}, Record.iscurrentrow == True and Record.uniquerunid == uniquerunid)
+    with tinydb_process_lock():
+        db = TinyDB(config.TINYDB_PATH)
+        Record = Query()
+        db.update({'iscurrentrow': False}, Record.iscurrentrow == True and Record.uniquerunid == uniquerunid)
+
+
+def claim_record_in_tinydb(record_id, status, owner, now, expires):
+    with tinydb_process_lock():
+        db = TinyDB(config.TINYDB_PATH)
+        Record = Query()
+        row = db.get(Record.id == record_id)
+        if row is None or not row.get('iscurrentrow') or row.get('status') != status:
+            return False
+        if row.get('leaseowner') and row.get('leaseowner') != owner and row.get('leaseexpires') \
+                and row['leaseexpires'] > now.strftime(DATETIME_FORMAT):
+            return False
+        db.update({'leaseowner': owner, 'leaseexpires': expires.strftime(DATETIME_FORMAT)}, Record.id == record_id)
+        return True
+
+
+def renew_leases_in_tinydb(record_ids, owner, expires):
+    with tinydb_process_lock():
+        db = TinyDB(config.TINYDB_PATH)
+        Record = Query()
+        renewed = db.update({'leaseexpires': expires.strftime(DATETIME_FORMAT)},
+                            Record.id.one_of(list(record_ids)) & (Record.leaseowner == owner))
+        return [db.get(doc_id=doc_id)['id'] for doc_id in renewed]
 
 
 def read_from_tinydb(where_clause_str: str) -> List[QueryResult]:  # Added type hint for return
-    db = TinyDB(config.TINYDB_PATH)
-    Record = Query()  # TinyDB's Query object
+    with tinydb_process_lock():
+        return _read_from_tinydb(where_clause_str)
 
-    conditions = []
 
-    # Parse "iscurrentrow = True" or "iscurrentrow = False"
-    is_current_match = re.search(r"iscurrentrow\s*=\s*(True|False)", where_clause_str, re.IGNORECASE)
-    if is_current_match:
-        val = is_current_match.group(1).lower() == 'true'
-        conditions.append(Record.iscurrentrow == val)
+def _read_from_tinydb(where_clause_str):
+    db = TinyDB(config.TINYDB_PATH)
+    Record = Query()  # TinyDB's Query object
 
-    # Parse "uniquerunid = <number>"
-    unique_run_id_match = re.search(r"uniquerunid\s*=\s*(\d+)", where_clause_str)
-    if unique_run_id_match:
-        val = int(unique_run_id_match.group(1))
-        conditions.append(Record.uniquerunid == val)
-
-    # Add more parsers for other fields if needed in the future
+    parsed = parse_where_clause(where_clause_str)
 
     results_from_db = []
-    if conditions:
-        # Combine conditions using AND logic (implicit in TinyDB query construction)
-        final_query = conditions[0]
-        if len(conditions) > 1:
-            # For TinyDB, if you have multiple conditions for Record.field,
-            # you build them up using logical operators: (Query().field1 == val1) & (Query().field2 == val2)
-            final_query = reduce(lambda acc, cond: acc & cond, conditions)  # Pass conditions directly
+    if parsed:
+        # Combine conditions using AND logic: (Query().field1 == val1) & (Query().field2 == val2)
+        conditions = [Record[field] == value for field, value in parsed.items()]
+        final_query = reduce(lambda acc, cond: acc & cond, conditions)
         results_from_db = db.search(final_query)
-    elif not where_clause_str.strip():  # No where clause, get all (use with caution)
+    elif parsed is not None:  # No where clause, get all (use with caution)
         # This case is unlikely given current usage by update_and_get_current_status
         print(f"Warning: read_from_tinydb called with empty where_clause. Returning all documents.")
         results_from_db = db.all()
@@ -149,126 +479,383 @@ def read_from_tinydb(where_clause_str: str) -> List[QueryResult]:  # Added type
             f"Warning: Unhandled or complex where_clause in read_from_tinydb: '{where_clause_str}'. For safety, returning no results.")
         results_from_db = []
 
-    query_result_objects: List[QueryResult] = []  # Added type hint
-    for row_dict in results_from_db:  # Renamed 'row' to 'row_dict' for clarity
-        started_datetime_str = row_dict.get('started_datetime')
-        started_datetime = datetime.datetime.strptime(started_datetime_str,
-                                                      '%Y-%m-%d %H:%M:%S.%f') if started_datetime_str else None
-
-        finished_datetime_str = row_dict.get('finished_datetime')
-        finished_datetime = datetime.datetime.strptime(finished_datetime_str,
-                                                       '%Y-%m-%d %H:%M:%S.%f') if finished_datetime_str else None
-
-        # Ensure all necessary fields from QueryResult are handled, using .get() for robustness
-        query_result = QueryResult(
-            roworder=row_dict.get('roworder'),
-            _id=row_dict.get('id'),  # In TinyDB, documents have 'doc_id', but you store your own 'id'
-            uniquerunid=row_dict.get('uniquerunid'),
-            query=row_dict.get('query'),
-            appname=row_dict.get('appname'),
-            targettbl=row_dict.get('targettbl'),
-            status=row_dict.get('status'),
-            namespace=row_dict.get('namespace'),
-            started_datetime=started_datetime,
-            finished_datetime=finished_datetime,
-            notes=row_dict.get('notes'),
-            iscurrentrow=row_dict.get('iscurrentrow', False)  # Default to False if missing
-        )
-        query_result_objects.append(query_result)
+    query_result_objects: List[QueryResult] = [query_result_from_dict(row_dict) for row_dict in results_from_db]
     return query_result_objects
 
 
 # ************************************************************************************
 # ************************************************************************************
-# ******************************** BigQuery ******************************************
+# ********************************* Journal ******************************************
 # ************************************************************************************
 # ************************************************************************************
 
+# Append-only journal: every state change is appended as one JSON line to JOURNAL_PATH, and the current view is
+# kept in memory (id -> row dict). Every JOURNAL_COMPACT_EVERY entries the view is written to JOURNAL_SNAPSHOT_PATH
+# (temp file + atomic rename) and the journal is truncated. On startup the snapshot is loaded and the journal replayed;
+# a partially written last line (crash mid-append) is ignored and cut off, so the next entry starts on a line of its own.
+# Entries are flushed to the OS after every append, which survives a process crash; they only survive a host crash or
+# power loss with JOURNAL_FSYNC = True (fsync after every entry).
+
+journal_rows = None
+journal_file = None
+journal_entries_since_compact = 0
+journal_lock = threading.Lock()
+
+def _journal_load():
+    global journal_rows, journal_file, journal_entries_since_compact
+    if journal_rows is not None:
+        return
+
+    rows = {}
+    if os.path.exists(config.JOURNAL_SNAPSHOT_PATH):
+        with open(config.JOURNAL_SNAPSHOT_PATH, 'r') as snapshot:
+            for row in json.load(snapshot):
+                rows[row['id']] = row
+
+    entries = 0
+    if os.path.exists(config.JOURNAL_PATH):
+        with open(config.JOURNAL_PATH, 'rb') as journal:
+            content = journal.read()
+        for line in content.splitlines():
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                print("Warning: ignoring incomplete journal entry (likely interrupted write)")
+                continue
+            _journal_apply(rows, entry)
+            entries = entries + 1
+
+        # Cut a torn last line off; appending after it would merge the next entry into the same (unreadable) line
+        if content and not content.endswith(b'\n'):
+            with open(config.JOURNAL_PATH, 'rb+') as journal:
+                journal.truncate(content.rfind(b'\n') + 1)
+
+    journal_rows = rows
+    journal_entries_since_compact = entries
+    journal_file = open(config.JOURNAL_PATH, 'a')
+
+def _journal_apply(rows, entry):
+    if entry['op'] == 'put':
+        for row in entry['rows']:
+            rows[row['id']] = row
+    elif entry['op'] == 'clear':
+        for row in rows.values():
+            if row.get('uniquerunid') == entry['uniquerunid']:
+                row['iscurrentrow'] = False
+
+def _journal_append(entry):
+    global journal_entries_since_compact
+    _journal_apply(journal_rows, entry)
+    journal_file.write(json.dumps(entry) + '\n')
+    journal_file.flush()
+    if config.JOURNAL_FSYNC:
+        os.fsync(journal_file.fileno())
+
+    journal_entries_since_compact = journal_entries_since_compact + 1
+    if journal_entries_since_compact >= config.JOURNAL_COMPACT_EVERY:
+        _journal_compact()
+
+def _journal_compact():
+    global journal_file, journal_entries_since_compact
+    temp_path = config.JOURNAL_SNAPSHOT_PATH + '.tmp'
+    with open(temp_path, 'w') as snapshot:
+        json.dump(list(journal_rows.values()), snapshot)
+        snapshot.flush()
+        os.fsync(snapshot.fileno())
+    os.replace(temp_path, config.JOURNAL_SNAPSHOT_PATH)
+
+    # Replaying the old journal over the new snapshot is harmless, so a crash before this truncate is safe
+    journal_file.close()
+    journal_file = open(config.JOURNAL_PATH, 'w')
+    journal_entries_since_compact = 0
+
+def write_to_journal(query_results):
+    with journal_lock:
+        _journal_load()
+        _journal_append({'op': 'put', 'rows': [query_result_to_dict(result) for result in query_results]})
+
+def fetch_record_from_journal(record_id):
+    with journal_lock:
+        _journal_load()
+        row = journal_rows.get(record_id)
+        return dict(row) if row else None
+
+def get_next_id_journal():
+    with journal_lock:
+        _journal_load()
+        return max(journal_rows.keys()) + 1 if journal_rows else 1
+
+def update_record_in_journal(query_result):
+    with journal_lock:
+        _journal_load()
+        _journal_append({'op': 'put', 'rows': [query_result_to_dict(query_result)]})
+
+def clear_runid_journal(uniquerunid):
+    with journal_lock:
+        _journal_load()
+        _journal_append({'op': 'clear', 'uniquerunid': uniquerunid})
+
+def read_from_journal(where_clause_str: str) -> List[QueryResult]:
+    with journal_lock:
+        _journal_load()
+        parsed = parse_where_clause(where_clause_str)
+        if parsed is None:
+            print(f"Warning: Unhandled or complex where_clause in read_from_journal: '{where_clause_str}'. For safety, returning no results.")
+            return []
+
+        return [query_result_from_dict(row) for row in journal_rows.values()
+                if all(row.get(field) == value for field, value in parsed.items())]
+
+def compact_journal():
+    with journal_lock:
+        if journal_rows is not None:
+            _journal_compact()
 
-# New function to write data to BigQuery
-def write_to_bigquery(query_results):
-    client = bigquery.Client.from_service_account_json(config.BQ_KEYFILE_LOCATION)
-    table_id = f"{config.PROJECT_ID}.{config.DATASET_ID}.{config.TABLE_ID}"
-
-
-    values = ", ".join([
-        f"({result.id}, {result.roworder}, '{result.uniquerunid}', '{result.query}', '{result.appname}', '{result.targettbl}', '{result.status}', '{result.namespace}', '{result.started_datetime.strftime('%Y-%m-%d %H:%M:%S.%f') if result.started_datetime else None}', '{result.finished_datetime.strftime('%Y-%m-%d %H:%M:%S.%f') if result.finished_datetime else None}', '{result.notes}', {result.iscurrentrow})"
-        for result in query_results
-    ])
-
-    # Construct the MERGE query
-    merge_query = f"""
-            MERGE INTO `{table_id}` T
-            USING (
-                SELECT 
-                    id,
-                    roworder, 
-                    uniquerunid, 
-                    query, 
-                    appname, 
-                    targettbl, 
-                    status, 
-                    namespace, 
-                    started_datetime, 
-                    finished_datetime, 
-                    notes, 
-                    iscurrentrow
-                FROM (VALUES {values}) AS S(id, roworder, uniquerunid, query, appname, targettbl, status, namespace, started_datetime, finished_datetime, notes, iscurrentrow)
-            ) S
-            ON T.id = S.id
-            WHEN MATCHED THEN
-                UPDATE SET 
-                    roworder = S.roworder,
-                    uniquerunid = S.uniquerunid,
-                    query = S.query,
-                    appname = S.appname,
-                    targettbl = S.targettbl,
-                    status = S.status,
-                    namespace = S.namespace,
-                    started_datetime = S.started_datetime,
-                    finished_datetime = S.finished_datetime,
-                    notes = S.notes,
-                    iscurrentrow = S.iscurrentrow
-            WHEN NOT MATCHED THEN
-                INSERT (id, roworder, uniquerunid, query, appname, targettbl, status, namespace, started_datetime, finished_datetime, notes, iscurrentrow)
-                VALUES (S.id, S.roworder, S.uniquerunid, S.query, S.appname, S.targettbl, S.status, S.namespace, S.started_datetime, S.finished_datetime, S.notes, S.iscurrentrow)
-        """
 
-    schar = "'"
+# ************************************************************************************
+# ************************************************************************************
+# ********************************* SQLite *******************************************
+# ************************************************************************************
+# ************************************************************************************
+
+# SQLite in WAL mode: lookups by (uniquerunid, iscurrentrow), id and namespace are indexed, ids come from an
+# AUTOINCREMENT column, and other processes can read progress while the orchestrator writes.
+
+SQLITE_TABLE = 'striim_orchestration'
+SQLITE_TYPES = {'INTEGER': 'INTEGER', 'STRING': 'TEXT', 'TIMESTAMP': 'TEXT', 'BOOL': 'INTEGER', 'FLOAT': 'REAL'}
+
+sqlite_connection = None
+sqlite_lock = threading.Lock()
+
+def get_sqlite_connection():
+    global sqlite_connection
+    if sqlite_connection is None:
+        # One shared connection; access is serialized through sqlite_lock
+        connection = sqlite3.connect(config.SQLITE_PATH, check_same_thread=False, isolation_level=None)
+        connection.row_factory = sqlite3.Row
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        connection.execute("PRAGMA busy_timeout=5000")
+
+        columns = ", ".join([f"{name} {SQLITE_TYPES[col_type]}" for name, col_type in STATE_COLUMNS if name != 'id'])
+        connection.execute(f"CREATE TABLE IF NOT EXISTS {SQLITE_TABLE} (id INTEGER PRIMARY KEY AUTOINCREMENT, {columns})")
+
+        # Add any columns introduced after the table was created
+        existing = {row['name'] for row in connection.execute(f"PRAGMA table_info({SQLITE_TABLE})")}
+        for name, col_type in STATE_COLUMNS:
+            if name not in existing:
+                connection.execute(f"ALTER TABLE {SQLITE_TABLE} ADD COLUMN {name} {SQLITE_TYPES[col_type]}")
+
+        connection.execute(f"CREATE INDEX IF NOT EXISTS ix_{SQLITE_TABLE}_run_current ON {SQLITE_TABLE} (uniquerunid, iscurrentrow)")
+        connection.execute(f"CREATE INDEX IF NOT EXISTS ix_{SQLITE_TABLE}_namespace ON {SQLITE_TABLE} (namespace)")
+        _sqlite_throughput_table(connection)
+        sqlite_connection = connection
+    return sqlite_connection
+
+def _sqlite_values(query_result):
+    result_dict = query_result_to_dict(query_result)
+    return [result_dict.get(name) for name, col_type in STATE_COLUMNS]
+
+def _sqlite_row_to_query_result(row):
+    row_dict = dict(row)
+    row_dict['iscurrentrow'] = bool(row_dict.get('iscurrentrow'))
+    return query_result_from_dict(row_dict)
+
+def write_to_sqlite(query_results):
+    names = [name for name, col_type in STATE_COLUMNS]
+    placeholders = ", ".join(["?"] * len(names))
+    with sqlite_lock:
+        connection = get_sqlite_connection()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            connection.executemany(f"INSERT OR REPLACE INTO {SQLITE_TABLE} ({', '.join(names)}) VALUES ({placeholders})",
+                                   [_sqlite_values(result) for result in query_results])
+            connection.execute("COMMIT")
+        except Exception:
+            connection.execute("ROLLBACK")
+            raise
+
+def fetch_record_from_sqlite(record_id):
+    with sqlite_lock:
+        row = get_sqlite_connection().execute(f"SELECT * FROM {SQLITE_TABLE} WHERE id = ?", (record_id,)).fetchone()
+        if row:
+            row_dict = dict(row)
+            row_dict['iscurrentrow'] = bool(row_dict.get('iscurrentrow'))
+            return row_dict
+        return None
+
+def get_next_id_sqlite():
+    with sqlite_lock:
+        row = get_sqlite_connection().execute("SELECT seq FROM sqlite_sequence WHERE name = ?", (SQLITE_TABLE,)).fetchone()
+        return row['seq'] + 1 if row and row['seq'] is not None else 1
+
+def update_record_in_sqlite(query_result):
+    names = [name for name, col_type in STATE_COLUMNS if name != 'id']
+    values = _sqlite_values(query_result)[1:] + [query_result.id]
+    with sqlite_lock:
+        get_sqlite_connection().execute(f"UPDATE {SQLITE_TABLE} SET {', '.join([name + ' = ?' for name in names])} WHERE id = ?", values)
+
+def claim_record_in_sqlite(record_id, status, owner, now, expires):
+    # One conditional UPDATE, so two workers cannot both take the same row
+    with sqlite_lock:
+        cursor = get_sqlite_connection().execute(
+            f"UPDATE {SQLITE_TABLE} SET leaseowner = ?, leaseexpires = ? "
+            f"WHERE id = ? AND iscurrentrow = 1 AND status = ? "
+            f"AND (leaseowner IS NULL OR leaseowner = '' OR leaseowner = ? OR leaseexpires IS NULL OR leaseexpires <= ?)",
+            (owner, expires.strftime(DATETIME_FORMAT), record_id, status, owner, now.strftime(DATETIME_FORMAT)))
+        return cursor.rowcount == 1
+
+def renew_leases_in_sqlite(record_ids, owner, expires):
+    renewed = []
+    with sqlite_lock:
+        connection = get_sqlite_connection()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            for record_id in record_ids:
+                cursor = connection.execute(f"UPDATE {SQLITE_TABLE} SET leaseexpires = ? WHERE id = ? AND leaseowner = ?",
+                                            (expires.strftime(DATETIME_FORMAT), record_id, owner))
+                if cursor.rowcount == 1:
+                    renewed.append(record_id)
+            connection.execute("COMMIT")
+        except Exception:
+            connection.execute("ROLLBACK")
+            raise
+    return renewed
+
+def clear_runid_sqlite(uniquerunid):
+    with sqlite_lock:
+        get_sqlite_connection().execute(f"UPDATE {SQLITE_TABLE} SET iscurrentrow = 0 WHERE uniquerunid = ? AND iscurrentrow = 1", (uniquerunid,))
+
+def read_from_sqlite(where_clause_str: str) -> List[QueryResult]:
+    parsed = parse_where_clause(where_clause_str)
+    if parsed is None:
+        print(f"Warning: Unhandled or complex where_clause in read_from_sqlite: '{where_clause_str}'. For safety, returning no results.")
+        return []
+
+    sql = f"SELECT * FROM {SQLITE_TABLE}"
+    if parsed:
+        sql += " WHERE " + " AND ".join([field + " = ?" for field in parsed.keys()])
+    sql += " ORDER BY id"
+
+    with sqlite_lock:
+        rows = get_sqlite_connection().execute(sql, [int(value) if isinstance(value, bool) else value for value in parsed.values()]).fetchall()
+    return [_sqlite_row_to_query_result(row) for row in rows]
 
-    union_all_query = " UNION ALL ".join([
-        f"SELECT {result.id} AS id, {result.roworder} AS roworder, {result.uniquerunid} AS uniquerunid, '{result.query}' AS query, '{result.appname if result.appname else ''}' AS appname, '{result.targettbl}' AS targettbl, '{result.status if result.status else ''}' AS status, '{result.namespace if result.namespace else ''}' AS namespace, {(schar + result.started_datetime.strftime('%Y-%m-%d %H:%M:%S.%f') + schar) if result.finished_datetime else 'CAST(NULL AS TIMESTAMP)'} AS started_datetime, {(schar + result.finished_datetime.strftime('%Y-%m-%d %H:%M:%S.%f') + schar) if result.finished_datetime else 'CAST(NULL AS TIMESTAMP)'} AS finished_datetime, '{result.notes if result.notes else ''}' AS notes, {result.iscurrentrow if result.iscurrentrow else True} AS iscurrentrow"
-        for result in query_results
-    ])
 
-    merge_query = f"""
-            MERGE INTO `{table_id}` T
-            USING (
-                {union_all_query}
-            ) S
+# ************************************************************************************
+# ************************************************************************************
+# ******************************** BigQuery ******************************************
+# ************************************************************************************
+# ************************************************************************************
+
+
+bigquery_client = None
+
+# STATE_COLUMNS types -> query parameter types
+BQ_PARAM_TYPES = {'INTEGER': 'INT64', 'STRING': 'STRING', 'TIMESTAMP': 'TIMESTAMP', 'BOOL': 'BOOL', 'FLOAT': 'FLOAT64'}
+
+def get_bigquery_client():
+    """
+    Returns the BigQuery client for this process, creating it on first use. The keyfile is only read once.
+    """
+    global bigquery_client
+    if bigquery_client is None:
+        bigquery_client = bigquery.Client.from_service_account_json(config.BQ_KEYFILE_LOCATION)
+    return bigquery_client
+
+def get_bigquery_table_id():
+    return f"{config.PROJECT_ID}.{config.DATASET_ID}.{config.TABLE_ID}"
+
+def _bq_value(query_result, name):
+    value = getattr(query_result, name, None)
+    if name == 'iscurrentrow' and value is None:
+        return True
+    return value
+
+def _bq_row_to_query_result(row):
+    return QueryResult(
+        roworder=row.roworder,
+        _id=row.id,
+        uniquerunid=row.uniquerunid,
+        query=row.query,
+        appname=row.appname,
+        targettbl=row.targettbl,
+        status=row.status,
+        namespace=row.namespace,
+        started_datetime=row.started_datetime,
+        finished_datetime=row.finished_datetime,
+        notes=row.notes,
+        iscurrentrow=row.iscurrentrow,
+        est_rows=row.get('est_rows'),
+        est_bytes=row.get('est_bytes'),
+        priority=row.get('priority'),
+        cluster=row.get('cluster'),
+        # Lease times are compared as naive UTC, BigQuery returns them timezone aware
+        leaseexpires=row.get('leaseexpires').replace(tzinfo=None) if row.get('leaseexpires') else None,
+        leaseowner=row.get('leaseowner'),
+        **{phase + '_seconds': row.get(phase + '_seconds') for phase in PHASES})
+
+def _bq_merge_query(source):
+    """
+    MERGE of `source` (a subquery or table with the STATE_COLUMNS columns) into the orchestration table on id.
+    """
+    names = [name for name, col_type in STATE_COLUMNS]
+    return f"""
+            MERGE INTO `{get_bigquery_table_id()}` T
+            USING {source} S
             ON T.id = S.id
             WHEN MATCHED THEN
                 UPDATE SET 
-                    roworder = S.roworder,
-                    uniquerunid = S.uniquerunid,
-                    query = S.query,
-                    appname = S.appname,
-                    targettbl = S.targettbl,
-                    status = S.status,
-                    namespace = S.namespace,
-                    started_datetime = S.started_datetime,
-                    finished_datetime = S.finished_datetime,
-                    notes = S.notes,
-                    iscurrentrow = S.iscurrentrow
+                    {', '.join([f'{name} = S.{name}' for name in names if name != 'id'])}
             WHEN NOT MATCHED THEN
-                INSERT (id, roworder, uniquerunid, query, appname, targettbl, status, namespace, started_datetime, finished_datetime, notes, iscurrentrow)
-                VALUES (S.id, S.roworder, S.uniquerunid, S.query, S.appname, S.targettbl, S.status, S.namespace, S.started_datetime, S.finished_datetime, S.notes, S.iscurrentrow)
+                INSERT ({', '.join(names)})
+                VALUES ({', '.join(['S.' + name for name in names])})
         """
 
-    query_job = client.query(merge_query)
+# New function to write data to BigQuery
+def write_to_bigquery(query_results):
+    """
+    Upserts rows into BigQuery with one MERGE.
 
-    # Wait for the job to complete
-    query_job.result()
+    Up to BQ_MERGE_PARAM_MAX_ROWS rows are passed as a single array-of-struct query parameter. Larger sets
+    (for example a whole new plan) are loaded into a temporary staging table with one load job and merged from there,
+    instead of being inlined into the SQL text.
+    """
+    if not query_results:
+        return
+
+    client = get_bigquery_client()
+
+    if len(query_results) <= config.BQ_MERGE_PARAM_MAX_ROWS:
+        rows = [
+            bigquery.StructQueryParameter(
+                None,
+                *[bigquery.ScalarQueryParameter(name, BQ_PARAM_TYPES[col_type], _bq_value(result, name))
+                  for name, col_type in STATE_COLUMNS])
+            for result in query_results
+        ]
+        job_config = bigquery.QueryJobConfig(query_parameters=[bigquery.ArrayQueryParameter('rows', 'STRUCT', rows)])
+        query_job = client.query(_bq_merge_query("UNNEST(@rows)"), job_config=job_config)
+        query_job.result()
+    else:
+        staging_table_id = f"{get_bigquery_table_id()}_staging_{uuid.uuid4().hex}"
+        schema = [bigquery.SchemaField(name, col_type) for name, col_type in STATE_COLUMNS]
+        json_rows = []
+        for result in query_results:
+            json_row = {}
+            for name, col_type in STATE_COLUMNS:
+                value = _bq_value(result, name)
+                json_row[name] = value.isoformat() if isinstance(value, datetime.datetime) else value
+            json_rows.append(json_row)
+
+        load_job = client.load_table_from_json(json_rows, staging_table_id,
+                                               job_config=bigquery.LoadJobConfig(schema=schema, write_disposition='WRITE_TRUNCATE'))
+        load_job.result()
+        try:
+            query_job = client.query(_bq_merge_query(f"`{staging_table_id}`"))
+            query_job.result()
+        finally:
+            client.delete_table(staging_table_id, not_found_ok=True)
 
     if query_job.errors:
         print("Encountered errors while merging rows: {}".format(query_job.errors))
@@ -286,33 +873,24 @@ def fetch_record_from_bigquery(record_id):
     Returns:
         QueryResult: The QueryResult object representing the fetched record, or None if not found.
     """
-    client = bigquery.Client.from_service_account_json(config.BQ_KEYFILE_LOCATION)
-    table_id = f"{config.PROJECT_ID}.{config.DATASET_ID}.{config.TABLE_ID}"
+    with bq_buffer_lock:
+        if record_id in bq_pending_updates:
+            return copy.copy(bq_pending_updates[record_id])
+
+    client = get_bigquery_client()
 
     query = f"""
         SELECT *
-        FROM `{table_id}`
-        WHERE id = {record_id}
+        FROM `{get_bigquery_table_id()}`
+        WHERE id = @id
     """
+    job_config = bigquery.QueryJobConfig(query_parameters=[bigquery.ScalarQueryParameter('id', 'INT64', record_id)])
 
-    query_job = client.query(query)
+    query_job = client.query(query, job_config=job_config)
     results = query_job.result()
 
     for row in results:  # Should only be one row if ID is unique
-        return QueryResult(
-            roworder=row.roworder,
-            _id=row.id,
-            uniquerunid=row.uniquerunid,
-            query=row.query,
-            appname=row.appname,
-            targettbl=row.targettbl,
-            status=row.status,
-            namespace=row.namespace,
-            started_datetime=row.started_datetime,
-            finished_datetime=row.finished_datetime,
-            notes=row.notes,
-            iscurrentrow=row.iscurrentrow
-        )
+        return _bq_row_to_query_result(row)
 
     return None  # Return None if no record found
 
@@ -323,21 +901,59 @@ def get_next_id_bigquery():
     Returns:
         int: The next ID value.
     """
-    client = bigquery.Client.from_service_account_json(config.BQ_KEYFILE_LOCATION)
-    table_id = f"{config.PROJECT_ID}.{config.DATASET_ID}.{config.TABLE_ID}"
+    client = get_bigquery_client()
 
     query = f"""
         SELECT MAX(id) AS max_id
-        FROM `{table_id}`
+        FROM `{get_bigquery_table_id()}`
     """
 
     query_job = client.query(query)
     results = query_job.result()
 
+    # Buffered rows may carry ids that are not in the table yet
+    with bq_buffer_lock:
+        max_pending_id = max(bq_pending_updates.keys()) if bq_pending_updates else 0
+
     for row in results:
-        return row.max_id + 1 if row.max_id is not None else 1
+        return max(row.max_id if row.max_id is not None else 0, max_pending_id) + 1
+
+    return max_pending_id + 1  # Return 1 if the table is empty
 
-    return 1  # Return 1 if the table is empty
+# Write-behind buffer: with BQ_WRITE_BEHIND, updated rows are kept here (latest version per id) and merged into
+# BigQuery in one MERGE job when BQ_FLUSH_MAX_ROWS rows are dirty, BQ_FLUSH_INTERVAL_SECONDS have passed, at the
+# end of every review tick, and before any read.
+bq_pending_updates = {}
+bq_last_flush = time.monotonic()
+bq_buffer_lock = threading.RLock()
+
+def flush_bigquery(force=True):
+    """
+    Merges every buffered row into BigQuery with a single MERGE (see write_to_bigquery).
+
+    Args:
+        force (bool): When False, only flush if the size or time threshold has been reached.
+    """
+    global bq_pending_updates, bq_last_flush
+    with bq_buffer_lock:
+        if not bq_pending_updates:
+            bq_last_flush = time.monotonic()
+            return
+        if not force and len(bq_pending_updates) < config.BQ_FLUSH_MAX_ROWS \
+                and time.monotonic() - bq_last_flush < config.BQ_FLUSH_INTERVAL_SECONDS:
+            return
+
+        rows = list(bq_pending_updates.values())
+        bq_pending_updates = {}
+        try:
+            write_to_bigquery(rows)
+        except Exception:
+            # Put the rows back (without overwriting anything newer) so the next flush retries them
+            for row in rows:
+                bq_pending_updates.setdefault(row.id, row)
+            raise
+        bq_last_flush = time.monotonic()
+        print(f"Flushed {len(rows)} buffered rows to BigQuery")
 
 def update_record_in_bigquery(query_result, return_output = False):
     """
@@ -349,33 +965,44 @@ def update_record_in_bigquery(query_result, return_output = False):
     Returns:
         QueryResult: The updated QueryResult object fetched from BigQuery after the upsert.
     """
-    client = bigquery.Client.from_service_account_json(config.BQ_KEYFILE_LOCATION)
-    table_id = f"{config.PROJECT_ID}.{config.DATASET_ID}.{config.TABLE_ID}"
+    if config.BQ_WRITE_BEHIND:
+        if query_result.id is None:
+            print("Problem, should not have empty id")
+            raise NotImplementedError
+
+        with bq_buffer_lock:
+            bq_pending_updates[query_result.id] = copy.copy(query_result)
+        flush_bigquery(force=False)
+
+        # The buffered row is the latest version, so there is nothing to read back
+        if return_output:
+            return query_result
+        return
+
+    client = get_bigquery_client()
+    table_id = get_bigquery_table_id()
 
     # Check if it's an update or insert
     if query_result.id is None:
         print("Problem, should not have empty id")
         raise NotImplementedError
     else:
-        # Update existing record
+        # Update existing record; every value is passed as a query parameter
         update_fields = []
-        for attr, value in query_result.__dict__.items():
-            if attr != 'id' and value is not None:
-                if isinstance(value, datetime.datetime):
-                    value = f"CAST('{value.strftime('%Y-%m-%d %H:%M:%S.%f')}' AS TIMESTAMP)"
-                    update_fields.append(f"{attr} = {value}")
-                elif isinstance(value, (int, float)):
-                    update_fields.append(f"{attr} = {value}")
-                else:
-                    update_fields.append(f"{attr} = '{value}'")
+        query_parameters = [bigquery.ScalarQueryParameter('id', 'INT64', query_result.id)]
+        for name, col_type in STATE_COLUMNS:
+            value = getattr(query_result, name, None)
+            if name != 'id' and value is not None:
+                update_fields.append(f"{name} = @{name}")
+                query_parameters.append(bigquery.ScalarQueryParameter(name, BQ_PARAM_TYPES[col_type], value))
 
         update_query = f"""
             UPDATE `{table_id}`
             SET {', '.join(update_fields)}
-            WHERE id = {query_result.id}
+            WHERE id = @id
         """
 
-        query_job = client.query(update_query)
+        query_job = client.query(update_query, job_config=bigquery.QueryJobConfig(query_parameters=query_parameters))
         query_job.result()
 
         print(f"Record with ID {query_result.id} has been updated: SELECT * FROM `{table_id}` WHERE id = {query_result.id}")
@@ -384,18 +1011,66 @@ def update_record_in_bigquery(query_result, return_output = False):
         if return_output:
             return fetch_record_from_bigquery(query_result.id)
 
+def claim_record_in_bigquery(record_id, status, owner, now, expires):
+    """
+    Conditional DML: the lease is only taken if the row still has `status` and no other worker holds a live lease.
+    Concurrent DML on the table that conflicts with this one fails, which counts as not claimed.
+    """
+    # A buffered copy of this row would overwrite the lease columns on its next merge; other buffered rows do not matter
+    with bq_buffer_lock:
+        buffered = record_id in bq_pending_updates
+    if buffered:
+        flush_bigquery()
+
+    client = get_bigquery_client()
+    query = f"""
+        UPDATE `{get_bigquery_table_id()}`
+        SET leaseowner = @owner, leaseexpires = @expires
+        WHERE id = @id AND iscurrentrow = TRUE AND status = @status
+          AND (leaseowner IS NULL OR leaseowner = '' OR leaseowner = @owner OR leaseexpires IS NULL OR leaseexpires <= @now)
+    """
+    job_config = bigquery.QueryJobConfig(query_parameters=[
+        bigquery.ScalarQueryParameter('id', 'INT64', record_id),
+        bigquery.ScalarQueryParameter('status', 'STRING', status),
+        bigquery.ScalarQueryParameter('owner', 'STRING', owner),
+        bigquery.ScalarQueryParameter('now', 'TIMESTAMP', now),
+        bigquery.ScalarQueryParameter('expires', 'TIMESTAMP', expires)])
+    try:
+        query_job = client.query(query, job_config=job_config)
+        query_job.result()
+    except Exception as e:
+        print(f"Claim of id {record_id} failed: {e}")
+        return False
+    return query_job.num_dml_affected_rows == 1
+
+def renew_leases_in_bigquery(record_ids, owner, expires):
+    flush_bigquery()
+
+    client = get_bigquery_client()
+    table_id = get_bigquery_table_id()
+    parameters = [bigquery.ArrayQueryParameter('ids', 'INT64', list(record_ids)),
+                  bigquery.ScalarQueryParameter('owner', 'STRING', owner),
+                  bigquery.ScalarQueryParameter('expires', 'TIMESTAMP', expires)]
+    query_job = client.query(f"""
+        UPDATE `{table_id}` SET leaseexpires = @expires WHERE id IN UNNEST(@ids) AND leaseowner = @owner
+    """, job_config=bigquery.QueryJobConfig(query_parameters=parameters))
+    query_job.result()
+
+    query_job = client.query(f"""
+        SELECT id FROM `{table_id}` WHERE id IN UNNEST(@ids) AND leaseowner = @owner
+    """, job_config=bigquery.QueryJobConfig(query_parameters=parameters[:2]))
+    return [row.id for row in query_job.result()]
+
 def clear_runid_bigquery(uniquerunid):
     """
-    Updates or inserts a record in BigQuery based on the provided QueryResult object.
+    Marks every current row of a run as no longer current (iscurrentrow = FALSE).
 
     Args:
-        query_result (QueryResult): The QueryResult object representing the record to update or insert.
-
-    Returns:
-        QueryResult: The updated QueryResult object fetched from BigQuery after the upsert.
+        uniquerunid (int): The run to clear.
     """
-    client = bigquery.Client.from_service_account_json(config.BQ_KEYFILE_LOCATION)
-    table_id = f"{config.PROJECT_ID}.{config.DATASET_ID}.{config.TABLE_ID}"
+    flush_bigquery()
+
+    client = get_bigquery_client()
 
     # Check if it's an update or insert
     if uniquerunid is None:
@@ -405,55 +1080,157 @@ def clear_runid_bigquery(uniquerunid):
         # Update existing record
 
         update_query = f"""
-            UPDATE `{table_id}`
+            UPDATE `{get_bigquery_table_id()}`
             SET iscurrentrow = FALSE
-            WHERE iscurrentrow = TRUE AND uniquerunid = {config.UNIQUE_RUN_ID}
+            WHERE iscurrentrow = TRUE AND uniquerunid = @uniquerunid
         """
+        job_config = bigquery.QueryJobConfig(query_parameters=[bigquery.ScalarQueryParameter('uniquerunid', 'INT64', uniquerunid)])
 
-        query_job = client.query(update_query)
+        query_job = client.query(update_query, job_config=job_config)
         query_job.result()
 
         print(
-            f"Records with uniquerunid {config.UNIQUE_RUN_ID} has been updated as iscurrentrow = FALSE")
+            f"Records with uniquerunid {uniquerunid} has been updated as iscurrentrow = FALSE")
 
 
 def read_from_bigquery(where_clause):
-    client = bigquery.Client.from_service_account_json(config.BQ_KEYFILE_LOCATION)
-    table_id = f"{config.PROJECT_ID}.{config.DATASET_ID}.{config.TABLE_ID}"
+    flush_bigquery()
+
+    client = get_bigquery_client()
+
+    # Known where clauses are passed as query parameters; anything else is used as written
+    parsed = parse_where_clause(where_clause)
+    query_parameters = []
+    if parsed:
+        where_clause = " AND ".join([f"{field} = @{field}" for field in parsed.keys()])
+        query_parameters = [bigquery.ScalarQueryParameter(field, 'BOOL' if isinstance(value, bool) else 'INT64', value)
+                            for field, value in parsed.items()]
+    elif parsed is not None:
+        where_clause = "TRUE"
 
     query = f"""
         SELECT *
-        FROM `{table_id}`
+        FROM `{get_bigquery_table_id()}`
         WHERE {where_clause}
     """
 
-    query_job = client.query(query)  # Make an API request.
+    query_job = client.query(query, job_config=bigquery.QueryJobConfig(query_parameters=query_parameters))  # Make an API request.
 
     results = query_job.result()  # Wait for the job to complete.
 
     # Process the results and return them in a suitable format
-    # For example, you can return a list of dictionaries
-    query_result_objects = []
-
-    for row in results:
-        query_result = QueryResult(
-            roworder=row.roworder,
-            _id=row.id,
-            uniquerunid=row.uniquerunid,
-            query=row.query,
-            appname=row.appname,
-            targettbl=row.targettbl,
-            status=row.status,
-            namespace=row.namespace,
-            started_datetime=row.started_datetime,
-            finished_datetime=row.finished_datetime,
-            notes=row.notes,
-            iscurrentrow=row.iscurrentrow)
-
-        query_result_objects.append(query_result)
+    query_result_objects = [_bq_row_to_query_result(row) for row in results]
     return query_result_objects
 
 
+# ************************************************************************************
+# ************************************************************************************
+# ****************************** Throughput samples **********************************
+# ************************************************************************************
+# ************************************************************************************
+
+# One sample of a running chunk's app from mon (see throughput.py), kept apart from the orchestration rows: samples
+# are only ever appended, in batches, and read back for reports. 'sampled' is a DATETIME_FORMAT string.
+THROUGHPUT_COLUMNS = [
+    ('uniquerunid', 'INTEGER'),
+    ('chunkid', 'INTEGER'),
+    ('sampled', 'TIMESTAMP'),
+    ('rate', 'FLOAT'),
+    ('source_rate', 'FLOAT'),
+    ('cpu_rate', 'FLOAT'),
+    ('latest_activity', 'STRING'),
+]
+
+SQLITE_THROUGHPUT_TABLE = 'striim_throughput'
+TINYDB_THROUGHPUT_TABLE = 'throughput'
+
+def get_throughput_journal_path():
+    # Samples are not state, so they do not go through the journal (whose compaction would drop them)
+    return os.path.splitext(config.JOURNAL_PATH)[0] + '.throughput.jsonl'
+
+def get_bigquery_throughput_table_id():
+    return f"{config.PROJECT_ID}.{config.DATASET_ID}.{config.TABLE_ID}_throughput"
+
+def _sqlite_throughput_table(connection):
+    columns = ", ".join([f"{name} {SQLITE_TYPES[col_type]}" for name, col_type in THROUGHPUT_COLUMNS])
+    connection.execute(f"CREATE TABLE IF NOT EXISTS {SQLITE_THROUGHPUT_TABLE} ({columns})")
+    connection.execute(f"CREATE INDEX IF NOT EXISTS ix_{SQLITE_THROUGHPUT_TABLE}_run ON {SQLITE_THROUGHPUT_TABLE} (uniquerunid, chunkid)")
+
+def append_throughput_to_sqlite(samples):
+    names = [name for name, col_type in THROUGHPUT_COLUMNS]
+    with sqlite_lock:
+        connection = get_sqlite_connection()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            connection.executemany(f"INSERT INTO {SQLITE_THROUGHPUT_TABLE} ({', '.join(names)}) VALUES ({', '.join(['?'] * len(names))})",
+                                   [[sample.get(name) for name in names] for sample in samples])
+            connection.execute("COMMIT")
+        except Exception:
+            connection.execute("ROLLBACK")
+            raise
+
+def read_throughput_from_sqlite(uniquerunid):
+    with sqlite_lock:
+        rows = get_sqlite_connection().execute(f"SELECT * FROM {SQLITE_THROUGHPUT_TABLE} WHERE uniquerunid = ? ORDER BY chunkid, sampled",
+                                               (uniquerunid,)).fetchall()
+    return [dict(row) for row in rows]
+
+def append_throughput_to_tinydb(samples):
+    with tinydb_process_lock():
+        TinyDB(config.TINYDB_PATH).table(TINYDB_THROUGHPUT_TABLE).insert_multiple(samples)
+
+def read_throughput_from_tinydb(uniquerunid):
+    with tinydb_process_lock():
+        Sample = Query()
+        rows = TinyDB(config.TINYDB_PATH).table(TINYDB_THROUGHPUT_TABLE).search(Sample.uniquerunid == uniquerunid)
+    return sorted([dict(row) for row in rows], key=lambda row: (row['chunkid'], row['sampled']))
+
+def append_throughput_to_journal(samples):
+    with journal_lock:
+        with open(get_throughput_journal_path(), 'a') as fout:
+            fout.write(''.join(json.dumps(sample) + '\n' for sample in samples))
+
+def read_throughput_from_journal(uniquerunid):
+    rows = []
+    with journal_lock:
+        if not os.path.exists(get_throughput_journal_path()):
+            return rows
+        with open(get_throughput_journal_path(), 'r') as fin:
+            for line in fin:
+                try:
+                    row = json.loads(line)
+                except ValueError:
+                    continue
+                if row.get('uniquerunid') == uniquerunid:
+                    rows.append(row)
+    return sorted(rows, key=lambda row: (row['chunkid'], row['sampled']))
+
+def append_throughput_to_bigquery(samples):
+    # One load job per batch (appends are free of DML quotas); the table is created on first use
+    schema = [bigquery.SchemaField(name, col_type) for name, col_type in THROUGHPUT_COLUMNS]
+    load_job = get_bigquery_client().load_table_from_json(
+        samples, get_bigquery_throughput_table_id(),
+        job_config=bigquery.LoadJobConfig(schema=schema, write_disposition='WRITE_APPEND', create_disposition='CREATE_IF_NEEDED'))
+    load_job.result()
+
+def read_throughput_from_bigquery(uniquerunid):
+    query = f"""
+        SELECT *
+        FROM `{get_bigquery_throughput_table_id()}`
+        WHERE uniquerunid = @uniquerunid
+        ORDER BY chunkid, sampled
+    """
+    job_config = bigquery.QueryJobConfig(query_parameters=[bigquery.ScalarQueryParameter('uniquerunid', 'INT64', uniquerunid)])
+    rows = []
+    for row in get_bigquery_client().query(query, job_config=job_config).result():
+        row = dict(row.items())
+        # BigQuery returns timezone aware UTC timestamps; samples are written as naive local time strings
+        if isinstance(row.get('sampled'), datetime.datetime):
+            row['sampled'] = row['sampled'].replace(tzinfo=None).strftime(DATETIME_FORMAT)
+        rows.append(row)
+    return rows
+
+
 # ************************************************************************************
 # ************************************************************************************
 # ********************************* General ******************************************
@@ -464,6 +1241,10 @@ def write_data(query_results):
     db = get_database()
     if db == 'BQ':
         write_to_bigquery(query_results)
+    elif db == 'Journal':
+        write_to_journal(query_results)
+    elif db == 'SQLite':
+        write_to_sqlite(query_results)
     else:
         write_to_tinydb(query_results)
 
@@ -471,29 +1252,171 @@ def fetch_record(record_id):
     db = get_database()
     if db == 'BQ':
         return fetch_record_from_bigquery(record_id)
+    elif db == 'Journal':
+        return fetch_record_from_journal(record_id)
+    elif db == 'SQLite':
+        return fetch_record_from_sqlite(record_id)
     else:
         return fetch_record_from_tinydb(record_id)
 
 def get_next_id():
     db = get_database()
     if db == 'BQ':
-        return get_next_id_bigquery()
+        next_id = get_next_id_bigquery()
+    elif db == 'Journal':
+        next_id = get_next_id_journal()
+    elif db == 'SQLite':
+        next_id = get_next_id_sqlite()
     else:
-        return get_next_id_tinydb()
+        next_id = get_next_id_tinydb()
+
+    if config.SHARDED_WORKERS:
+        # Workers only hand out ids congruent to their WORKER_INDEX, so two workers adding rows at once cannot collide
+        next_id = next_id + (config.WORKER_INDEX - next_id) % config.WORKER_ID_STRIDE
+    return next_id
+
+def id_step():
+    # Distance between consecutive new ids handed out by this worker (see get_next_id)
+    return config.WORKER_ID_STRIDE if config.SHARDED_WORKERS else 1
 
 def update_record(query_result, return_output = False):
     db = get_database()
     if db == 'BQ':
         update_record_in_bigquery(query_result, return_output)
+    elif db == 'Journal':
+        update_record_in_journal(query_result)
+    elif db == 'SQLite':
+        update_record_in_sqlite(query_result)
     else:
         update_record_in_tinydb(query_result)
     if return_output:
         return query_result
 
+def split_record(query_result, queries, reason=""):
+    """
+    Replaces one row by a new row per query, using the iscurrentrow / new id versioning: the old row is kept as
+    history (status SPLIT, iscurrentrow = False) and the new rows are inserted as current, pending (NEW) rows.
+
+    Args:
+        query_result (QueryResult): The row being replaced (its app must already be stopped).
+        queries (list): Queries that together cover the same rows.
+        reason (str): Appended to the old row's notes.
+
+    Returns:
+        list: The new QueryResult rows, in the order of queries.
+    """
+    history = copy.copy(query_result)
+    history.status = 'SPLIT'
+    history.iscurrentrow = False
+    history.finished_datetime = datetime.datetime.now()
+    history.notes = (history.notes or "") + f"; Split into {len(queries)} chunks{reason}"
+    update_record(history)
+
+    next_id = get_next_id()
+    new_rows = []
+    for n, query in enumerate(queries):
+        new_rows.append(QueryResult(
+            roworder=query_result.roworder,
+            query=query,
+            targettbl=query_result.targettbl,
+            _id=next_id + n * id_step(),
+            status='NEW',
+            notes=f"Split {n + 1}/{len(queries)} of id {query_result.id}",
+            uniquerunid=query_result.uniquerunid,
+            iscurrentrow=True,
+            est_rows=int(query_result.est_rows / len(queries)) if query_result.est_rows is not None else None,
+            est_bytes=int(query_result.est_bytes / len(queries)) if query_result.est_bytes is not None else None,
+            priority=query_result.priority))
+    write_data(new_rows)
+    return new_rows
+
+# Leases (SHARDED_WORKERS): several orchestrator processes share one run. A worker takes a row with claim_record()
+# before acting on it and keeps it with renew_leases(); a row whose lease has expired (its worker crashed) can be
+# claimed by any other worker. Lease times are naive UTC.
+
+_worker_id = None
+
+def worker_id():
+    """
+    This process's name in leaseowner: WORKER_ID, or <host>-<pid>.
+    """
+    global _worker_id
+    if _worker_id is None:
+        _worker_id = config.WORKER_ID or f"{socket.gethostname()}-{os.getpid()}"
+    return _worker_id
+
+def lease_now():
+    return datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None)
+
+def lease_held_by_other(query_result, now=None):
+    """
+    True if another worker holds a lease on the row that has not expired.
+    """
+    if not config.SHARDED_WORKERS or not query_result.leaseowner or query_result.leaseowner == worker_id():
+        return False
+    return query_result.leaseexpires is not None and query_result.leaseexpires > (now or lease_now())
+
+def claim_record(query_result):
+    """
+    Takes the lease on a row for this worker for LEASE_SECONDS, only if its stored status is still query_result.status
+    and no other worker holds a live lease on it. The check and the update are one atomic step in each backend.
+
+    Returns:
+        bool: True if the lease was taken (query_result.leaseowner / leaseexpires are then set).
+    """
+    now = lease_now()
+    expires = now + datetime.timedelta(seconds=config.LEASE_SECONDS)
+    db = get_database()
+    if db == 'BQ':
+        claimed = claim_record_in_bigquery(query_result.id, query_result.status, worker_id(), now, expires)
+    elif db == 'Journal':
+        raise ValueError("SHARDED_WORKERS needs a state store shared by all workers: set STAGE_DB_LOCATION to SQLite, TinyDB or BQ")
+    elif db == 'SQLite':
+        claimed = claim_record_in_sqlite(query_result.id, query_result.status, worker_id(), now, expires)
+    else:
+        claimed = claim_record_in_tinydb(query_result.id, query_result.status, worker_id(), now, expires)
+
+    if claimed:
+        query_result.leaseowner = worker_id()
+        query_result.leaseexpires = expires
+    return claimed
+
+def renew_leases(query_results):
+    """
+    Extends this worker's leases on query_results by LEASE_SECONDS.
+
+    Returns:
+        list: The rows whose lease was lost (taken over by another worker after it expired).
+    """
+    if not query_results:
+        return []
+
+    expires = lease_now() + datetime.timedelta(seconds=config.LEASE_SECONDS)
+    record_ids = [query_result.id for query_result in query_results]
+    db = get_database()
+    if db == 'BQ':
+        renewed = renew_leases_in_bigquery(record_ids, worker_id(), expires)
+    elif db == 'Journal':
+        raise ValueError("SHARDED_WORKERS needs a state store shared by all workers: set STAGE_DB_LOCATION to SQLite, TinyDB or BQ")
+    elif db == 'SQLite':
+        renewed = renew_leases_in_sqlite(record_ids, worker_id(), expires)
+    else:
+        renewed = renew_leases_in_tinydb(record_ids, worker_id(), expires)
+
+    renewed = set(renewed)
+    for query_result in query_results:
+        if query_result.id in renewed:
+            query_result.leaseexpires = expires
+    return [query_result for query_result in query_results if query_result.id not in renewed]
+
 def clear_runid(uniquerunid):
     db = get_database()
     if db == 'BQ':
         clear_runid_bigquery(uniquerunid)
+    elif db == 'Journal':
+        clear_runid_journal(uniquerunid)
+    elif db == 'SQLite':
+        clear_runid_sqlite(uniquerunid)
     else:
         clear_runid_tinydb(uniquerunid)
 
@@ -501,9 +1424,54 @@ def read_data(where_clause):
     db = get_database()
     if db == 'BQ':
         return read_from_bigquery(where_clause)
+    elif db == 'Journal':
+        return read_from_journal(where_clause)
+    elif db == 'SQLite':
+        return read_from_sqlite(where_clause)
     else:
         return read_from_tinydb(where_clause)
 
+def append_throughput_samples(samples):
+    """
+    Appends a batch of throughput samples (dicts with the THROUGHPUT_COLUMNS keys) to the state store.
+    """
+    if not samples:
+        return
+    db = get_database()
+    if db == 'BQ':
+        append_throughput_to_bigquery(samples)
+    elif db == 'Journal':
+        append_throughput_to_journal(samples)
+    elif db == 'SQLite':
+        append_throughput_to_sqlite(samples)
+    else:
+        append_throughput_to_tinydb(samples)
+
+def read_throughput_samples(uniquerunid):
+    """
+    Returns every throughput sample of a run, ordered by chunk id and time.
+    """
+    db = get_database()
+    if db == 'BQ':
+        return read_throughput_from_bigquery(uniquerunid)
+    elif db == 'Journal':
+        return read_throughput_from_journal(uniquerunid)
+    elif db == 'SQLite':
+        return read_throughput_from_sqlite(uniquerunid)
+    else:
+        return read_throughput_from_tinydb(uniquerunid)
+
+def flush_data(force=True):
+    """
+    Writes out any buffered state changes. Call at the end of every review tick (force=False only flushes once a
+    size or time threshold is reached) and before shutting down (force=True).
+    """
+    db = get_database()
+    if db == 'BQ':
+        start = time.monotonic()
+        flush_bigquery(force)
+        metrics.FLUSH_SECONDS.observe(time.monotonic() - start)
+
 def set_current_status(status):
     global current_status
     current_status = status
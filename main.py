@@ -1,18 +1,33 @@
 # This is a sample Python script.
 import time
-import requests
 import datetime
+import copy
 import logging
-import os
 
 import config
 
 import json
 from collections import namedtuple
 
+import contextlib
 import csv
+import heapq
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
 
 from data import *
+from ratelimit import TokenBucket
+from straggler import StragglerDetector, seconds_between
+from throughput import ThroughputTracker
+from packing import is_packable, fits, source_name, follow, finished_sources
+from tqltemplate import get_template, audit_tql
+from cluster import load_clusters, cluster_for_namespace, cluster_by_name, is_worker_namespace
+from monitor import *
+import asyncengine
+import planner
+import reporting
+import metrics
 
 
 """
@@ -35,224 +50,93 @@ IL_Clean_Done = False
 # * This code is provided as a sample, in order to support being able to work with Striim's Rest API
 # * This code is not officially supported as part of Striim
 
-#generate REST API authentication token
-data = {'username': username, 'password': password}
-resp = requests.post(prefixh + node + '/security/authenticate', data=data)
-jkvp = json.loads(resp.text)
-sToken = jkvp['token'] if config.STRIIM_API_TOKEN == "" else config.STRIIM_API_TOKEN
-# sToken = '2E9LbUtMvDpM.AgclhtHhPtgaDKsq'
+# Striim clusters the chunks run on (STRIIM_CLUSTERS, or just STRIIM_NODE). Each has one shared REST API client: pooled
+# keep-alive connections, authenticates on first use and again on 'tkn' responses. Commands go to the calling thread's active cluster.
+striim_clusters = load_clusters(username, password)
+active_cluster = threading.local()
 logging.basicConfig(filename=log_output_path, level=logging.INFO, format='%(asctime)s:%(levelname)s:%(message)s')
 
-#define headers
-headers = {'authorization':'STRIIM-TOKEN ' + sToken, 'content-type': 'text/plain'}
-
 query_results = []
+query_index = QueryResultIndex(query_results)
 
 next_allowed_run = datetime.datetime.now()
 
+# Only used when config.FILL_ALL_SLOTS is True: paces deploys independently of the number of open slots
+deploy_limiter = TokenBucket(config.DEPLOY_RATE_PER_MINUTE, config.DEPLOY_BURST_MAX)
+
+# Only used when config.THROUGHPUT_TRACKING or config.STRAGGLER_SPLIT is True
+throughput_tracker = ThroughputTracker()
+
+# Only used when config.STRAGGLER_SPLIT is True; predicts durations from the throughput tracker's rows loaded estimate
+straggler_detector = StragglerDetector(throughput_tracker)
+
+# Row id -> name of the source that loads it, for rows packed into one app (PACK_CHUNKS)
+pack_sources = {}
+
+# Only used when config.SHARDED_WORKERS is True: next lease renewal / resync with the other workers
+next_heartbeat = datetime.datetime.now()
+
+# Row id -> time.monotonic() when its app was started, for load_seconds
+load_clock = {}
+
+# Only used when config.MON_MODE is 'targeted': runs the targeted mon requests of a review concurrently
+mon_executor = ThreadPoolExecutor(max_workers=config.MON_TARGETED_WORKERS, thread_name_prefix='mon')
+
 class StriimCommandResponse:
     def __init__(self, command, execution_status, response_code):
         self.command = command
         self.execution_status = execution_status
         self.response_code = response_code
 
-class StriimApplication:
-    def __init__(self, entity_type, full_name, status_change, rate, source_rate, cpu_rate, num_servers, latest_activity):
-        self.entity_type = entity_type
-        self.full_name = full_name
-        self.status_change = status_change
-        self.rate = rate
-        self.source_rate = source_rate
-        self.cpu_rate = cpu_rate
-        self.num_servers = num_servers
-        self.latest_activity = latest_activity
-        self.components = []
-        self.namespace = full_name.split('.')[0] if len(full_name.split('.')) > 1 else None
-
-    def add_component(self, component):
-        self.components.append(component)
-
-class StriimClusterNode:
-    def __init__(self, entity_type, name, version, free_memory, cpu_rate, uptime):
-        self.entity_type = entity_type
-        self.name = name
-        self.version = version
-        self.free_memory = free_memory
-        self.cpu_rate = cpu_rate
-        self.uptime = uptime
-
-class Elasticsearch:
-    def __init__(self, elasticsearchReceiveThroughput, elasticsearchTransmitThroughput, elasticsearchClusterStorageFree, elasticsearchClusterStorageTotal):
-        self.elasticsearchReceiveThroughput = elasticsearchReceiveThroughput
-        self.elasticsearchTransmitThroughput = elasticsearchTransmitThroughput
-        self.elasticsearchClusterStorageFree = elasticsearchClusterStorageFree
-        self.elasticsearchClusterStorageTotal = elasticsearchClusterStorageTotal
-
-#
-#  Usage: striim_apps, striim_nodes, es_nodes, response_valid = map_mon_json_response(json_response)
-#
-
-def map_mon_json_response(json_response):
-    parsed_json = json_response
-    striim_applications = []
-    striim_cluster_nodes = []
-    elasticsearch_nodes = []
-
-    response_valid = True  # Assume valid initially
-
-    # --- Section 1: Striim Applications (determines global response_valid) ---
-    try:
-        # Basic structural validation for striimApplications path
-        if not (parsed_json and isinstance(parsed_json, list) and len(parsed_json) > 0 and
-                isinstance(parsed_json[0], dict) and "output" in parsed_json[0] and
-                isinstance(parsed_json[0]["output"], dict) and
-                "striimApplications" in parsed_json[0]["output"] and
-                isinstance(parsed_json[0]["output"]["striimApplications"], list)):
-            response_valid = False
-            applications_data = []
-        else:
-            applications_data = parsed_json[0]["output"]["striimApplications"]
-            # If applications_data is an empty list, the loop below won't run,
-            # and response_valid remains True, which is generally correct.
-            # If an empty list of apps itself should be invalid, add:
-            # if not applications_data: response_valid = False
-
-        if response_valid:  # Only proceed if basic structure was okay
-            for app_data in applications_data:
-                if not isinstance(app_data, dict):
-                    response_valid = False  # app_data item is not a dictionary
-                    break
-
-                # Critical check: "fullName" must exist and not be None
-                if "fullName" not in app_data or app_data.get("fullName") is None:
-                    response_valid = False
-                    break  # One missing/None fullName invalidates the response
-
-                # If fullName is present, proceed to create StriimApplication object.
-                # The 'entityType' check is from your original code structure.
-                if "entityType" in app_data:
-                    striim_applications.append(
-                        StriimApplication(
-                            app_data["entityType"],
-                            app_data["fullName"],  # Known to exist and be non-None
-                            app_data.get("statusChange"),
-                            app_data.get("rate"),
-                            app_data.get("sourceRate"),
-                            app_data.get("cpuRate"),
-                            app_data.get("numServers"),
-                            app_data.get("latestActivity")
-                        )
-                    )
-                # If an app has fullName but no entityType, it's just not added to the list.
-                # This does not make response_valid False by this simplified rule.
-
-    except (TypeError, KeyError, IndexError) as e:
-        # Error during parsing of striimApplications structure
-        print(f"Error processing striimApplications: {e}")
-        response_valid = False
-
-    # If response is deemed invalid due to striimApplications, clear all lists
-    if not response_valid:
-        return [], [], [], False
-
-    # --- Section 2: Striim Cluster Nodes (populated if response_valid is still True) ---
-    try:
-        if (parsed_json and isinstance(parsed_json, list) and len(parsed_json) > 0 and
-                isinstance(parsed_json[0], dict) and "output" in parsed_json[0] and
-                isinstance(parsed_json[0]["output"], dict) and
-                "striimClusterNodes" in parsed_json[0]["output"] and
-                isinstance(parsed_json[0]["output"]["striimClusterNodes"], list)):
-
-            for node_data in parsed_json[0]["output"]["striimClusterNodes"]:
-                if isinstance(node_data, dict):
-                    # Using previous logic for adding nodes (e.g., entityType and version mandatory for addition)
-                    if "entityType" in node_data and "version" in node_data:
-                        striim_cluster_nodes.append(
-                            StriimClusterNode(
-                                node_data["entityType"],
-                                node_data.get("name", node_data.get("fullName")),
-                                node_data["version"],
-                                node_data.get("freeMemory"),
-                                node_data.get("cpuRate"),
-                                node_data.get("uptime")
-                            )
-                        )
-    except (TypeError, KeyError, IndexError) as e:
-        print(f"Warning: Error processing striimClusterNodes: {e}")
-        striim_cluster_nodes = []  # Clear if error, but doesn't make global response invalid here
-
-    # --- Section 3: Elasticsearch Nodes (populated if response_valid is still True) ---
+def activeCluster():
+    return getattr(active_cluster, 'cluster', None) or striim_clusters[0]
+
+@contextlib.contextmanager
+def onCluster(cluster):
+    """
+    Sends the commands run by this thread inside the block to cluster.
+    """
+    previous = getattr(active_cluster, 'cluster', None)
+    active_cluster.cluster = cluster
     try:
-        if (parsed_json and isinstance(parsed_json, list) and len(parsed_json) > 0 and
-                isinstance(parsed_json[0], dict) and "output" in parsed_json[0] and
-                isinstance(parsed_json[0]["output"], dict) and
-                "elasticsearch" in parsed_json[0]["output"] and
-                isinstance(parsed_json[0]["output"]["elasticsearch"], dict)):
-            es_data = parsed_json[0]["output"]["elasticsearch"]
-            elasticsearch_nodes.append(
-                Elasticsearch(
-                    es_data.get("elasticsearchReceiveThroughput"),
-                    es_data.get("elasticsearchTransmitThroughput"),
-                    es_data.get("elasticsearchClusterStorageFree"),
-                    es_data.get("elasticsearchClusterStorageTotal")
-                )
-            )
-    except (TypeError, KeyError, IndexError) as e:
-        print(f"Warning: Error processing elasticsearch: {e}")
-        elasticsearch_nodes = []  # Clear if error
-
-    return striim_applications, striim_cluster_nodes, elasticsearch_nodes, response_valid
-
-# Example: update_application_components(applications[0], json_response)
-
-def update_application_components(application, json_response):
-    app_components = json.loads(json_response)[0]["output"]["striimApplications"][0]["applicationComponents"]
-    for component in app_components:
-        application.components.append(component)
+        yield cluster
+    finally:
+        active_cluster.cluster = previous
 
 def doDebugLog(text):
     if logDebug:
         print(text)
         logging.info(text)
 
-def runTQLFile(filePath, namespace):
-
-    fileContents = ""
+def runTQL(fileContents, namespace, resetNS = True):
 
-    with open(filePath, 'r') as file:
-        fileContents = file.read()
+    isSuccessful = True
 
-    print("Resetting namespace for use: " + namespace)
-    isSuccessful, failuremessage = resetNamespace(namespace, True)
+    # Pooled namespaces already exist and are reused as-is (the TQL uses CREATE OR REPLACE)
+    if resetNS:
+        print("Resetting namespace for use: " + namespace)
+        isSuccessful, failuremessage = resetNamespace(namespace, True)
 
     data = 'USE ' + namespace + '; ' + fileContents
 
     print(data)
 
     try:
-        resp = requests.post(prefixh + node + '/api/v2/tungsten', headers=headers, data=data)
-
-        if 'reason' in resp.text and 'tkn' in resp.text:
-            doDebugLog("got bad response in mon (tkn), trying again")
-            # If the response is bad, let's try again in 1 second
-            time.sleep(1)
-            return runTQLFile(filePath)
-        else:
-            result = json.loads(resp.text)
-            print(result)
-            executionStatus = ""
-            failureMessage = ""
-            for row in result:
-                if executionStatus != "Failure":
-                    executionStatus = row.get('executionStatus')
-                if executionStatus == "Failure":
-                    failureMessage += row.get('failureMessage') + ";"
-                    isSuccessful = False
-
-            return isSuccessful, failureMessage
+        result = activeCluster().client.tungsten(data, config.STRIIM_TQL_TIMEOUT_SECONDS)
+        print(result)
+        executionStatus = ""
+        failureMessage = ""
+        for row in result:
+            if executionStatus != "Failure":
+                executionStatus = row.get('executionStatus')
+            if executionStatus == "Failure":
+                failureMessage += row.get('failureMessage') + ";"
+                isSuccessful = False
+
+        return isSuccessful, failureMessage
     except Exception as e:
-        print('Error at runFilePath:', filePath, e)
-        return ''
+        print('Error at runTQL:', namespace, e)
+        return False, 'Error occurred: ' + str(e)
 
 def resetNamespace(namespace, createNS = False):
 
@@ -265,6 +149,51 @@ def resetNamespace(namespace, createNS = False):
 
     return isSuccessful, failuremessage
 
+class NamespacePool:
+    """
+    Fixed set of pre-created namespaces (ILA_<run>_1 .. ILA_<run>_N, numbered from the cluster's namespace_start),
+    used when config.NAMESPACE_POOL is True. There is one pool per cluster.
+
+    A chunk leases any pooled namespace that is not in use and its app is created there with CREATE OR REPLACE.
+    Finishing a chunk only undeploys and drops its application, so namespaces are not dropped and recreated per
+    chunk. The namespaces themselves are dropped at run end by doNSClean().
+    """
+
+    def __init__(self, cluster):
+        self.cluster = cluster
+        self.namespaces = []
+
+    def ensure(self, size):
+        while len(self.namespaces) < size:
+            namespace = self.cluster.namespace(len(self.namespaces) + 1)
+            isSuccessful, failuremessage = runCommand('create namespace ' + namespace + ';')
+            if not isSuccessful:
+                print(f"Namespace {namespace} was not created ({failuremessage}); assuming it already exists")
+            self.namespaces.append(namespace)
+
+    def lease(self, usedNamespaces):
+        for namespace in self.namespaces:
+            if namespace not in usedNamespaces:
+                return namespace
+
+        # Every pooled namespace is busy (for example an app that could not be dropped), so grow the pool by one
+        print("All pooled namespaces are in use; adding one more")
+        self.ensure(len(self.namespaces) + 1)
+        return self.namespaces[-1]
+
+
+namespace_pools = {cluster.name: NamespacePool(cluster) for cluster in striim_clusters}
+
+
+def releaseNamespace(appName, namespace):
+    """
+    Cleans up a namespace after a failed launch: pooled namespaces only lose the application, others are dropped.
+    """
+    if config.NAMESPACE_POOL:
+        isSuccessful, failuremessage = runCommand("DROP APPLICATION " + appName + " CASCADE;")
+        return check_component_status(appName, isSuccessful, failuremessage, "Cannot find", False)
+    return resetNamespace(namespace)
+
 def runCommand(strCmd, returnResultOnly = False):
 
     if strCmd == '':
@@ -273,37 +202,26 @@ def runCommand(strCmd, returnResultOnly = False):
     data = strCmd + ';' if not strCmd.endswith(';') else strCmd
 
     try:
-        timeout_in_seconds = 180
-        resp = requests.post(prefixh + node + '/api/v2/tungsten', headers=headers, data=data, timeout=timeout_in_seconds)
-        # If passphrase is needed:
-        # resp = requests.post(prefixh + node + '/api/v2/tungsten?passphrase=1234', headers=headers, data=data)
-
-        if 'reason' in resp.text and 'tkn' in resp.text:
-            doDebugLog("got bad response in mon (tkn), trying again")
-            # If the response is bad, let's try again in 1 second
-            time.sleep(1)
-            return runCommand(strCmd)
-        else:
-            result = json.loads(resp.text)
+        result = activeCluster().client.tungsten(data)
 
-            print(result)
+        print(result)
 
-            if returnResultOnly:
-                return result
+        if returnResultOnly:
+            return result
 
-            failureMessage = ""
-            executionStatus = "OK"
+        failureMessage = ""
+        executionStatus = "OK"
 
-            for row in result:
-                if executionStatus != "Failure":
-                    executionStatus = row.get('executionStatus')
-                if executionStatus == "Failure":
-                    failureMessage += row.get('failureMessage') + ";"
+        for row in result:
+            if executionStatus != "Failure":
+                executionStatus = row.get('executionStatus')
+            if executionStatus == "Failure":
+                failureMessage += row.get('failureMessage') + ";"
 
-            return (executionStatus != "Failure"), failureMessage
+        return (executionStatus != "Failure"), failureMessage
     except Exception as e:
         print('Error at runCommand:', strCmd, e)
-        return False, 'Error occurred'
+        return False, 'Error occurred: ' + str(e)
 
 def runMon(component=''):
     data = 'mon;'
@@ -314,36 +232,7 @@ def runMon(component=''):
 
     return runCommand(data, True)
 
-    # try:
-    #     resp = requests.post(prefixh + node + '/api/v2/tungsten', headers=headers, data=data)
-    #
-    #     doDebugLog('runMon: resp.text: ' + str(resp.text))
-    #     # resp.text == 'tkn' \
-    #     #                 or resp.text == '{"reason":"tkn"}' \
-    #     #                 or resp.text == "{'reason': 'tkn'}" \
-    #     #                 or resp.text == '{"reason": "tkn"}'
-    #     if 'reason' in resp.text and 'tkn' in resp.text:
-    #         doDebugLog("got bad response in mon (tkn), trying again")
-    #         # If the response is bad, let's try again in 1 second
-    #         time.sleep(1)
-    #         return runMon(component)
-    #     else:
-    #         return json.loads(resp.text)
-    # except Exception as e:
-    #     print('Error at runMon:', component, e)
-    #     return ''
-
-# This determines if a particular app is part of this Initial Load Automater Appset
-def isILApp(str):
-    segments = str.split('.')
-
-    if len(segments) == 2:
-        # Check if the first segment starts with 'abc'
-        if segments[0].startswith(config.ILA_NS_BASE):
-            return True
-    return False
-
-def doGetMonOutputAndReview():
+def doGetMonOutputAndReview(returnNodes=False):
     start_time = time.time()
     response_valid = False
     MAX_DURATION_MINUTES = 15 # Run this again for up to 15 minutes before saying we failed.
@@ -369,6 +258,7 @@ def doGetMonOutputAndReview():
             if response_valid_from_func:
                 print("Response from runMon() processed and is valid.")
                 striim_apps = s_apps_temp
+                striim_nodes = s_nodes_temp
                 response_valid = True  # Mark as valid to exit the loop
             else:
                 print(f"Response from runMon() is invalid (e.g., missing 'fullName' in an application).")
@@ -403,287 +293,907 @@ def doGetMonOutputAndReview():
         striim_apps, striim_nodes, es_nodes = [], [], []
         # Handle this failure scenario as needed (e.g., log, raise exception, exit)
 
+    if returnNodes:
+        return striim_apps, striim_nodes
     return striim_apps
 
-def runReview():
-    # First, we need to check if there are any existing IL apps running.
+@contextlib.contextmanager
+def timedPhase(rows, phase):
+    """
+    Adds the time spent in the with block to each row's <phase>_seconds (see data.PHASES).
+    """
+    start = time.monotonic()
+    try:
+        yield
+    finally:
+        add_phase_seconds(rows, phase, time.monotonic() - start)
+
+def startLoadClock(rows):
+    now = time.monotonic()
+    for qry in rows:
+        if qry.status == 'RUNNING':
+            load_clock[qry.id] = now
+
+def stopLoadClock(qry):
+    """
+    Sets load_seconds of a row whose app (or source) was just seen finished. Rows started before a restart fall back
+    to started_datetime / finished_datetime.
+    """
+    started = load_clock.pop(qry.id, None)
+    if started is not None:
+        qry.load_seconds = time.monotonic() - started
+    elif qry.started_datetime and qry.finished_datetime:
+        # Rows read back from BigQuery carry UTC timestamps, so the two may differ in tz awareness
+        qry.load_seconds = seconds_between(qry.started_datetime, qry.finished_datetime)
+
+def saveQueryResult(qry, made_new_record_change = False):
+    """
+    Persists a changed row and keeps query_index up to date.
+
+    Args:
+        qry (QueryResult): The changed row.
+        made_new_record_change (bool): When True, the stored row is kept as history (iscurrentrow = False) and qry is
+            saved as a new current row with a new id.
+
+    Returns:
+        QueryResult: The saved (current) row.
+    """
+    # If query changed, save this one
+    # Merge single row
+    if made_new_record_change:
+        oldrow = copy.copy(qry)
+        oldrow.iscurrentrow = False
+        update_record(oldrow) # mark old row as not current row
+
+        # This is now our current row, and a new row (inserted, since update_record only updates existing ids)
+        old_id = qry.id
+        qry.id = get_next_id()
+        qry.iscurrentrow = True
+        write_data([qry])
+        new_result = qry
+
+        # Update the record with the new information
+        query_index.replace(old_id, new_result)
+    else:
+        new_result = update_record(qry, True)
+
+        if new_result is qry:
+            query_index.refresh(qry)
+        else:
+            query_index.replace(qry.id, new_result)
+
+    return new_result
+
+def nextFreeNamespace(usedNamespaces, cluster=None):
+    """
+    Returns the lowest numbered ILA namespace of cluster (default the first one) not in usedNamespaces.
+    """
+    cluster = cluster or striim_clusters[0]
+    namespaceCount = 1
+    while cluster.namespace(namespaceCount) in usedNamespaces:
+        namespaceCount = namespaceCount + 1
+    return cluster.namespace(namespaceCount)
+
+def clusterOf(qry):
+    """
+    Returns the cluster a row's app was created on: by the name recorded in the row, else by its namespace.
+    """
+    return cluster_by_name(striim_clusters, qry.cluster) or cluster_for_namespace(striim_clusters, qry.namespace)
+
+def claimChunk(qry):
+    """
+    With SHARDED_WORKERS, takes the lease on a row before this worker acts on it (see data.claim_record).
+
+    Returns:
+        bool: True if this worker may go ahead with the row (always, unless SHARDED_WORKERS).
+    """
+    if not config.SHARDED_WORKERS:
+        return True
+
+    previousOwner = qry.leaseowner
+    if not claim_record(qry):
+        print(f"id {qry.id} was taken by another worker")
+        return False
+    if previousOwner and previousOwner != worker_id():
+        message = f"Took over id {qry.id} ({qry.status}) from worker {previousOwner}, whose lease expired"
+        print(message)
+        logging.info(message)
+    return True
+
+def ownRows(rows):
+    """
+    With SHARDED_WORKERS, returns the rows this worker may act on: those it holds the lease of, and those whose lease
+    has expired (their worker stopped), which it takes over. Rows of the other live workers are left to them.
+    """
+    if not config.SHARDED_WORKERS:
+        return rows
+    return [qry for qry in rows if qry.leaseowner == worker_id() or (not lease_held_by_other(qry) and claimChunk(qry))]
+
+def heartbeat():
+    """
+    With SHARDED_WORKERS, every LEASE_HEARTBEAT_SECONDS: renews this worker's leases on its unfinished rows, then
+    reloads the other workers' rows from the state store, so pending rows, running apps and the end of the run
+    reflect the whole run and not just this worker.
+    """
     global query_results
-    global next_allowed_run
+    global next_heartbeat
+
+    if not config.SHARDED_WORKERS or datetime.datetime.now() < next_heartbeat:
+        return
+    next_heartbeat = datetime.datetime.now() + datetime.timedelta(seconds=config.LEASE_HEARTBEAT_SECONDS)
+
+    owned = [qry for qry in query_results if qry.leaseowner == worker_id() and qry.status not in config.DONE_STATUSES]
+    lost = set()
+    for qry in renew_leases(owned):
+        message = f"Lost the lease on id {qry.id} ({qry.appname}) to another worker"
+        print(message)
+        logging.info(message)
+        lost.add(qry.id)
+
+    # Let the other workers see this worker's changes before reading theirs
+    flush_data()
+
+    # This worker's own rows are kept as they are in memory; everything else comes from the store
+    mine = {qry.id: qry for qry in query_results if qry.leaseowner == worker_id() and qry.id not in lost}
+    query_results = [mine.get(qry.id, qry) for qry in update_and_get_current_status()]
+    query_index.rebuild(query_results)
+
+def finishApp(app, rows, note=""):
+    """
+    Marks the rows of a finished (QUIESCED / COMPLETED) app COMPLETED and tears the app down: in the background with
+    TEARDOWN_ASYNC, else right away (a failed teardown marks the rows FAILED).
+    """
+    for qry in rows:
+        qry.status = "COMPLETED"
+        qry.finished_datetime = datetime.datetime.now()
+        stopLoadClock(qry)
+
+        qry.notes += note + "; Total Execution time: " + pretty_time_difference(qry.started_datetime, qry.finished_datetime)
+        straggler_detector.completed(qry)
+        throughput_tracker.completed(qry)
+
+    if config.TEARDOWN_ASYNC:
+        # Hand the undeploy / drop / namespace reset to the background workers
+        teardown_pipeline.submit([qry.id for qry in rows], app.full_name, app.namespace)
+    else:
+        timings = {}
+        isSuccessful, failStage, teardownNotes = teardownApp(app.full_name, app.namespace, timings=timings)
+        for qry in rows:
+            for phase, seconds in timings.items():
+                add_phase_seconds([qry], phase, seconds)
+            qry.notes += teardownNotes
+            if not isSuccessful:
+                qry.status = "FAILED"
+
+    for qry in rows:
+        saveQueryResult(qry)
+
+def reconcileCluster(cluster):
+    """
+    Startup reconciliation of one cluster (run inside onCluster(cluster)) against the rows loaded from the state store,
+    from a single mon: every ILA app of this run is matched to its rows by namespace.
+    - apps that finished (QUIESCED / COMPLETED) while the orchestrator was down: rows marked COMPLETED, app torn down
+    - apps with no unfinished row (orphans, e.g. created just before a crash): stopped and torn down
+    - RUNNING / DEPLOYED rows whose app is gone: re-queued as NEW
+    Apps still running with their rows are left to the review loop. Nothing is changed if mon fails.
+
+    Returns:
+        dict: Count of apps / rows per outcome.
+    """
+    counts = {'completed': 0, 'orphaned': 0, 'requeued': 0, 'resumed': 0}
+
+    striim_apps, striim_nodes, es_nodes, isValid = map_mon_json_response(runMon())
+    if not isValid:
+        print(f"mon on cluster {cluster.name} failed; skipping startup reconciliation there")
+        return counts
+
+    # namespace -> app, and namespace -> unfinished rows with an app on this cluster: one pass over each
+    appsByNamespace = {app.namespace: app for app in striim_apps
+                       if isILApp(app.full_name) and cluster_for_namespace(striim_clusters, app.namespace) is cluster}
+    rowsByNamespace = {}
+    for namespace in query_index.running_namespaces():
+        rowsByNamespace.setdefault(namespace, []).extend(query_index.running_rows_in_namespace(namespace))
+    for qry in query_index.warm_rows():
+        rowsByNamespace.setdefault(qry.namespace, []).append(qry)
+
+    for namespace, app in appsByNamespace.items():
+        rows = rowsByNamespace.get(namespace)
+        if not rows:
+            # Left to the worker whose block it is in (SHARDED_WORKERS)
+            if not is_worker_namespace(namespace):
+                continue
+            print(f"Orphaned app {app.full_name} ({app.status_change}) has no row in run {config.UNIQUE_RUN_ID}; tearing it down")
+            logging.info(f"Startup reconciliation: tearing down orphaned app {app.full_name} ({app.status_change})")
+            stage = 'STOP' if app.status_change in ('RUNNING', 'QUIESCING') else 'UNDEPLOY'
+            if config.TEARDOWN_ASYNC:
+                teardown_pipeline.submit([], app.full_name, namespace, stage)
+            else:
+                isSuccessful, failStage, teardownNotes = teardownApp(app.full_name, namespace, stage)
+                if not isSuccessful:
+                    logging.info("Teardown failed for " + app.full_name + teardownNotes)
+            counts['orphaned'] = counts['orphaned'] + 1
+            continue
+
+        rows = ownRows(rows)
+        if not rows:
+            continue
+        if app.status_change in ('QUIESCED', 'COMPLETED') and all(qry.status in config.RUNNING_STATUSES for qry in rows):
+            finishApp(app, rows, "; Finished while the orchestrator was down")
+            counts['completed'] = counts['completed'] + len(rows)
+        else:
+            counts['resumed'] = counts['resumed'] + len(rows)
+
+    for namespace, rows in rowsByNamespace.items():
+        if namespace in appsByNamespace:
+            continue
+        for qry in ownRows([qry for qry in rows if clusterOf(qry) is cluster]):
+            print(f"App {qry.appname} of id {qry.id} is gone; re-queuing the chunk")
+            qry.notes += f"; App {qry.appname} ({qry.status}) was gone at restart, re-queued"
+            qry.status = "NEW"
+            qry.appname = None
+            qry.namespace = None
+            qry.cluster = None
+            qry.started_datetime = None
+            saveQueryResult(qry)
+            counts['requeued'] = counts['requeued'] + 1
+
+    return counts
+
+def reconcile():
+    """
+    Matches the apps on every cluster to the loaded rows once before the first review tick (see reconcileCluster).
+    """
+    for cluster in striim_clusters:
+        with onCluster(cluster):
+            counts = reconcileCluster(cluster)
+        message = (f"Startup reconciliation of cluster {cluster.name}: {counts['completed']} chunks completed, "
+                   f"{counts['resumed']} resumed, {counts['requeued']} re-queued, {counts['orphaned']} orphaned apps torn down")
+        print(message)
+        logging.info(message)
+
+def targetedAppNames(cluster):
+    """
+    Returns the names of the apps of every RUNNING row on cluster (including other workers' rows): what a targeted mon polls.
+    """
+    appNames = set()
+    for namespace in query_index.running_namespaces():
+        rows = query_index.running_rows_in_namespace(namespace)
+        if rows and rows[0].appname and clusterOf(rows[0]) is cluster:
+            appNames.add(rows[0].appname)
+    return appNames
+
+def targetedMon(cluster):
+    """
+    MON_MODE = 'targeted': runs `mon <app>` for the app of every RUNNING row on cluster (including other workers' rows),
+    MON_TARGETED_BATCH_SIZE statements per request and MON_TARGETED_WORKERS requests at a time, instead of a full `mon;`
+    of every app and node on the cluster.
+
+    Returns:
+        tuple: (apps, {app full name: mon response}), or (None, {}) if any call failed, so the caller falls back to a full mon.
+    """
+    def monBatch(batch):
+        with onCluster(cluster):
+            return split_mon_responses(batch, runCommand(' '.join('mon ' + appName + ';' for appName in batch), True))
+
+    appNames = sorted(targetedAppNames(cluster))
+    batchSize = max(1, config.MON_TARGETED_BATCH_SIZE)
+    responses = {}
+    for batchResponses in mon_executor.map(monBatch, [appNames[n:n + batchSize] for n in range(0, len(appNames), batchSize)]):
+        if batchResponses is None:
+            responses = None
+            break
+        responses.update(batchResponses)
+
+    striim_apps = merge_mon_responses(responses) if responses is not None else None
+    if striim_apps is None:
+        print(f"Targeted mon on cluster {cluster.name} failed; running a full mon instead")
+        return None, {}
+    return striim_apps, responses
+
+def reviewCluster(cluster, usedNamespaces):
+    """
+    Reviews one cluster (run inside onCluster(cluster)): records finished apps, completes finished sources of packed
+    apps, splits stragglers and starts warm apps into free slots. Sets cluster.running_apps, and cluster.healthy to
+    False when its mon failed (several clusters only; a single cluster keeps retrying mon as before).
+    Namespaces seen on the cluster are added to usedNamespaces.
+    """
+    # With MON_MODE = 'targeted', only this run's running apps are polled between full mons (striim_nodes stays None)
+    striim_apps, striim_nodes, monResponses = None, None, {}
+    targeted = False
+    if config.MON_MODE.lower() == 'targeted' and time.monotonic() < cluster.next_full_mon:
+        striim_apps, monResponses = targetedMon(cluster)
+        targeted = striim_apps is not None
 
     # Get node information: mon;
+    if striim_apps is None:
+        if len(striim_clusters) > 1:
+            striim_apps, striim_nodes, es_nodes, cluster.healthy = map_mon_json_response(runMon())
+            if not cluster.healthy:
+                print(f"mon on cluster {cluster.name} failed; no new chunks go there until it answers again")
+                return
+        else:
+            striim_apps, striim_nodes = doGetMonOutputAndReview(True)
+        cluster.next_full_mon = time.monotonic() + config.MON_FULL_INTERVAL_SECONDS
 
-    striim_apps = doGetMonOutputAndReview()
+    metrics.observe_mon(cluster.name, [app for app in striim_apps if isILApp(app.full_name)], striim_nodes)
 
     runningApps = 0
 
-    # activeNamespace = config.ILA_NS_BASE + "1"
-
     # If this system is clean, it would fail if we don't confirm this has data
     if striim_apps:
         # Gather a count of running apps. We need this for two reasons:
         # -> To determine if we have reached max (based on config)
         # -> To determine the next namespace used (to prevent naming collisions / allow for easy cleanup)
-        for app in [app for app in striim_apps if isILApp(app.full_name) and app.status_change in config.APP_RUNNING_STATUSES]:
-            # Count apps running
+        # Apps already handed to the teardown pipeline no longer hold a slot
+        tearingDown = teardown_pipeline.namespaces_in_progress()
+
+        ilApps = [app for app in striim_apps if isILApp(app.full_name)]
+
+        for app in ilApps:
+            usedNamespaces.add(app.namespace)
+            if app.status_change in config.APP_RUNNING_STATUSES and app.namespace not in tearingDown:
+                # Count apps running
+                runningApps = runningApps + 1
+
+        if config.MON_MODE.lower() == 'targeted' and not targeted:
+            # Remember the ILA apps a targeted mon does not poll (apps of no RUNNING row, e.g. stuck or failed ones left
+            # on the cluster), so until the next full mon they still count against the cap and keep their namespaces
+            polledApps = targetedAppNames(cluster)
+            unpolled = [app for app in ilApps if app.full_name not in polledApps]
+            cluster.unpolled_namespaces = {app.namespace for app in unpolled}
+            cluster.unpolled_running_apps = len([app for app in unpolled if app.status_change in config.APP_RUNNING_STATUSES
+                                                 and app.namespace not in tearingDown])
+
+        if config.THROUGHPUT_TRACKING or config.STRAGGLER_SPLIT:
+            # Keep this mon's rates of every running chunk (see throughput.py); the straggler detector reads them too
+            for app in ilApps:
+                if app.status_change == 'RUNNING':
+                    rows = ownRows(query_index.running_rows_in_namespace(app.namespace))
+                    if rows:
+                        throughput_tracker.observe(rows, app)
+
+        # Go through each app that fits our Initial Load app criteria (i.e. made by this program) in order to find completed
+        for app in ilApps:
+            if app.status_change != 'QUIESCED' and app.status_change != 'COMPLETED':
+                continue
+
+            # Check if our log file indicates that this app's namespace is Running (several rows for a packed app)
+            rows = ownRows(query_index.running_rows_in_namespace(app.namespace))
+            if not rows:
+                continue
+
+            # Detected that it is this row
+            finishApp(app, rows)
+
+            # With TEARDOWN_ASYNC the undeploy / drop / namespace reset runs in the background, so this slot is free now
+            if config.TEARDOWN_ASYNC and app.status_change in config.APP_RUNNING_STATUSES:
+                runningApps = runningApps - 1
+
+        if config.PACK_CHUNKS:
+            # Chunks of a packed app are completed as soon as their own source has finished. The last one is left
+            # for the app to quiesce, so the app is torn down through the normal path above.
+            for app in ilApps:
+                if app.status_change != 'RUNNING':
+                    continue
+
+                rows = ownRows(query_index.running_rows_in_namespace(app.namespace))
+                if len(rows) < 2:
+                    continue
+
+                # A targeted mon already fetched this app's components
+                monResponse = monResponses.get(app.full_name) or runMon(app.full_name)
+                finished = finished_sources(monResponse, app.full_name)
+                for qry in [qry for qry in rows if pack_sources.get(qry.id) in finished][:len(rows) - 1]:
+                    qry.status = "COMPLETED"
+                    qry.finished_datetime = datetime.datetime.now()
+                    stopLoadClock(qry)
+                    qry.notes += "; Source finished in packed app; Total Execution time: " + \
+                                 pretty_time_difference(qry.started_datetime, qry.finished_datetime)
+                    straggler_detector.completed(qry)
+                    throughput_tracker.completed(qry)
+                    saveQueryResult(qry)
+
+        if config.STRAGGLER_SPLIT:
+            # Stop and split running chunks that are predicted to finish far behind the others
+            for app in ilApps:
+                if app.status_change != 'RUNNING' or app.namespace in tearingDown:
+                    continue
+
+                # Packed apps load several chunks; they are not split
+                rows = ownRows(query_index.running_rows_in_namespace(app.namespace))
+                if len(rows) != 1:
+                    continue
+
+                qry = rows[0]
+                if straggler_detector.is_straggler(qry) and splitStraggler(qry):
+                    runningApps = runningApps - 1
+
+    if targeted:
+        # Apps outside this run's RUNNING rows, as of the last full mon
+        runningApps = runningApps + cluster.unpolled_running_apps
+        usedNamespaces.update(cluster.unpolled_namespaces)
+
+    # The adaptive controller (if enabled) moves the running app target from node CPU / memory; otherwise it is the cluster's apps_max.
+    # A targeted mon has no node metrics, so the target holds until the next full mon.
+    appsTarget = cluster.controller.observe(striim_nodes, runningApps) if striim_nodes is not None else cluster.controller.target
+
+    # Start warm (already deployed) apps first: this is only a START, so it is not paced like a deploy
+    startedNamespaces = set()
+    warmRows = ownRows([qry for qry in query_index.warm_rows() if clusterOf(qry) is cluster])
+    for qry in warmRows:
+        if qry.namespace in startedNamespaces:
+            continue
+        if runningApps >= appsTarget:
+            break
+
+        # The other rows of a packed app follow the row that is started
+        packed = [row for row in warmRows if row.namespace == qry.namespace and row is not qry]
+        startedNamespaces.add(qry.namespace)
+
+        startChunk(qry, packed)
+        follow(qry, packed)
+        startLoadClock([qry] + packed)
+
+        if qry.status == 'RUNNING':
             runningApps = runningApps + 1
 
-        # print("Detected " + str(runningApps) + " apps running.")
+        for row in [qry] + packed:
+            saveQueryResult(row)
 
-        if runningApps == 0:
-            next_allowed_run = datetime.datetime.now()
+    cluster.running_apps = runningApps
 
-        # print("Namespace set to: " + activeNamespace)
+def nextCluster():
+    """
+    Returns the healthy cluster a new chunk should go to: the one with the most free running slots, else one with
+    room in its warm pool (WARM_POOL_DEPTH per cluster), else None.
+    """
+    warmNamespaces = query_index.warm_namespaces()
+    best, bestKey = None, None
+    for position, cluster in enumerate(striim_clusters):
+        if not cluster.healthy:
+            continue
+        free = cluster.controller.target - cluster.running_apps
+        warmCount = len([namespace for namespace in warmNamespaces if cluster_for_namespace(striim_clusters, namespace) is cluster])
+        if free <= 0 and warmCount >= config.WARM_POOL_DEPTH:
+            continue
+        key = (free, -warmCount, -position)
+        if bestKey is None or key > bestKey:
+            best, bestKey = cluster, key
+    return best
+
+def collectMetrics():
+    metrics.observe_run(query_results, query_index.pending_count(),
+                        [(cluster.name, cluster.running_apps, cluster.controller.target) for cluster in striim_clusters])
 
-        # Go through each app that fits our Initial Load app criteria (i.e. made by this program) in order to find completed
-        for app in [app for app in striim_apps if isILApp(app.full_name)]:
-
-            # Check if our log file indicates that there are any apps in Running
-            # If so -> Check query_results for Running and NameSpace match
-            for qry in [qry for qry in query_results if qry.status in config.RUNNING_STATUSES]:
-
-                made_changes = False
-                made_new_record_change = False
-
-                # Running Apps
-                if app.namespace == qry.namespace:
-                    # Detected that it is this row
-                    if app.status_change == 'QUIESCED' or app.status_change == 'COMPLETED':
-                        # Status change
-                        qry.status = "COMPLETED"
-                        qry.finished_datetime = datetime.datetime.now()
-                        made_changes = True
-
-                        encounteredFailure = False
-
-                        # Undeploy and remove
-                        isSuccessful, failuremessage = runCommand("UNDEPLOY APPLICATION " + qry.appname + ";")
-
-                        isSuccessful, failuremessage = check_component_status(qry.appname, isSuccessful, failuremessage,
-                                                                              "CREATED", False)
-
-                        if not isSuccessful:
-                            qry.status = "COMPLETED-FAILEDDROP"
-
-                            # Ignore rest -----
-                            qry.notes += ". FAILED UNDEPLOY; will try again."
-                            isSuccessful, failuremessage = runCommand("UNDEPLOY APPLICATION " + qry.appname + ";")
-
-                            isSuccessful, failuremessage = check_component_status(qry.appname, isSuccessful,
-                                                                                  failuremessage,
-                                                                                  "CREATED", False)
-
-                            if not isSuccessful:
-                                qry.notes += ". FAILED UNDEPLOY TWICE"
-                                qry.status = "FAILED"
-                                encounteredFailure = True
-                        else:
-                            isSuccessful, failuremessage = runCommand("DROP APPLICATION " + qry.appname + " CASCADE;")
-
-                            isSuccessful, failuremessage = check_component_status(qry.appname, isSuccessful,
-                                                                                  failuremessage,
-                                                                                  "Cannot find", False)
-
-                            if not isSuccessful:
-                                qry.notes += ". FAILED DROP APPLICATION; will try again."
-                                isSuccessful, failuremessage = runCommand("DROP APPLICATION " + qry.appname + " CASCADE;")
-
-                                isSuccessful, failuremessage = check_component_status(qry.appname, isSuccessful,
-                                                                                      failuremessage,
-                                                                                      "Cannot find", False)
-
-                                if not isSuccessful:
-                                    qry.notes += ". FAILED DROP APPLICATION TWICE"
-                                    qry.status = "FAILED"
-                                    encounteredFailure = True
-
-                        qry.notes += "; Total Execution time: " + pretty_time_difference(qry.started_datetime, qry.finished_datetime)
-
-                        isSuccessful, failuremessage = resetNamespace(qry.namespace)
-                        if not isSuccessful:
-                            qry.notes += ". FAILED DROP NAMESPACE"
-                            qry.status = "FAILED"
-
-                if made_changes:
-                    # If query changed, save this one
-                    # Merge single row
-                    if made_new_record_change:
-                        # Set current record to completed
-                        oldrow = qry
-                        oldrow.iscurrentrow = False
-                        update_record(oldrow) # mark old row as not current row
-
-                        # This is now our current row, and a new row
-                        qnext_id = get_next_id()
-                        qry.id = qnext_id
-                        new_result = update_record(qry, True)
-
-                        # Update the record with the new information
-                        for i in range(len(query_results)):
-                            if query_results[i].query == qry.query:  # Assuming 'id' is unique
-                                query_results[i] = new_result
-                                break
-                    else:
-                        new_result = update_record(qry, True)
-
-                        # Update the record with the new information
-                        for i in range(len(query_results)):
-                            if query_results[i].query == qry.query:  # Assuming 'id' is unique
-                                query_results[i] = new_result
-                                break
-
-
-    if datetime.datetime.now() < next_allowed_run:
+def runReview():
+    # First, we need to check if there are any existing IL apps running.
+    global query_results
+    global next_allowed_run
+
+    # Record the outcome of any background teardowns that finished since the last tick
+    applyTeardownResults()
+
+    # Keep this worker's leases and its view of the other workers' rows current (SHARDED_WORKERS)
+    heartbeat()
+
+    # Namespaces that cannot be handed out this tick: seen on a cluster, still being torn down, or launched this tick
+    usedNamespaces = set()
+
+    for cluster in striim_clusters:
+        with onCluster(cluster):
+            reviewCluster(cluster, usedNamespaces)
+
+    if not any(cluster.running_apps for cluster in striim_clusters):
+        next_allowed_run = datetime.datetime.now()
+
+    # In slot filling mode, deploys are paced by deploy_limiter instead of next_allowed_run
+    if not config.FILL_ALL_SLOTS and datetime.datetime.now() < next_allowed_run:
         return
 
-    # If so -> Check query_results for Running and NameSpace match
-    for qry in sorted([qry for qry in query_results if qry.status not in config.NEW_EXCLUDES_STATUSES], key=lambda qry: qry.roworder):
+    usedNamespaces.update(teardown_pipeline.namespaces_in_progress())
+    usedNamespaces.update(query_index.running_namespaces())
+    usedNamespaces.update(query_index.warm_namespaces())
+
+    # Launch the next pending rows (in config.CHUNK_SCHEDULER order) into free slots, then deploy (without starting) up to WARM_POOL_DEPTH more
+    while True:
+        cluster = nextCluster()
+        if cluster is None:
+            break
+        startApp = cluster.running_apps < cluster.controller.target
+
+        qry = query_index.peek_pending()
+        if qry is None:
+            break
+
+        if config.FILL_ALL_SLOTS and not deploy_limiter.try_acquire():
+            print(f"Deploy rate limit reached; next deploy allowed in {deploy_limiter.seconds_until_available():.0f}s")
+            break
+
+        query_index.pop_pending()
+
+        # Small chunks next in line are loaded by the same app
+        packed = []
+        if config.PACK_CHUNKS and is_packable(qry):
+            while query_index.peek_pending() is not None and fits([qry] + packed, query_index.peek_pending()):
+                packed.append(query_index.pop_pending())
+
+        # Another worker may have taken these rows since this worker's last look at the store
+        if not claimChunk(qry):
+            continue
+        packed = [row for row in packed if claimChunk(row)]
+
+        with onCluster(cluster):
+            if config.NAMESPACE_POOL:
+                activeNamespace = namespace_pools[cluster.name].lease(usedNamespaces)
+            else:
+                activeNamespace = nextFreeNamespace(usedNamespaces, cluster)
+            usedNamespaces.add(activeNamespace)
 
-        made_changes = False
-        made_new_record_change = False
+            launchChunk(qry, activeNamespace, startApp, packed, cluster)
 
-        namespaceCount = runningApps + 1
+        next_allowed_run = datetime.datetime.now() + datetime.timedelta(seconds=config.DEPLOY_WAIT_TIME_SECONDS)
 
-        # Do stuff
-        if runningApps < config.CONCURRENT_APPS_MAX:
+        if qry.status == 'RUNNING':
+            cluster.running_apps = cluster.running_apps + 1
 
-            activeNamespace = config.ILA_NS_BASE + str(namespaceCount)
+        for row in [qry] + packed:
+            saveQueryResult(row)
 
-            namespaceCount = 1
+        # Do only one change at a time, unless we are filling all open slots
+        if not config.FILL_ALL_SLOTS:
+            break
 
-            # Keep increasing namespace count until we get a unique one
-            nsUsed = True
-            while (nsUsed):
-                nsUsed = False
-                for app in striim_apps:
-                    if app.namespace == activeNamespace:
-                        nsUsed = True
-                        namespaceCount = namespaceCount + 1
-                        activeNamespace = (config.ILA_NS_BASE + str(namespaceCount))
+def splitStraggler(qry):
+    """
+    Stops a straggler's app and replaces its row by sub-chunks of its key range (see planner.split_query and
+    data.split_record). The stopped app is torn down like a finished one.
 
+    Returns:
+        bool: True if the chunk was stopped and split.
+    """
+    queries = planner.split_query(qry.query, config.STRAGGLER_SPLIT_WAYS)
+    if not queries:
+        print(f"Straggler id {qry.id} cannot be split (no bounded ROWID / key range in its query); leaving it running")
+        straggler_detector.skip(qry)
+        return False
 
-            # Generate new TQL file from next entry in query_results
-            newTQLFilePath = getNewFile(config.SOURCE_TQL_PATH, config.SOURCE_TQL_FILE, config.TARGET_TQL_PATH, qry.query, qry.targettbl, activeNamespace)
+    isSuccessful, failuremessage = runCommand("STOP APPLICATION " + qry.appname + ";")
+    if not isSuccessful:
+        print(f"Unable to stop straggler {qry.appname}; will try again next review: {failuremessage}")
+        return False
+
+    appName, namespace = qry.appname, qry.namespace
+    new_rows = split_record(qry, queries, " (straggler, stopped after " +
+                            pretty_time_difference(qry.started_datetime, datetime.datetime.now()) + ")")
+    straggler_detector.split(qry, new_rows)
+    throughput_tracker.completed(qry)
+    load_clock.pop(qry.id, None)
+
+    query_index.replace(qry.id, new_rows[0])
+    for row in new_rows[1:]:
+        query_index.append(row)
+
+    logging.info(f"Split straggler id {qry.id} into ids {', '.join(str(row.id) for row in new_rows)}")
+
+    if config.TEARDOWN_ASYNC:
+        teardown_pipeline.submit([qry.id], appName, namespace)
+    else:
+        isSuccessful, failStage, teardownNotes = teardownApp(appName, namespace)
+        if not isSuccessful:
+            logging.info("Teardown failed for " + appName + teardownNotes)
 
-            # Should check here for success, or set up re-try
-            isSuccessful, failuremessage = runTQLFile(newTQLFilePath, activeNamespace)
+    return True
+
+
+def launchChunk(qry, activeNamespace, startApp=True, packed=None, cluster=None):
+    """
+    Creates and deploys the app for one row in activeNamespace, then starts it unless startApp is False
+    (warm pool), cleaning up if any step fails. Runs on cluster (default the active one, see onCluster).
+    Sets qry.appname, qry.namespace, qry.cluster, and qry.status to RUNNING, DEPLOYED (not started) or FAILED (with notes).
+    With packed (more rows, PACK_CHUNKS), one app loads all of them and the rows in packed get the same state.
+    """
+    fullAppName = activeNamespace + "." + config.ILA_APP_NAME_BASE
+    cluster = cluster or activeCluster()
+
+    qry.appname = fullAppName
+    qry.namespace = activeNamespace
+    qry.cluster = cluster.name
+
+    # Render the app's TQL in memory from the compiled template (written to stage/ only with TQL_AUDIT)
+    template = get_template()
+    rows = [qry] + (packed or [])
+    tql = template.render_app(activeNamespace, [(row.query, row.targettbl) for row in rows])
+    audit_tql(activeNamespace, tql)
+    if packed:
+        for position, row in enumerate(rows):
+            pack_sources[row.id] = source_name(template.text, position)
+            row.notes = (row.notes or "") + f"; Packed {len(rows)} chunks into {fullAppName} (source {pack_sources[row.id]})"
+
+    # Pooled namespaces already exist and are reused as-is (the TQL uses CREATE OR REPLACE)
+    resetSuccessful, resetMessage = True, ""
+    if not config.NAMESPACE_POOL:
+        print("Resetting namespace for use: " + activeNamespace)
+        with timedPhase(rows, 'nsreset'):
+            resetSuccessful, resetMessage = resetNamespace(activeNamespace, True)
+
+    # Should check here for success, or set up re-try
+    with timedPhase(rows, 'upload'):
+        isSuccessful, failuremessage = runTQL(tql, activeNamespace, False)
+    if not resetSuccessful:
+        isSuccessful, failuremessage = False, resetMessage + failuremessage
+
+    isSuccessful, failuremessage = check_component_status(qry.appname, isSuccessful,
+                                                          failuremessage,
+                                                          "Cannot find", True)
+
+    if isSuccessful:
+
+        # Deploy this new application
+        # Should check here for success, or set up re-try
+        with timedPhase(rows, 'deploy'):
+            isSuccessful, failuremessage = runCommand(f"DEPLOY APPLICATION {fullAppName} IN {cluster.deployment_group};")
+
+            isSuccessful, failuremessage = check_component_status(fullAppName, isSuccessful,
+                                                                  failuremessage,
+                                                                  "DEPLOYED", False)
+
+        if isSuccessful:
+            print("Deployment successful -> " + fullAppName)
+            qry.status = 'DEPLOYED'
+        else:
+            qry.notes += "Unable to deploy: " + failuremessage
+            qry.status = "FAILED"
+            qry.finished_datetime = datetime.datetime.now()
+            print(qry.notes)
+    else:
+        qry.notes += "Unable to create: " + failuremessage
+        qry.status = "FAILED"
+        qry.finished_datetime = datetime.datetime.now()
+        print(qry.notes)
+
+    if qry.status == "FAILED":
+        print("Attempting cleanup of apps:")
+        isSuccessful, failuremessage = releaseNamespace(fullAppName, qry.namespace)
+    elif startApp:
+        startChunk(qry, packed)
+
+    follow(qry, packed or [])
+    startLoadClock(rows)
+
+
+def startChunk(qry, packed=None):
+    """
+    Starts the already deployed app of one row (qry.status DEPLOYED), undeploying it and releasing its
+    namespace if START fails. Sets qry.status to RUNNING or FAILED (with notes). The START time is also
+    added to the rows in packed (the other rows of a packed app).
+    """
+    fullAppName = qry.appname
+
+    try:
+        with timedPhase([qry] + (packed or []), 'start'):
+            isSuccessful, failuremessage = runCommand("START APPLICATION " + fullAppName + ";")
 
             isSuccessful, failuremessage = check_component_status(qry.appname, isSuccessful,
                                                                   failuremessage,
-                                                                  "Cannot find", True)
+                                                                  "DEPLOYED", True)
 
-            failPoint = ""
+        if isSuccessful:
+            print("Start App successful -> " + fullAppName)
+            qry.status = 'RUNNING'
+            qry.started_datetime = datetime.datetime.now()
+        else:
+            qry.status = "FAILED"
+            qry.notes += "Start App Failed: " + failuremessage
+    except Exception as e:
+        striim_apps2 = doGetMonOutputAndReview()
 
-            fullAppName = activeNamespace + "." + config.ILA_APP_NAME_BASE
+        qry.status = "FAILED"
 
-            qry.appname = fullAppName
-            qry.namespace = activeNamespace
+        for app in [app for app in striim_apps2 if
+                    app.full_name == fullAppName and app.status_change in config.APP_RUNNING_STATUSES]:
+            # Update query results with LOADED and NS
+            qry.status = 'RUNNING'
+            qry.started_datetime = datetime.datetime.now()
 
-            made_changes = True
+    if qry.status == "FAILED":
+        qry.finished_datetime = datetime.datetime.now()
+        print("Attempting cleanup of apps:")
+        isSuccessful, failuremessage = runCommand("UNDEPLOY APPLICATION " + fullAppName + ";")
 
-            if isSuccessful:
+        isSuccessful, failuremessage = check_component_status(fullAppName, isSuccessful,
+                                                              failuremessage,
+                                                              "CREATED", False)
 
-                # Deploy this new application
-                # Should check here for success, or set up re-try
-                isSuccessful, failuremessage = runCommand(f"DEPLOY APPLICATION {fullAppName} IN {config.DEPLOYMENT_GROUP_TARGET};")
-
-                isSuccessful, failuremessage = check_component_status(fullAppName, isSuccessful,
-                                                                      failuremessage,
-                                                                      "DEPLOYED", False)
-
-                if isSuccessful:
-                    print("Deployment successful -> " + fullAppName)
-
-                    try:
-                        isSuccessful, failuremessage = runCommand("START APPLICATION " + fullAppName + ";")
-
-                        isSuccessful, failuremessage = check_component_status(qry.appname, isSuccessful,
-                                                                              failuremessage,
-                                                                              "DEPLOYED", True)
-
-                        if isSuccessful:
-                            print("Start App successful -> " + fullAppName)
-                            qry.status = 'RUNNING'
-                            qry.started_datetime = datetime.datetime.now()
-                        else:
-                            failPoint = "START"
-                            qry.status = "FAILED"
-                            qry.notes += "Start App Failed: " + failuremessage
-                    except Exception as e:
-                        striim_apps2 = doGetMonOutputAndReview()
-
-                        failPoint = "START"
-                        qry.status = "FAILED"
-
-                        for app in [app for app in striim_apps2 if
-                                    app.full_name == fullAppName and app.status_change in config.APP_RUNNING_STATUSES]:
-                            # Update query results with LOADED and NS
-                            qry.status = 'RUNNING'
-                            qry.started_datetime = datetime.datetime.now()
-                else:
-                    failPoint = "DEPLOY"
-                    qry.notes += "Unable to deploy: " + failuremessage
-                    qry.status = "FAILED"
-                    qry.finished_datetime = datetime.datetime.now()
-                    print(qry.notes)
+        if isSuccessful:
+            qry.notes += " [Cleanup: Able to UNDEPLOY]"
+        else:
+            qry.notes += " [Cleanup Failure: Unable to UNDEPLOY: -> " + failuremessage + "]"
+        isSuccessful, failuremessage = releaseNamespace(fullAppName, qry.namespace)
 
-                # Start this new application
-                # Should check here for success, or set up re-try
-            else:
-                failPoint = "CREATE"
-                qry.notes += "Unable to create: " + failuremessage
-                qry.status = "FAILED"
-                qry.finished_datetime = datetime.datetime.now()
-                print(qry.notes)
-
-
-            next_allowed_run = datetime.datetime.now() + datetime.timedelta(seconds=config.DEPLOY_WAIT_TIME_SECONDS)
-
-            if qry.status == "FAILED":
-                print("Attempting cleanup of apps:")
-                if (failPoint == "START"):
-                    isSuccessful, failuremessage = runCommand("UNDEPLOY APPLICATION " + fullAppName + ";")
-
-                    isSuccessful, failuremessage = check_component_status(fullAppName, isSuccessful,
-                                                                          failuremessage,
-                                                                          "CREATED", False)
-
-                    if isSuccessful:
-                        qry.notes += " [Cleanup: Able to UNDEPLOY]"
-                    else:
-                        qry.notes += " [Cleanup Failure: Unable to UNDEPLOY: -> " + failuremessage + "]"
-                #if (failPoint == "DEPLOY"):
-                isSuccessful, failuremessage = resetNamespace(qry.namespace)
-
-        if made_changes:
-            # If query changed, save this one
-            # Merge single row
-            if made_new_record_change:
-                oldrow = qry
-                oldrow.iscurrentrow = False
-
-                # Merge all rows
-                update_record(oldrow) # mark old row as not current row
-
-                # This is now our current row, and a new row
-                qnext_id = get_next_id()
-                qry.id = qnext_id
-                new_result = update_record(qry, True)
-
-                # Update the record with the new information
-                for i in range(len(query_results)):
-                    if query_results[i].query == qry.query:
-                        query_results[i] = new_result
-                        break
+
+def teardownApp(appName, namespace, startStage='UNDEPLOY', attemptsPerStage=2, timings=None):
+    """
+    Undeploys and drops an application (stopping it first if startStage is STOP), then drops its namespace (pooled
+    namespaces are kept for the next chunk).
+
+    Args:
+        appName (str): Full application name (namespace.app).
+        namespace (str): Namespace the application lives in.
+        startStage (str): Stage to start from (STOP, UNDEPLOY, DROP or NAMESPACE), so a retry does not repeat finished steps.
+        attemptsPerStage (int): How many times each command is tried before giving up on this pass.
+        timings (dict): If given, seconds spent per phase (undeploy, drop, nsreset) are added to it.
+
+    Returns:
+        tuple: (isSuccessful, failedStage, notes) where failedStage is None when every stage succeeded.
+    """
+    stages = ['STOP', 'UNDEPLOY', 'DROP', 'NAMESPACE']
+    notes = ""
+
+    for stage in stages[stages.index(startStage):]:
+        if stage == 'NAMESPACE' and config.NAMESPACE_POOL:
+            break
+
+        isSuccessful = False
+        failuremessage = ""
+        stageStart = time.monotonic()
+
+        for attempt in range(attemptsPerStage):
+            if stage == 'STOP':
+                isSuccessful, failuremessage = runCommand("STOP APPLICATION " + appName + ";")
+                isSuccessful, failuremessage = check_component_status(appName, isSuccessful, failuremessage,
+                                                                      "STOPPED", False)
+            elif stage == 'UNDEPLOY':
+                isSuccessful, failuremessage = runCommand("UNDEPLOY APPLICATION " + appName + ";")
+                isSuccessful, failuremessage = check_component_status(appName, isSuccessful, failuremessage,
+                                                                      "CREATED", False)
+            elif stage == 'DROP':
+                isSuccessful, failuremessage = runCommand("DROP APPLICATION " + appName + " CASCADE;")
+                isSuccessful, failuremessage = check_component_status(appName, isSuccessful, failuremessage,
+                                                                      "Cannot find", False)
             else:
-                new_result = update_record(qry, True)
+                isSuccessful, failuremessage = resetNamespace(namespace)
+
+            if isSuccessful:
+                break
+
+        phase = {'UNDEPLOY': 'undeploy', 'DROP': 'drop', 'NAMESPACE': 'nsreset'}.get(stage)
+        if timings is not None and phase:
+            timings[phase] = timings.get(phase, 0.0) + time.monotonic() - stageStart
+
+        if not isSuccessful:
+            failText = {'STOP': 'STOP', 'UNDEPLOY': 'UNDEPLOY', 'DROP': 'DROP APPLICATION', 'NAMESPACE': 'DROP NAMESPACE'}[stage]
+            notes += ". FAILED " + failText + (": " + failuremessage if failuremessage else "")
+            return False, stage, notes
+
+    return True, None, notes
+
+
+class TeardownJob:
+    def __init__(self, record_ids, app_name, namespace, stage='UNDEPLOY'):
+        self.record_ids = record_ids    # rows loaded by this app (several for a packed app, none for an orphaned app)
+        self.app_name = app_name
+        self.namespace = namespace
+        self.cluster = activeCluster()  # the cluster the app runs on (submitted from inside onCluster)
+        self.stage = stage              # STOP for an app that is still running
+        self.timings = {}               # phase -> seconds, over all attempts (see teardownApp)
+        self.attempts = 0
+        self.notes = ""
 
-                for i in range(len(query_results)):
-                    if query_results[i].query == qry.query:
-                        query_results[i] = new_result
-                        break
 
-        # Do only one change at a time
-        break
+class TeardownPipeline:
+    """
+    Background stage that tears down finished applications (UNDEPLOY, DROP APPLICATION, namespace reset).
+
+    Jobs run on a dedicated worker pool. A failed job goes onto a retry queue and is resubmitted from the
+    stage that failed once TEARDOWN_RETRY_DELAY_SECONDS has passed. Finished jobs (successful or out of
+    attempts) are collected by the main thread through poll(), so only the main thread touches the state store.
+    """
+
+    def __init__(self, workers, max_attempts, retry_delay_seconds):
+        self.executor = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix='teardown')
+        self.max_attempts = max(1, max_attempts)
+        self.retry_delay_seconds = retry_delay_seconds
+        self.finished = queue.Queue()
+        self.retry_queue = []   # heap of (due_time, sequence, job)
+        self.sequence = 0
+        self.in_progress = {}   # namespace -> TeardownJob
+        self.lock = threading.Lock()
+
+    def submit(self, record_ids, app_name, namespace, stage='UNDEPLOY'):
+        job = TeardownJob(record_ids, app_name, namespace, stage)
+        with self.lock:
+            self.in_progress[namespace] = job
+        print("Queued teardown for " + app_name)
+        self.executor.submit(self._run, job)
+
+    def _run(self, job):
+        job.attempts = job.attempts + 1
+        try:
+            with onCluster(job.cluster):
+                isSuccessful, failedStage, notes = teardownApp(job.app_name, job.namespace, job.stage, timings=job.timings)
+        except Exception as e:
+            isSuccessful, failedStage, notes = False, job.stage, ". FAILED " + job.stage + ": " + str(e)
+
+        if isSuccessful or job.attempts >= self.max_attempts:
+            job.notes += notes
+            self.finished.put((job, isSuccessful))
+        else:
+            print(f"Teardown of {job.app_name} failed at {failedStage} (attempt {job.attempts}); will retry")
+            job.stage = failedStage
+            with self.lock:
+                self.sequence = self.sequence + 1
+                heapq.heappush(self.retry_queue, (time.monotonic() + self.retry_delay_seconds, self.sequence, job))
+
+    def namespaces_in_progress(self):
+        with self.lock:
+            return set(self.in_progress.keys())
+
+    def has_pending(self):
+        with self.lock:
+            return len(self.in_progress) > 0
+
+    def poll(self):
+        """
+        Resubmits retries that are due and returns a list of (TeardownJob, isSuccessful) for finished jobs.
+        """
+        now = time.monotonic()
+        due = []
+        with self.lock:
+            while self.retry_queue and self.retry_queue[0][0] <= now:
+                due.append(heapq.heappop(self.retry_queue)[2])
+        for job in due:
+            self.executor.submit(self._run, job)
+
+        results = []
+        while True:
+            try:
+                job, isSuccessful = self.finished.get_nowait()
+            except queue.Empty:
+                break
+            with self.lock:
+                self.in_progress.pop(job.namespace, None)
+            results.append((job, isSuccessful))
+        return results
+
+    def wait(self, poll_interval_seconds=1):
+        """
+        Blocks until every queued teardown (including retries) has finished, and returns all results.
+        """
+        results = []
+        while self.has_pending():
+            results.extend(self.poll())
+            if self.has_pending():
+                time.sleep(poll_interval_seconds)
+        return results
+
+
+teardown_pipeline = TeardownPipeline(config.TEARDOWN_WORKERS, config.TEARDOWN_MAX_ATTEMPTS, config.TEARDOWN_RETRY_DELAY_SECONDS)
+
+
+def applyTeardownResults(results=None):
+    """
+    Records finished background teardowns against their rows: their undeploy / drop / nsreset timings, and for failed
+    ones status FAILED with the failure appended to notes. Successful teardowns leave the row COMPLETED.
+    """
+    if results is None:
+        results = teardown_pipeline.poll()
+
+    for job, isSuccessful in results:
+        if isSuccessful:
+            print("Teardown completed -> " + job.app_name)
+        else:
+            logging.info("Teardown failed for " + job.app_name + job.notes)
+
+        for record_id in job.record_ids:
+            qry = query_index.get(record_id)
+            if qry is None:
+                continue
+            for phase, seconds in job.timings.items():
+                add_phase_seconds([qry], phase, seconds)
+            if not isSuccessful:
+                qry.notes = (qry.notes or "") + job.notes + " (after " + str(job.attempts) + " attempts)"
+                qry.status = "FAILED"
+            saveQueryResult(qry)
 
 
 def pretty_time_difference(date1, date2):
@@ -740,6 +1250,7 @@ def check_component_status(objectName, currentIsSuccessful, currentFailureMessag
     for _ in range(5):  # Loop 5 times to check for 503 errors
         if not isSuccessful and ("503" in failuremessage or "Connection aborted" in failuremessage):
             print("503 error, checking status for " + objectName)
+            metrics.STATUS_CHECKS.inc(engine='sync')
             result = runCommand("STATUS " + objectName + ";", True)
 
             if invertExpectation:
@@ -770,37 +1281,35 @@ def isCommandSuccessful(reply):
     else:
         return False
 
-def cleanNamespace(targetPath, namespace):
-    for item in os.listdir(targetPath):
-        path = os.path.join(targetPath, item)
-        if item.startswith(namespace) and os.path.isfile(path):
-            os.remove(path)
-
-def getNewFile(sourcePath, sourceFileName, targetPath, queryText, targetTable, namespace):
-    fullPath = os.path.join(sourcePath, sourceFileName)
-    with open(fullPath, "rt") as fin:
-        content = fin.read()
-        modified_content = content.replace('~QUERYTEXT~', queryText).replace('~TARGETTABLE~', targetTable)
-
-    cleanNamespace(targetPath, namespace)
+def doNSClean():
 
-    fullTargetPath = os.path.join(targetPath, namespace + '_' + sourceFileName)
-    with open(fullTargetPath, "wt") as fout:
-        fout.write(modified_content)
+    for cluster in striim_clusters:
+        with onCluster(cluster):
+            cleanClusterNamespaces(cluster)
 
-    return fullTargetPath
-
-def doNSClean():
+def cleanClusterNamespaces(cluster):
 
     striim_apps =  doGetMonOutputAndReview()
 
+    namespaces = []
+
     # Go through each app that fits our Initial Load app criteria (i.e. made by this program) in order to find completed
-    for app in [app for app in striim_apps if isILApp(app.full_name)]:
+    # (only this worker's namespaces, with SHARDED_WORKERS)
+    for app in [app for app in striim_apps if isILApp(app.full_name) and is_worker_namespace(app.namespace)]:
         print(runCommand("STOP APPLICATION " + app.full_name + ";"))
         print(runCommand("UNDEPLOY APPLICATION " + app.full_name + ";"))
         print(runCommand("DROP APPLICATION " + app.full_name + " CASCADE;"))
+        namespaces.append(app.namespace)
+
+    # Pooled namespaces without an app do not show up in mon, so drop them by name
+    if config.NAMESPACE_POOL:
+        poolNamespaces = namespace_pools[cluster.name].namespaces or [cluster.namespace(n) for n in
+                                                                      range(1, cluster.controller.maximum + config.WARM_POOL_DEPTH + config.TEARDOWN_WORKERS + 1)]
+        namespaces += [namespace for namespace in poolNamespaces if namespace not in namespaces]
+
+    for namespace in namespaces:
         try:
-            resetNamespace(app.namespace)
+            resetNamespace(namespace)
         except Exception as e:
             print('Error at resetNamespace:', e)
 
@@ -817,14 +1326,27 @@ if __name__ == '__main__':
         if not firstRun:
             query_results = update_and_get_current_status()
 
+        if config.SHARDED_WORKERS and get_database() == 'Journal':
+            raise ValueError("SHARDED_WORKERS needs a state store shared by all workers: set STAGE_DB_LOCATION to SQLite, TinyDB or BQ")
+
         # If it is the first run...
         if firstRun:
             # Check BQ if there are any current runs with this runid
             query_results = update_and_get_current_status()
 
-            # If no results from BQ, load from file
+            # With several workers, worker 0 loads the plan and the others wait for it
+            while len(query_results) == 0 and config.SHARDED_WORKERS and config.WORKER_INDEX > 0:
+                print(f"Worker {config.WORKER_INDEX} waiting for worker 0 to load run {config.UNIQUE_RUN_ID}")
+                time.sleep(polling_interval_seconds)
+                query_results = update_and_get_current_status()
+
+            # If no results from BQ, load from file (or plan the chunks from TABLE_LIST)
             if len(query_results) == 0:
-                query_results = read_csv_to_query_results()
+                if config.PLAN_FROM_TABLE_LIST:
+                    query_results = planner.plan_chunks()
+                    print(f"Planned {len(query_results)} chunks for {len(config.TABLE_LIST)} tables")
+                else:
+                    query_results = read_csv_to_query_results()
 
                 # Get next ID available
                 next_id = get_next_id()
@@ -840,6 +1362,19 @@ if __name__ == '__main__':
                 write_data(query_results)
             firstRun = False
 
+        query_index.rebuild(query_results)
+
+        # Load and check the TQL template once, before anything is deployed
+        get_template()
+
+        # Catch up with what happened on the clusters while no orchestrator was running
+        if config.STARTUP_RECONCILE and len(query_results) > 0:
+            reconcile()
+            flush_data()
+            if config.ORCHESTRATOR_ENGINE.lower() == 'async':
+                # The async engine does not use the teardown pipeline; let orphan teardowns finish first
+                applyTeardownResults(teardown_pipeline.wait())
+
         continueRun = True
 
         # If no more results...
@@ -849,23 +1384,59 @@ if __name__ == '__main__':
         logging.info('Logging Enabled. Storing at: ' + log_output_path)
         print('Logging Enabled. Storing at: ' + log_output_path)
 
+        # Metrics endpoint (METRICS_PORT) and / or textfile (METRICS_TEXTFILE_PATH); the async engine adds its own collector
+        metrics.start()
+        if config.ORCHESTRATOR_ENGINE.lower() != 'async':
+            metrics.add_collector(collectMetrics)
+
+        if continueRun and config.ORCHESTRATOR_ENGINE.lower() == 'async':
+            # Every chunk's lifecycle runs as its own asyncio task; returns once all of them are done
+            asyncengine.run(query_results, username, password)
+            continueRun = False
+
+        if continueRun and config.NAMESPACE_POOL:
+            # Create the namespaces once; chunks reuse them until the run ends.
+            # Apps still being torn down in the background keep their namespace, so leave room for those too.
+            for cluster in striim_clusters:
+                with onCluster(cluster):
+                    namespace_pools[cluster.name].ensure(cluster.controller.maximum + config.WARM_POOL_DEPTH +
+                                                         (config.TEARDOWN_WORKERS if config.TEARDOWN_ASYNC else 0))
+
         while(continueRun):
             print('Executing at', str(datetime.datetime.now()))
             logging.info('Executing at ' + str(datetime.datetime.now()))
 
             runReview()
 
-            time.sleep(polling_interval_seconds)
+            # Write out state changes buffered so far once BQ_FLUSH_INTERVAL_SECONDS or BQ_FLUSH_MAX_ROWS is reached (BigQuery write-behind)
+            flush_data(False)
 
-            continueRun = False
+            if config.THROUGHPUT_TRACKING:
+                throughput_tracker.flush()
+                throughput_tracker.progress(query_results)
+
+            metrics.update()
+
+            time.sleep(polling_interval_seconds)
 
             # If there are any not completed, we still continue
-            for qry in [qry for qry in query_results if qry.status not in config.DONE_STATUSES]:
-                continueRun = True
+            continueRun = query_index.unfinished_count() > 0
+
+        # Let any background teardowns finish before closing out the run
+        applyTeardownResults(teardown_pipeline.wait())
+
+        if config.NAMESPACE_POOL and config.ORCHESTRATOR_ENGINE.lower() != 'async':
+            # Pooled namespaces are only dropped once the whole run is done
+            doNSClean()
 
         runMessage = 'Run completed at ' + str(datetime.datetime.now())
 
-        # will mark this run as completed in BQ
-        clear_runid(config.UNIQUE_RUN_ID)
+        # will mark this run as completed in BQ (by worker 0 only, with SHARDED_WORKERS)
+        flush_data()
+        if not config.SHARDED_WORKERS or config.WORKER_INDEX == 0:
+            clear_runid(config.UNIQUE_RUN_ID)
+        throughput_tracker.flush(True)
+        metrics.update()
+        reporting.report_run(config.UNIQUE_RUN_ID)
         logging.info(runMessage)
         print(runMessage)
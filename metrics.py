@@ -0,0 +1,285 @@
+"""
+Prometheus metrics of the orchestrator and of the ILA apps it runs, in the Prometheus text exposition format.
+
+Served at http://<host>:METRICS_PORT/metrics when config.METRICS_PORT is set, and / or written to
+config.METRICS_TEXTFILE_PATH every review tick (for the node_exporter textfile collector, or to read offline). Exposed:
+-> ila_chunks{status}: rows of this run by status; ila_pending_chunks: rows waiting to be launched
+-> ila_running_apps{cluster} / ila_running_apps_target{cluster}: running apps against the cap (or adaptive target)
+-> ila_striim_request_seconds{verb}: latency of each REST call, by command verb (MON, CREATE, DEPLOY, ...)
+-> ila_status_checks_total{engine}: STATUS re-checks after a 503 / aborted connection (check_component_status)
+-> ila_state_flush_seconds: time spent in data.flush_data
+-> ila_app_rate / ila_app_source_rate / ila_app_cpu_rate{cluster,app}: from the last mon of each ILA app
+-> ila_node_free_memory_bytes / ila_node_cpu_rate{cluster,node}: from the last mon
+-> ila_table_rows_per_second{table} / ila_run_eta_seconds: from the throughput history (throughput.py)
+-> ila_last_update_timestamp_seconds: when the metrics were last updated; alert when this or the completed count stops moving
+
+Values are recorded whether or not they are exported; recording is a dict update under a lock. Collectors (run state
+kept by the engines) run in the orchestrator's own thread in update(), so the endpoint only reads a snapshot.
+
+Usage: metrics.add_collector(lambda: metrics.observe_run(query_results, pendingCount, [(name, running, target)]))
+       metrics.start()      # once
+       metrics.update()     # every review tick
+"""
+import http.server
+import logging
+import os
+import threading
+import time
+
+import config
+from monitor import parse_bytes, parse_percent, parse_rate
+
+# Upper bounds (seconds) of the REST latency and flush histograms
+LATENCY_BUCKETS = [0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300]
+
+registry_lock = threading.Lock()
+registry = []
+collectors = []
+server = None
+
+
+class Metric:
+    """
+    A metric family: values by label values (a tuple in the order of labelnames).
+    """
+
+    def __init__(self, name, kind, help, labelnames=()):
+        self.name = name
+        self.kind = kind
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.values = {}
+        registry.append(self)
+
+    def key(self, labels):
+        return tuple(str(labels.get(name, '')) for name in self.labelnames)
+
+    def set(self, value, **labels):
+        with registry_lock:
+            self.values[self.key(labels)] = value
+
+    def inc(self, amount=1, **labels):
+        with registry_lock:
+            key = self.key(labels)
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def clear(self, **labels):
+        """
+        Removes every series whose labels include labels (all of them when none are given).
+        """
+        with registry_lock:
+            for key in [key for key in self.values
+                        if all(key[self.labelnames.index(name)] == str(value) for name, value in labels.items())]:
+                del self.values[key]
+
+    def samples(self):
+        for key, value in self.values.items():
+            yield self.name, dict(zip(self.labelnames, key)), value
+
+
+class Histogram(Metric):
+    def __init__(self, name, help, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, 'histogram', help, labelnames)
+        self.buckets = list(buckets)
+
+    def observe(self, value, **labels):
+        with registry_lock:
+            key = self.key(labels)
+            entry = self.values.get(key)
+            if entry is None:
+                entry = self.values[key] = [[0] * len(self.buckets), 0.0, 0]
+            for position, bound in enumerate(self.buckets):
+                if value <= bound:
+                    entry[0][position] = entry[0][position] + 1
+            entry[1] = entry[1] + value
+            entry[2] = entry[2] + 1
+
+    def samples(self):
+        for key, (counts, total, count) in self.values.items():
+            labels = dict(zip(self.labelnames, key))
+            for bound, bucketCount in zip(self.buckets, counts):
+                yield self.name + '_bucket', dict(labels, le=format_value(bound)), bucketCount
+            yield self.name + '_bucket', dict(labels, le='+Inf'), count
+            yield self.name + '_sum', labels, total
+            yield self.name + '_count', labels, count
+
+
+CHUNKS = Metric('ila_chunks', 'gauge', "Rows of this run by status", ['status'])
+PENDING_CHUNKS = Metric('ila_pending_chunks', 'gauge', "Rows waiting to be launched")
+RUNNING_APPS = Metric('ila_running_apps', 'gauge', "Running ILA apps", ['cluster'])
+RUNNING_APPS_TARGET = Metric('ila_running_apps_target', 'gauge', "Running app cap (or adaptive target)", ['cluster'])
+REQUEST_SECONDS = Histogram('ila_striim_request_seconds', "Latency of Striim REST calls by command verb", ['verb'])
+STATUS_CHECKS = Metric('ila_status_checks_total', 'counter', "STATUS re-checks after a 503 or aborted connection", ['engine'])
+FLUSH_SECONDS = Histogram('ila_state_flush_seconds', "Time spent writing out buffered state changes")
+APP_RATE = Metric('ila_app_rate', 'gauge', "rate of an ILA app in its last mon", ['cluster', 'app'])
+APP_SOURCE_RATE = Metric('ila_app_source_rate', 'gauge', "sourceRate of an ILA app in its last mon", ['cluster', 'app'])
+APP_CPU_RATE = Metric('ila_app_cpu_rate', 'gauge', "cpuRate (percent) of an ILA app in its last mon", ['cluster', 'app'])
+NODE_FREE_MEMORY = Metric('ila_node_free_memory_bytes', 'gauge', "freeMemory of a Striim node in the last mon", ['cluster', 'node'])
+NODE_CPU_RATE = Metric('ila_node_cpu_rate', 'gauge', "cpuRate (percent) of a Striim node in the last mon", ['cluster', 'node'])
+TABLE_ROWS_PER_SECOND = Metric('ila_table_rows_per_second', 'gauge', "Current rows per second of the running chunks of a target table", ['table'])
+RUN_ETA = Metric('ila_run_eta_seconds', 'gauge', "Estimated seconds until every chunk of the run is done")
+LAST_UPDATE = Metric('ila_last_update_timestamp_seconds', 'gauge', "Unix time the metrics were last updated")
+
+
+def format_value(value):
+    if isinstance(value, float):
+        if value == float('inf'):
+            return '+Inf'
+        return repr(value)
+    return str(value)
+
+
+def escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def command_verb(data):
+    """
+    Label for a tungsten call: the first word of its first statement other than USE, upper case ('USE ns; CREATE ...' -> CREATE).
+    """
+    for statement in data.split(';'):
+        words = statement.split()
+        if words and words[0].upper() != 'USE':
+            return words[0].upper()
+    return 'USE'
+
+
+def observe_request(data, seconds):
+    REQUEST_SECONDS.observe(seconds, verb=command_verb(data))
+
+
+def observe_mon(cluster, apps, nodes):
+    """
+    Records the rates of the ILA apps and the nodes in one cluster's mon, replacing what the previous mon reported
+    (apps that are gone drop out). nodes is None for a targeted mon (MON_MODE = 'targeted'), which keeps the node values.
+    """
+    for metric in (APP_RATE, APP_SOURCE_RATE, APP_CPU_RATE) + ((NODE_FREE_MEMORY, NODE_CPU_RATE) if nodes is not None else ()):
+        metric.clear(cluster=cluster)
+
+    for app in apps:
+        for metric, value in ((APP_RATE, parse_rate(app.rate)), (APP_SOURCE_RATE, parse_rate(app.source_rate)),
+                              (APP_CPU_RATE, parse_percent(app.cpu_rate))):
+            if value is not None:
+                metric.set(value, cluster=cluster, app=app.full_name)
+
+    for node in nodes or []:
+        for metric, value in ((NODE_FREE_MEMORY, parse_bytes(node.free_memory)), (NODE_CPU_RATE, parse_percent(node.cpu_rate))):
+            if value is not None:
+                metric.set(value, cluster=cluster, node=node.name)
+
+
+def observe_run(query_results, pending, slots):
+    """
+    Records the state of a run: rows by status, pending rows, and (cluster name, running apps, target) per cluster.
+    """
+    counts = {}
+    for qry in query_results:
+        counts[qry.status] = counts.get(qry.status, 0) + 1
+
+    # Statuses no row has any more stay at 0 instead of disappearing
+    for (status,) in list(CHUNKS.values):
+        counts.setdefault(status, 0)
+    for status, count in counts.items():
+        CHUNKS.set(count, status=status)
+
+    PENDING_CHUNKS.set(pending)
+    for cluster, running, target in slots:
+        RUNNING_APPS.set(running, cluster=cluster)
+        RUNNING_APPS_TARGET.set(target, cluster=cluster)
+
+
+def observe_throughput(table_rates, eta):
+    """
+    Records the current rows per second per target table (tables with no running chunks drop out) and the run's ETA.
+    """
+    TABLE_ROWS_PER_SECOND.clear()
+    for table, rate in table_rates.items():
+        TABLE_ROWS_PER_SECOND.set(rate, table=table)
+    if eta is None:
+        RUN_ETA.clear()
+    else:
+        RUN_ETA.set(eta)
+
+
+def add_collector(collector):
+    """
+    Registers a function called by update() to record state kept elsewhere (for example observe_run).
+    """
+    collectors.append(collector)
+
+
+def render():
+    """
+    Returns every metric in the Prometheus text exposition format.
+    """
+    lines = []
+    with registry_lock:
+        for metric in registry:
+            if not metric.values:
+                continue
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for name, labels, value in metric.samples():
+                labelText = ','.join(f'{label}="{escape(labelValue)}"' for label, labelValue in labels.items())
+                lines.append(f"{name}{{{labelText}}} {format_value(value)}" if labelText else f"{name} {format_value(value)}")
+    return "\n".join(lines) + "\n"
+
+
+def write_textfile(path):
+    # Written to a temporary file and renamed, so a collector never reads half a file
+    temporaryPath = path + '.tmp'
+    with open(temporaryPath, 'w') as fout:
+        fout.write(render())
+    os.replace(temporaryPath, path)
+
+
+def update():
+    """
+    Runs the collectors and rewrites METRICS_TEXTFILE_PATH (if set). Call once per review tick.
+    """
+    for collector in collectors:
+        try:
+            collector()
+        except Exception as e:
+            logging.warning(f"Metrics collector failed: {e}")
+    LAST_UPDATE.set(time.time())
+
+    if config.METRICS_TEXTFILE_PATH:
+        try:
+            write_textfile(config.METRICS_TEXTFILE_PATH)
+        except OSError as e:
+            print(f"Could not write metrics to {config.METRICS_TEXTFILE_PATH}: {e}")
+
+
+class MetricsHandler(http.server.BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split('?')[0] not in ('/metrics', '/'):
+            self.send_error(404)
+            return
+        body = render().encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start():
+    """
+    Starts the /metrics endpoint on METRICS_PORT in a background thread, if it is set and not already running.
+    """
+    global server
+    if not config.METRICS_PORT or server is not None:
+        return server
+
+    server = http.server.ThreadingHTTPServer((config.METRICS_BIND_ADDRESS, config.METRICS_PORT), MetricsHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name='metrics', daemon=True).start()
+
+    message = f"Metrics available at http://{config.METRICS_BIND_ADDRESS or '0.0.0.0'}:{server.server_address[1]}/metrics"
+    print(message)
+    logging.info(message)
+    return server
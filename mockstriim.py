@@ -0,0 +1,417 @@
+"""
+Local stand-in for the Striim REST API, for measuring the orchestrator without a cluster (see benchmark.py).
+
+Serves /security/authenticate and /api/v2/tungsten on a ThreadingHTTPServer and keeps applications in memory:
+-> CREATE [OR REPLACE] APPLICATION ... END APPLICATION (after USE <namespace>) creates an app in CREATED, with the
+   sources defined in it; namespaces are created / dropped with create namespace / drop namespace ... CASCADE.
+-> DEPLOY: CREATED -> DEPLOYED, START: DEPLOYED -> RUNNING, STOP: RUNNING / QUIESCED -> STOPPED,
+   UNDEPLOY: anything but RUNNING -> CREATED, DROP APPLICATION removes it. Other transitions fail as Striim would.
+-> A RUNNING app quiesces (QUIESCED) once its duration has passed since START. Its sources finish one after the other
+   over that time, so `mon <app>` shows packed apps completing source by source. Durations are synthetic: a fixed
+   number of seconds, a (min, max) range, or a function of the app.
+-> mon / mon <app> / STATUS <app> answer in the shape map_mon_json_response and packing.finished_sources read.
+
+Faults can be injected: a latency per command verb, a share of calls answered with a 503 failure (applied or not,
+like a Striim call that timed out half way), and 'tkn' answers (token expired) every n calls.
+
+Usage: server = MockStriim(duration=(5, 20), error_rate=0.01).start()
+       config.STRIIM_NODE = server.node
+       ...
+       print(server.stats()); server.stop()
+
+Or on its own: python mockstriim.py --port 9080 --duration 30 --latency DEPLOY=0.5
+"""
+import argparse
+import collections
+import json
+import random
+import re
+import socket
+import threading
+import time
+import uuid
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import parse_qs
+
+APPLICATION_NAME = re.compile(r'APPLICATION\s+([\w.]+)', re.IGNORECASE)
+CREATE_APPLICATION = re.compile(r'CREATE\s+(OR\s+REPLACE\s+)?APPLICATION\s+(\w+)', re.IGNORECASE)
+CREATE_SOURCE = re.compile(r'CREATE\s+(?:OR\s+REPLACE\s+)?SOURCE\s+(\w+)', re.IGNORECASE)
+
+
+def split_statements(script):
+    """
+    Splits a TQL script on the semicolons that are outside quotes.
+    """
+    statements = []
+    current = []
+    quote = None
+    for char in script:
+        if quote:
+            if char == quote:
+                quote = None
+        elif char in ('"', "'"):
+            quote = char
+        elif char == ';':
+            statement = ''.join(current).strip()
+            if statement:
+                statements.append(statement)
+            current = []
+            continue
+        current.append(char)
+    statement = ''.join(current).strip()
+    if statement:
+        statements.append(statement)
+    return statements
+
+
+def command_verb(statement):
+    """
+    Verb a statement is counted and timed under: mon, STATUS, DEPLOY, START, STOP, UNDEPLOY, DROP, namespace or CREATE.
+    """
+    words = statement.split()
+    verb = words[0].upper() if words else ''
+    if verb == 'MON':
+        return 'mon'
+    if len(words) > 1 and words[1].lower() == 'namespace':
+        return 'namespace'
+    if verb in ('USE', 'END'):
+        return 'CREATE'
+    return verb
+
+
+class MockApplication:
+    def __init__(self, full_name, sources):
+        self.full_name = full_name
+        self.namespace = full_name.split('.')[0]
+        self.sources = sources          # source component names, in definition order
+        self.status = 'CREATED'
+        self.started = None             # time.monotonic() of START
+        self.duration = 0.0             # seconds from START to QUIESCED
+
+    def advance(self, now):
+        if self.status == 'RUNNING' and now - self.started >= self.duration:
+            self.status = 'QUIESCED'
+
+    def finished_sources(self, now):
+        if self.status != 'RUNNING':
+            return len(self.sources) if self.started is not None else 0
+        if self.duration <= 0:
+            return len(self.sources)
+        return min(len(self.sources), int((now - self.started) / self.duration * len(self.sources)))
+
+
+class MockStriim:
+    """
+    The mock server and its in-memory cluster.
+
+    Args:
+        host (str): Interface to listen on.
+        port (int): Port to listen on; 0 picks a free one (see .node).
+        latency (dict): Seconds to wait before answering, per verb (see command_verb), with '*' as the default.
+        duration: Seconds a started app runs before it quiesces: a number, a (min, max) range, or a function of the
+            MockApplication. durations (dict) overrides it per full app name.
+        error_rate (float): Share of tungsten calls answered with HTTP 503 and a '503 Service Unavailable' failure.
+        error_applies (float): Share of those 503s whose command was applied anyway.
+        token_expiry_calls (int): If > 0, the token expires every this many tungsten calls (answered with 'tkn').
+        free_memory (int): freeMemory reported for the node.
+        rows_per_second (int): rate / sourceRate reported for each running app.
+        other_apps (int): Apps of other users (namespace PROD_<n>) running for ever, as on a shared cluster; they show
+            up in every full `mon;`.
+        seed (int): Seed for the injected faults and duration ranges, so runs can be repeated.
+    """
+
+    def __init__(self, host='127.0.0.1', port=0, latency=None, duration=0.0, durations=None, error_rate=0.0,
+                 error_applies=0.5, token_expiry_calls=0, free_memory=8000000000, rows_per_second=10000, other_apps=0,
+                 seed=None):
+        self.latency = dict(latency or {})
+        self.duration = duration
+        self.durations = dict(durations or {})
+        self.error_rate = error_rate
+        self.error_applies = error_applies
+        self.token_expiry_calls = token_expiry_calls
+        self.free_memory = free_memory
+        self.rows_per_second = rows_per_second
+        self.random = random.Random(seed)
+
+        self.apps = {}                  # full name -> MockApplication
+        self.namespaces = set()
+        self.tokens = set()
+        self.lock = threading.Lock()
+        self.calls = collections.Counter()
+        self.faults = collections.Counter()
+        self.tungsten_calls = 0
+        self.response_bytes = 0
+
+        for number in range(other_apps):
+            app = MockApplication(f"PROD_{number}.App{number}", ['Source'])
+            app.status, app.started, app.duration = 'RUNNING', time.monotonic(), float('inf')
+            self.apps[app.full_name] = app
+            self.namespaces.add(app.namespace)
+
+        self.server = ThreadingHTTPServer((host, port), self.handler())
+        self.server.daemon_threads = True
+        self.thread = None
+
+    @property
+    def node(self):
+        host, port = self.server.server_address[:2]
+        return f"{host}:{port}"
+
+    def start(self):
+        self.thread = threading.Thread(target=self.server.serve_forever, name='mockstriim', daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def stats(self):
+        with self.lock:
+            return {'tungsten_calls': self.tungsten_calls, 'calls': dict(self.calls), 'faults': dict(self.faults),
+                    'response_bytes': self.response_bytes, 'apps': len(self.apps), 'namespaces': len(self.namespaces)}
+
+    def app_duration(self, app):
+        if app.full_name in self.durations:
+            return self.durations[app.full_name]
+        if callable(self.duration):
+            return self.duration(app)
+        if isinstance(self.duration, (tuple, list)):
+            return self.random.uniform(*self.duration)
+        return self.duration
+
+    # ---- HTTP ----
+
+    def handler(self):
+        mock = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def setup(self):
+                super().setup()
+                # Headers and body go out as separate writes; without this every call waits on a delayed ACK
+                self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+            def log_message(self, format, *args):
+                pass
+
+            def reply(self, code, body):
+                payload = json.dumps(body).encode()
+                with mock.lock:
+                    mock.response_bytes = mock.response_bytes + len(payload)
+                self.send_response(code)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get('Content-Length') or 0)).decode()
+                if self.path.startswith('/security/authenticate'):
+                    self.reply(*mock.authenticate(parse_qs(body)))
+                elif self.path.startswith('/api/v2/tungsten'):
+                    token = (self.headers.get('authorization') or '').replace('STRIIM-TOKEN ', '')
+                    self.reply(*mock.tungsten(token, body))
+                else:
+                    self.reply(404, {'reason': 'Not found: ' + self.path})
+
+        return Handler
+
+    def authenticate(self, form):
+        with self.lock:
+            self.calls['authenticate'] = self.calls['authenticate'] + 1
+            if not form.get('username'):
+                return 401, {'reason': 'Invalid username or password'}
+            token = uuid.uuid4().hex
+            self.tokens.add(token)
+            return 200, {'token': token}
+
+    def tungsten(self, token, script):
+        statements = split_statements(script)
+        verb = command_verb(statements[0]) if statements else ''
+        delay = self.latency.get(verb, self.latency.get('*', 0))
+        if delay:
+            time.sleep(delay)
+
+        with self.lock:
+            self.tungsten_calls = self.tungsten_calls + 1
+            self.calls[verb] = self.calls[verb] + 1
+
+            if token not in self.tokens:
+                self.faults['tkn'] = self.faults['tkn'] + 1
+                return 401, {'reason': 'Invalid tkn, please authenticate again'}
+            if self.token_expiry_calls > 0 and self.tungsten_calls % self.token_expiry_calls == 0:
+                self.tokens.discard(token)
+                self.faults['tkn'] = self.faults['tkn'] + 1
+                return 401, {'reason': 'Expired tkn, please authenticate again'}
+
+            unavailable = self.error_rate > 0 and self.random.random() < self.error_rate
+            if unavailable and self.random.random() >= self.error_applies:
+                self.faults['503'] = self.faults['503'] + 1
+                return 503, [self.failure(script, '503 Service Unavailable')]
+
+            now = time.monotonic()
+            for app in self.apps.values():
+                app.advance(now)
+            results = self.execute(statements, now)
+
+            if unavailable:
+                self.faults['503 (applied)'] = self.faults['503 (applied)'] + 1
+                return 503, [self.failure(script, '503 Service Unavailable')]
+            return 200, results
+
+    # ---- Commands (called with self.lock held) ----
+
+    @staticmethod
+    def success(statement, output=None):
+        result = {'command': statement, 'executionStatus': 'Success', 'responseCode': 200}
+        if output is not None:
+            result['output'] = output
+        return result
+
+    @staticmethod
+    def failure(statement, message):
+        return {'command': statement, 'executionStatus': 'Failure', 'responseCode': 400, 'failureMessage': message}
+
+    def execute(self, statements, now):
+        results = []
+        namespace = 'admin'
+        building = None     # [full name, sources, replace] while inside CREATE APPLICATION ... END APPLICATION
+
+        for statement in statements:
+            words = statement.split()
+            verb = words[0].upper()
+            appName = APPLICATION_NAME.search(statement)
+            appName = appName.group(1) if appName else None
+            if appName and '.' not in appName:
+                appName = namespace + '.' + appName
+
+            if verb == 'USE':
+                namespace = words[1]
+                results.append(self.success(statement))
+            elif len(words) > 2 and words[1].lower() == 'namespace':
+                results.append(self.namespace_command(statement, verb, words[2]))
+            elif CREATE_APPLICATION.match(statement):
+                building = [namespace + '.' + CREATE_APPLICATION.match(statement).group(2), [],
+                            CREATE_APPLICATION.match(statement).group(1) is not None]
+                results.append(self.success(statement))
+            elif verb == 'END' and building:
+                results.append(self.create_application(statement, *building))
+                building = None
+            elif verb == 'CREATE':
+                if building and CREATE_SOURCE.match(statement):
+                    building[1].append(CREATE_SOURCE.match(statement).group(1))
+                results.append(self.success(statement))
+            elif verb == 'MON':
+                results.append(self.success(statement, self.mon(words[1] if len(words) > 1 else None, now)))
+            elif verb == 'STATUS':
+                app = self.apps.get(words[1]) if len(words) > 1 else None
+                results.append(self.success(statement, {'status': app.status}) if app else
+                               self.failure(statement, 'Cannot find ' + (words[1] if len(words) > 1 else '')))
+            elif verb in ('DEPLOY', 'START', 'STOP', 'UNDEPLOY', 'DROP') and appName:
+                results.append(self.application_command(statement, verb, appName, now))
+            else:
+                results.append(self.failure(statement, 'Unsupported by the mock: ' + statement[:80]))
+
+            if results[-1]['executionStatus'] == 'Failure':
+                break
+        return results
+
+    def namespace_command(self, statement, verb, name):
+        if verb == 'CREATE':
+            if name in self.namespaces:
+                return self.failure(statement, f"Namespace {name} already exists")
+            self.namespaces.add(name)
+            return self.success(statement)
+        if verb == 'DROP':
+            if any(app.status == 'RUNNING' for app in self.apps.values() if app.namespace == name):
+                return self.failure(statement, f"Namespace {name} has running applications")
+            for fullName in [fullName for fullName, app in self.apps.items() if app.namespace == name]:
+                del self.apps[fullName]
+            self.namespaces.discard(name)
+            return self.success(statement, 'No objects left in ' + name)
+        return self.failure(statement, 'Unsupported by the mock: ' + statement[:80])
+
+    def create_application(self, statement, fullName, sources, replace):
+        existing = self.apps.get(fullName)
+        if existing is not None and (not replace or existing.status != 'CREATED'):
+            return self.failure(statement, f"Application {fullName} already exists ({existing.status})")
+        self.namespaces.add(fullName.split('.')[0])
+        self.apps[fullName] = MockApplication(fullName, sources)
+        return self.success(statement)
+
+    def application_command(self, statement, verb, fullName, now):
+        app = self.apps.get(fullName)
+        if app is None:
+            return self.failure(statement, 'Cannot find ' + fullName)
+
+        allowed = {'DEPLOY': ['CREATED'], 'START': ['DEPLOYED', 'STOPPED'], 'STOP': ['RUNNING', 'QUIESCED'],
+                   'UNDEPLOY': ['DEPLOYED', 'STOPPED', 'QUIESCED', 'COMPLETED'], 'DROP': ['CREATED']}[verb]
+        if app.status not in allowed:
+            return self.failure(statement, f"Cannot {verb.lower()} {fullName} in state {app.status}")
+
+        if verb == 'DROP':
+            del self.apps[fullName]
+        elif verb == 'START':
+            app.status = 'RUNNING'
+            app.started = now
+            app.duration = self.app_duration(app)
+        else:
+            app.status = {'DEPLOY': 'DEPLOYED', 'STOP': 'STOPPED', 'UNDEPLOY': 'CREATED'}[verb]
+        return self.success(statement)
+
+    def mon(self, fullName, now):
+        apps = [self.apps[fullName]] if fullName in self.apps else [] if fullName else list(self.apps.values())
+        running = [app for app in self.apps.values() if app.status == 'RUNNING']
+
+        applications = []
+        for app in apps:
+            rate = str(self.rows_per_second) if app.status == 'RUNNING' else '0'
+            application = {'entityType': 'APPLICATION', 'fullName': app.full_name, 'statusChange': app.status,
+                           'rate': rate, 'sourceRate': rate, 'cpuRate': '1.0%', 'numServers': 1,
+                           'latestActivity': int(time.time() * 1000)}
+            if fullName:
+                finished = app.finished_sources(now)
+                application['applicationComponents'] = [
+                    {'entityType': 'SOURCE', 'fullName': app.namespace + '.' + source,
+                     'statusChange': 'COMPLETED' if position < finished else app.status}
+                    for position, source in enumerate(app.sources)]
+            applications.append(application)
+
+        node = {'entityType': 'SERVER', 'name': 'mock-node-1', 'version': 'mock', 'freeMemory': str(self.free_memory),
+                'cpuRate': f"{min(100.0, 5.0 * len(running)):.1f}%", 'uptime': '1 day'}
+        return {'striimApplications': applications, 'striimClusterNodes': [node]}
+
+
+def parse_latency(values):
+    latency = {}
+    for value in values or []:
+        verb, _, seconds = value.rpartition('=')
+        latency[verb or '*'] = float(seconds)
+    return latency
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Local mock of the Striim REST API")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=9080)
+    parser.add_argument('--latency', action='append', help="VERB=seconds (or just seconds for every verb); repeatable")
+    parser.add_argument('--duration', type=float, nargs='+', default=[0.0],
+                        help="Seconds an app runs before it quiesces, or a min and max")
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--error-applies', type=float, default=0.5)
+    parser.add_argument('--token-expiry-calls', type=int, default=0)
+    parser.add_argument('--other-apps', type=int, default=0, help="Apps of other users running on the cluster")
+    parser.add_argument('--seed', type=int)
+    args = parser.parse_args()
+
+    mock = MockStriim(args.host, args.port, parse_latency(args.latency),
+                      args.duration[0] if len(args.duration) == 1 else tuple(args.duration[:2]),
+                      error_rate=args.error_rate, error_applies=args.error_applies,
+                      token_expiry_calls=args.token_expiry_calls, other_apps=args.other_apps, seed=args.seed)
+    print(f"Mock Striim listening on {mock.node} (set STRIIM_NODE = '{mock.node}')")
+    try:
+        mock.server.serve_forever()
+    except KeyboardInterrupt:
+        print(mock.stats())
@@ -0,0 +1,238 @@
+import json
+import re
+
+import config
+
+
+class StriimApplication:
+    def __init__(self, entity_type, full_name, status_change, rate, source_rate, cpu_rate, num_servers, latest_activity):
+        self.entity_type = entity_type
+        self.full_name = full_name
+        self.status_change = status_change
+        self.rate = rate
+        self.source_rate = source_rate
+        self.cpu_rate = cpu_rate
+        self.num_servers = num_servers
+        self.latest_activity = latest_activity
+        self.components = []
+        self.namespace = full_name.split('.')[0] if len(full_name.split('.')) > 1 else None
+
+    def add_component(self, component):
+        self.components.append(component)
+
+class StriimClusterNode:
+    def __init__(self, entity_type, name, version, free_memory, cpu_rate, uptime):
+        self.entity_type = entity_type
+        self.name = name
+        self.version = version
+        self.free_memory = free_memory
+        self.cpu_rate = cpu_rate
+        self.uptime = uptime
+
+class Elasticsearch:
+    def __init__(self, elasticsearchReceiveThroughput, elasticsearchTransmitThroughput, elasticsearchClusterStorageFree, elasticsearchClusterStorageTotal):
+        self.elasticsearchReceiveThroughput = elasticsearchReceiveThroughput
+        self.elasticsearchTransmitThroughput = elasticsearchTransmitThroughput
+        self.elasticsearchClusterStorageFree = elasticsearchClusterStorageFree
+        self.elasticsearchClusterStorageTotal = elasticsearchClusterStorageTotal
+
+MEMORY_UNITS = {'': 1, 'B': 1, 'K': 1024, 'KB': 1024, 'M': 1024 ** 2, 'MB': 1024 ** 2, 'G': 1024 ** 3, 'GB': 1024 ** 3,
+                'T': 1024 ** 4, 'TB': 1024 ** 4}
+
+def parse_rate(value):
+    """
+    Returns a rows per second rate from a mon value such as 1234, '1,234' or '1234.5', or None.
+    """
+    if value is None:
+        return None
+    try:
+        return float(str(value).strip().replace(',', ''))
+    except ValueError:
+        return None
+
+def parse_percent(value):
+    """
+    Returns a percentage from a mon value such as 12.5 or '12.5%', or None.
+    """
+    if value is None:
+        return None
+    try:
+        return float(str(value).strip().rstrip('%').replace(',', ''))
+    except ValueError:
+        return None
+
+def parse_bytes(value):
+    """
+    Returns a byte count from a mon value such as 1073741824, '1,073,741,824' or '1.5 GB', or None.
+    """
+    if value is None:
+        return None
+    match = re.match(r'^\s*([0-9.,]+)\s*([A-Za-z]*)\s*$', str(value))
+    if not match:
+        return None
+    unit = match.group(2).upper()
+    if unit not in MEMORY_UNITS:
+        return None
+    try:
+        return float(match.group(1).replace(',', '')) * MEMORY_UNITS[unit]
+    except ValueError:
+        return None
+
+#
+#  Usage: striim_apps, striim_nodes, es_nodes, response_valid = map_mon_json_response(json_response)
+#
+
+def map_mon_json_response(json_response):
+    parsed_json = json_response
+    striim_applications = []
+    striim_cluster_nodes = []
+    elasticsearch_nodes = []
+
+    response_valid = True  # Assume valid initially
+
+    # --- Section 1: Striim Applications (determines global response_valid) ---
+    try:
+        # Basic structural validation for striimApplications path
+        if not (parsed_json and isinstance(parsed_json, list) and len(parsed_json) > 0 and
+                isinstance(parsed_json[0], dict) and "output" in parsed_json[0] and
+                isinstance(parsed_json[0]["output"], dict) and
+                "striimApplications" in parsed_json[0]["output"] and
+                isinstance(parsed_json[0]["output"]["striimApplications"], list)):
+            response_valid = False
+            applications_data = []
+        else:
+            applications_data = parsed_json[0]["output"]["striimApplications"]
+            # If applications_data is an empty list, the loop below won't run,
+            # and response_valid remains True, which is generally correct.
+            # If an empty list of apps itself should be invalid, add:
+            # if not applications_data: response_valid = False
+
+        if response_valid:  # Only proceed if basic structure was okay
+            for app_data in applications_data:
+                if not isinstance(app_data, dict):
+                    response_valid = False  # app_data item is not a dictionary
+                    break
+
+                # Critical check: "fullName" must exist and not be None
+                if "fullName" not in app_data or app_data.get("fullName") is None:
+                    response_valid = False
+                    break  # One missing/None fullName invalidates the response
+
+                # If fullName is present, proceed to create StriimApplication object.
+                # The 'entityType' check is from your original code structure.
+                if "entityType" in app_data:
+                    striim_applications.append(
+                        StriimApplication(
+                            app_data["entityType"],
+                            app_data["fullName"],  # Known to exist and be non-None
+                            app_data.get("statusChange"),
+                            app_data.get("rate"),
+                            app_data.get("sourceRate"),
+                            app_data.get("cpuRate"),
+                            app_data.get("numServers"),
+                            app_data.get("latestActivity")
+                        )
+                    )
+                # If an app has fullName but no entityType, it's just not added to the list.
+                # This does not make response_valid False by this simplified rule.
+
+    except (TypeError, KeyError, IndexError) as e:
+        # Error during parsing of striimApplications structure
+        print(f"Error processing striimApplications: {e}")
+        response_valid = False
+
+    # If response is deemed invalid due to striimApplications, clear all lists
+    if not response_valid:
+        return [], [], [], False
+
+    # --- Section 2: Striim Cluster Nodes (populated if response_valid is still True) ---
+    try:
+        if (parsed_json and isinstance(parsed_json, list) and len(parsed_json) > 0 and
+                isinstance(parsed_json[0], dict) and "output" in parsed_json[0] and
+                isinstance(parsed_json[0]["output"], dict) and
+                "striimClusterNodes" in parsed_json[0]["output"] and
+                isinstance(parsed_json[0]["output"]["striimClusterNodes"], list)):
+
+            for node_data in parsed_json[0]["output"]["striimClusterNodes"]:
+                if isinstance(node_data, dict):
+                    # Using previous logic for adding nodes (e.g., entityType and version mandatory for addition)
+                    if "entityType" in node_data and "version" in node_data:
+                        striim_cluster_nodes.append(
+                            StriimClusterNode(
+                                node_data["entityType"],
+                                node_data.get("name", node_data.get("fullName")),
+                                node_data["version"],
+                                node_data.get("freeMemory"),
+                                node_data.get("cpuRate"),
+                                node_data.get("uptime")
+                            )
+                        )
+    except (TypeError, KeyError, IndexError) as e:
+        print(f"Warning: Error processing striimClusterNodes: {e}")
+        striim_cluster_nodes = []  # Clear if error, but doesn't make global response invalid here
+
+    # --- Section 3: Elasticsearch Nodes (populated if response_valid is still True) ---
+    try:
+        if (parsed_json and isinstance(parsed_json, list) and len(parsed_json) > 0 and
+                isinstance(parsed_json[0], dict) and "output" in parsed_json[0] and
+                isinstance(parsed_json[0]["output"], dict) and
+                "elasticsearch" in parsed_json[0]["output"] and
+                isinstance(parsed_json[0]["output"]["elasticsearch"], dict)):
+            es_data = parsed_json[0]["output"]["elasticsearch"]
+            elasticsearch_nodes.append(
+                Elasticsearch(
+                    es_data.get("elasticsearchReceiveThroughput"),
+                    es_data.get("elasticsearchTransmitThroughput"),
+                    es_data.get("elasticsearchClusterStorageFree"),
+                    es_data.get("elasticsearchClusterStorageTotal")
+                )
+            )
+    except (TypeError, KeyError, IndexError) as e:
+        print(f"Warning: Error processing elasticsearch: {e}")
+        elasticsearch_nodes = []  # Clear if error
+
+    return striim_applications, striim_cluster_nodes, elasticsearch_nodes, response_valid
+
+# Usage: responses = split_mon_responses(app_names, runCommand(' '.join('mon ' + name + ';' for name in app_names), True))
+#        striim_apps = merge_mon_responses(responses)
+
+def split_mon_responses(app_names, json_response):
+    """
+    Splits the response of one request with a `mon <app>;` statement per app of app_names into a response per app
+    (app full name -> [result], shaped like the response of that statement alone), or returns None if it does not have
+    one result per statement (for example a failed request).
+    """
+    if not isinstance(json_response, list) or len(json_response) != len(app_names):
+        return None
+    return {app_name: [result] for app_name, result in zip(app_names, json_response)}
+
+
+def merge_mon_responses(responses):
+    """
+    Maps the responses of several `mon <app>;` calls (app full name -> parsed JSON) the way map_mon_json_response maps one
+    `mon;`. Returns the applications of all of them, or None if any response is not valid (for example a failed call).
+    """
+    striim_applications = []
+    for json_response in responses.values():
+        applications, nodes, es_nodes, response_valid = map_mon_json_response(json_response)
+        if not response_valid:
+            return None
+        striim_applications.extend(applications)
+    return striim_applications
+
+# Example: update_application_components(applications[0], json_response)
+
+def update_application_components(application, json_response):
+    app_components = json.loads(json_response)[0]["output"]["striimApplications"][0]["applicationComponents"]
+    for component in app_components:
+        application.components.append(component)
+
+# This determines if a particular app is part of this Initial Load Automater Appset
+def isILApp(str):
+    segments = str.split('.')
+
+    if len(segments) == 2:
+        # Check if the first segment starts with 'abc'
+        if segments[0].startswith(config.ILA_NS_BASE):
+            return True
+    return False
@@ -0,0 +1,145 @@
+"""
+Packing of small chunks into one Striim application (config.PACK_CHUNKS).
+
+Every row of queryfile.txt normally gets its own app, namespace, deploy and teardown. For plans with many small
+tables that overhead is larger than the load itself, so consecutive pending chunks that are small enough are
+combined into one app with one copy of the template's source / target flow per chunk, until PACK_MAX_CHUNKS or the
+PACK_MAX_ROWS / PACK_MAX_BYTES budget is reached. Each chunk keeps its own row (all rows of a pack share appname and
+namespace); a row is marked COMPLETED when its own source has finished (from `mon <app>`), or when the whole app
+quiesces.
+"""
+import re
+import uuid
+
+import config
+
+# Statuses of a source component in `mon <app>` that mean its initial load is done
+SOURCE_DONE_STATUSES = ['COMPLETED', 'QUIESCED']
+
+COMPONENT_DEFINITION = re.compile(r'CREATE\s+(?:OR\s+REPLACE\s+)?(?:SOURCE|TARGET|CQ|STREAM|TYPE|CACHE|WINDOW|WACTIONSTORE)\s+(\w+)',
+                                  re.IGNORECASE)
+STREAM_REFERENCE = re.compile(r'(?:OUTPUT\s+TO|INPUT\s+FROM)\s+(\w+)', re.IGNORECASE)
+SOURCE_DEFINITION = re.compile(r'CREATE\s+(?:OR\s+REPLACE\s+)?SOURCE\s+(\w+)', re.IGNORECASE)
+APPLICATION_START = re.compile(r'CREATE\s+(?:OR\s+REPLACE\s+)?APPLICATION\s+\w+[^;]*;', re.IGNORECASE)
+APPLICATION_END = re.compile(r'END\s+APPLICATION\s+\w+\s*;', re.IGNORECASE)
+UUID_STRING = re.compile(r'\{uuidstring=[0-9a-fA-F-]+\}')
+
+
+def is_packable(qry):
+    """
+    A chunk can be packed when it has an estimate that fits the budget on its own.
+    """
+    if qry.est_rows is None and qry.est_bytes is None:
+        return False
+    if config.PACK_MAX_ROWS > 0 and (qry.est_rows is None or qry.est_rows > config.PACK_MAX_ROWS):
+        return False
+    if config.PACK_MAX_BYTES > 0 and (qry.est_bytes is None or qry.est_bytes > config.PACK_MAX_BYTES):
+        return False
+    return True
+
+
+def fits(pack, qry):
+    """
+    True if qry can be added to pack (a list of rows) without going over PACK_MAX_CHUNKS or the row / byte budget.
+    """
+    if len(pack) >= config.PACK_MAX_CHUNKS or not is_packable(qry):
+        return False
+    if config.PACK_MAX_ROWS > 0 and sum(row.est_rows for row in pack) + qry.est_rows > config.PACK_MAX_ROWS:
+        return False
+    if config.PACK_MAX_BYTES > 0 and sum(row.est_bytes for row in pack) + qry.est_bytes > config.PACK_MAX_BYTES:
+        return False
+    return True
+
+
+def build_packs(query_results):
+    """
+    Groups rows (already in launch order) into packs of consecutive packable rows; other rows are packs of one.
+    """
+    packs = []
+    for qry in query_results:
+        if config.PACK_CHUNKS and packs and is_packable(packs[-1][0]) and fits(packs[-1], qry):
+            packs[-1].append(qry)
+        else:
+            packs.append([qry])
+    return packs
+
+
+def source_name(template, position):
+    """
+    Name of the source component that loads the chunk at `position` (0 based) of a pack.
+    """
+    names = SOURCE_DEFINITION.findall(template)
+    return f"{names[0]}_{position + 1}" if names else None
+
+
+def pack_template(template, chunks):
+    """
+    Builds one application from the template with one copy of its flow per chunk.
+
+    Every component and stream name defined in the template gets a _<n> suffix in the n-th copy (and every
+    {uuidstring=...} a new value), so the copies do not collide.
+
+    Args:
+        template (str): TQL with one CREATE APPLICATION ... END APPLICATION block using ~QUERYTEXT~ / ~TARGETTABLE~.
+        chunks (list): (query text, target table) per chunk.
+
+    Returns:
+        str: The TQL of the packed application.
+    """
+    start = APPLICATION_START.search(template)
+    end = APPLICATION_END.search(template)
+    if not start or not end or end.start() < start.end():
+        raise ValueError("Cannot pack chunks: the TQL template has no CREATE APPLICATION ... END APPLICATION block")
+
+    body = template[start.end():end.start()]
+    names = set(COMPONENT_DEFINITION.findall(body)) | set(STREAM_REFERENCE.findall(body))
+    namePattern = re.compile(r'\b(' + '|'.join(re.escape(name) for name in sorted(names, key=len, reverse=True)) + r')\b') \
+        if names else None
+
+    copies = []
+    for position, (queryText, targetTable) in enumerate(chunks, start=1):
+        flow = namePattern.sub(lambda match: f"{match.group(1)}_{position}", body) if namePattern else body
+        flow = UUID_STRING.sub(lambda match: '{uuidstring=' + str(uuid.uuid4()) + '}', flow)
+        copies.append(flow.replace('~QUERYTEXT~', queryText).replace('~TARGETTABLE~', targetTable))
+
+    return template[:start.end()] + ''.join(copies) + template[end.start():]
+
+
+def follow(lead, rows):
+    """
+    Copies the app state of the first row of a pack (the one launched / started) to the other rows of the pack.
+    """
+    for row in rows:
+        row.appname = lead.appname
+        row.namespace = lead.namespace
+        row.cluster = lead.cluster
+        row.status = lead.status
+        row.started_datetime = lead.started_datetime
+        row.finished_datetime = lead.finished_datetime
+        if lead.status == 'FAILED':
+            row.notes = (row.notes or "") + f"; Packed app {lead.appname} failed (see id {lead.id})"
+
+
+def finished_sources(mon_result, app_name=None):
+    """
+    Returns the names of the source components that have finished, from the parsed response of `mon <app>;`
+    (only those of app_name, if given).
+    """
+    finished = set()
+    try:
+        applications = mon_result[0]["output"]["striimApplications"]
+    except (TypeError, KeyError, IndexError):
+        return finished
+
+    for application in applications:
+        if app_name is not None and application.get("fullName") not in (None, app_name):
+            continue
+        for component in application.get("applicationComponents") or []:
+            if not isinstance(component, dict):
+                continue
+            name = component.get("fullName") or component.get("name") or ""
+            status = component.get("statusChange") or component.get("status")
+            if status in SOURCE_DONE_STATUSES:
+                # Components may be reported with their namespace (NS.Name)
+                finished.add(name.split('.')[-1])
+    return finished
@@ -0,0 +1,418 @@
+"""
+Chunk planner for config.TABLE_LIST.
+
+Builds balanced chunk queries for each table from exported statistics (no database connection needed) and returns
+them as QueryResult rows, ready to be written to the state store in place of queryfile.txt.
+
+Statistics (config.PLANNER_STATS_PATH) are JSON or CSV, one entry per table:
+    {"QATEST.WF_PENDING_ACTIVITY": {"strategy": "rowid", "data_object_id": 73196, "num_rows": 1200000},
+     "QATEST.ORDERS": {"strategy": "numeric", "key": "ORDER_ID", "min": 1, "max": 5000000, "num_rows": 4800000},
+     "QATEST.EVENTS": {"strategy": "date", "key": "CREATED", "min": "2020-01-01", "max": "2025-06-30"},
+     "QATEST.NOTES": {"strategy": "hash", "key": "NOTE_ID", "chunks": 8}}
+CSV files use the same names as columns (table, strategy, key, chunks, min, max, num_rows, bytes, data_object_id,
+target_table, boundaries), with boundaries separated by ';'.
+
+Strategies:
+-> rowid:   ROWID ranges over the table's extents, so every chunk covers about the same number of blocks (Python port
+            of oracle_rowsplit.sql). Extents come from "extents" ([relative_fno, block_id, blocks] lists) in the JSON
+            stats, or from a CSV export of dba_extents (config.PLANNER_EXTENTS_PATH: owner, segment_name,
+            relative_fno, block_id, blocks).
+-> numeric: key ranges between min and max (or at the given boundaries, e.g. from NTILE, for skewed keys).
+-> date:    the same over a DATE / TIMESTAMP key.
+-> hash:    ORA_HASH(key) buckets.
+-> mod:     MOD(key) buckets over an integer key.
+The first / last range chunks are open ended (and the first one takes NULL keys), so rows outside the exported min / max
+are still loaded.
+
+split_query() splits a running chunk's range again (used for straggler chunks, see straggler.py).
+
+Run `python planner.py` to print the plan in queryfile.txt format without touching the state store.
+"""
+import csv
+import datetime
+import json
+import logging
+import math
+import os
+import re
+
+import config
+from data import QueryResult
+
+ROWID_ALPHABET = 'ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789+/'
+
+# Highest row number used for the end of a ROWID range, as in oracle_rowsplit.sql
+ROWID_MAX_ROW = 10000
+
+STRATEGIES = ['rowid', 'numeric', 'date', 'hash', 'mod']
+
+
+def _base64_digits(value, width):
+    digits = []
+    for _ in range(width):
+        digits.append(ROWID_ALPHABET[value & 63])
+        value = value >> 6
+    return ''.join(reversed(digits))
+
+
+def rowid_create(data_object_id, relative_fno, block_number, row_number):
+    """
+    Same as dbms_rowid.rowid_create(1, data_object_id, relative_fno, block_number, row_number): an extended ROWID
+    (OOOOOOFFFBBBBBBRRR in Oracle's base64 alphabet).
+    """
+    return _base64_digits(data_object_id, 6) + _base64_digits(relative_fno, 3) + \
+           _base64_digits(block_number, 6) + _base64_digits(row_number, 3)
+
+
+def rowid_parts(rowid):
+    """
+    Inverse of rowid_create: returns (data_object_id, relative_fno, block_number, row_number).
+    """
+    values = []
+    for start, width in ((0, 6), (6, 3), (9, 6), (15, 3)):
+        value = 0
+        for digit in rowid[start:start + width]:
+            value = value * 64 + ROWID_ALPHABET.index(digit)
+        values.append(value)
+    return tuple(values)
+
+
+def rowid_ranges(extents, chunks):
+    """
+    Groups extents (relative_fno, block_id, blocks) into `chunks` runs of about the same number of blocks, like the
+    analytic query in oracle_rowsplit.sql.
+
+    Returns:
+        A list of (lo_fno, lo_block, hi_fno, hi_block, sum_blocks), in ROWID order.
+    """
+    extents = sorted(extents)
+    total = sum(blocks for fno, block_id, blocks in extents)
+    if total <= 0:
+        return []
+
+    groups = {}
+    running = 0
+    for fno, block_id, blocks in extents:
+        running = running + blocks
+        grp = int((running - 0.01) / (total / chunks))
+        groups.setdefault(grp, []).append((fno, block_id, blocks))
+
+    ranges = []
+    for grp in sorted(groups):
+        members = groups[grp]
+        lo_fno, lo_block, first_blocks = members[0]
+        hi_fno, hi_block_id, hi_blocks = members[-1]
+        ranges.append((lo_fno, lo_block, hi_fno, hi_block_id + hi_blocks - 1, sum(m[2] for m in members)))
+    return ranges
+
+
+def _split_points(low, high, chunks):
+    """
+    Inner split points for `chunks` equal width ranges between low and high (ints stay ints, duplicates dropped).
+    """
+    if chunks <= 1 or high <= low:
+        return []
+    step = (high - low) / chunks
+    points = [low + step * n for n in range(1, chunks)]
+    if isinstance(low, int) and isinstance(high, int):
+        points = [int(math.ceil(point)) for point in points]
+    return sorted(set(point for point in points if low < point <= high))
+
+
+def _range_conditions(key, points, literal):
+    """
+    WHERE conditions for the ranges between split points: (-inf or NULL, p1), [p1, p2), ..., [pn, +inf).
+    """
+    if not points:
+        return [None]
+    conditions = [f"({key} < {literal(points[0])} OR {key} IS NULL)"]
+    for low, high in zip(points, points[1:]):
+        conditions.append(f"{key} >= {literal(low)} AND {key} < {literal(high)}")
+    conditions.append(f"{key} >= {literal(points[-1])}")
+    return conditions
+
+
+def _number(value):
+    if isinstance(value, (int, float)):
+        return value
+    text = str(value).strip()
+    return int(text) if text.lstrip('-').isdigit() else float(text)
+
+
+def _date(value):
+    if isinstance(value, datetime.datetime):
+        return value
+    text = str(value).strip().replace('T', ' ')
+    for fmt in ('%Y-%m-%d %H:%M:%S', '%Y-%m-%d %H:%M', '%Y-%m-%d'):
+        try:
+            return datetime.datetime.strptime(text, fmt)
+        except ValueError:
+            continue
+    raise ValueError(f"Unrecognized date '{value}' (expected YYYY-MM-DD[ HH:MM[:SS]])")
+
+
+def _date_literal(value):
+    return f"TO_DATE('{value.strftime('%Y-%m-%d %H:%M:%S')}', 'YYYY-MM-DD HH24:MI:SS')"
+
+
+def _number_literal(value):
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+ROWID_RANGE = re.compile(r"ROWID BETWEEN '([A-Za-z0-9+/]{18})' AND '([A-Za-z0-9+/]{18})'", re.IGNORECASE)
+NUMERIC_RANGE = re.compile(r"([\w$#.\"]+) >= (-?[0-9.]+) AND \1 < (-?[0-9.]+)")
+NUMERIC_BETWEEN = re.compile(r"([\w$#.\"]+) BETWEEN (-?[0-9]+) AND (-?[0-9]+)", re.IGNORECASE)
+DATE_RANGE = re.compile(r"([\w$#.\"]+) >= TO_DATE\('([0-9: -]+)', 'YYYY-MM-DD HH24:MI:SS'\) "
+                        r"AND \1 < TO_DATE\('([0-9: -]+)', 'YYYY-MM-DD HH24:MI:SS'\)")
+
+# Largest block / row numbers a ROWID can hold, for ranges that end with the last block of a file
+ROWID_LAST_BLOCK = 2 ** 32 - 1
+ROWID_LAST_ROW = 2 ** 16 - 1
+
+
+def _split_rowid_range(lo, hi, ways):
+    lo_obj, lo_fno, lo_block, lo_row = rowid_parts(lo)
+    hi_obj, hi_fno, hi_block, hi_row = rowid_parts(hi)
+    if lo_obj != hi_obj:
+        return None
+
+    if hi_fno > lo_fno:
+        # Spans several files: split on whole files
+        files = [lo_fno] + _split_points(lo_fno, hi_fno + 1, ways)
+        files = [f for f in files if f <= hi_fno]
+        if len(files) < 2:
+            return None
+        bounds = []
+        for n, fno in enumerate(files):
+            start = lo if n == 0 else rowid_create(lo_obj, fno, 0, 0)
+            end = hi if n == len(files) - 1 else rowid_create(lo_obj, files[n + 1] - 1, ROWID_LAST_BLOCK, ROWID_LAST_ROW)
+            bounds.append((start, end))
+        return bounds
+
+    # One file: halve (or split `ways` times) the block range
+    blocks = [lo_block] + _split_points(lo_block, hi_block + 1, ways)
+    blocks = [b for b in blocks if b <= hi_block]
+    if len(blocks) < 2:
+        return None
+    bounds = []
+    for n, block in enumerate(blocks):
+        start = lo if n == 0 else rowid_create(lo_obj, lo_fno, block, 0)
+        end = hi if n == len(blocks) - 1 else rowid_create(lo_obj, lo_fno, blocks[n + 1] - 1, ROWID_MAX_ROW)
+        bounds.append((start, end))
+    return bounds
+
+
+def split_query(query, ways=2):
+    """
+    Splits the key range of one chunk query into `ways` sub-ranges, for re-running a slow chunk in parallel.
+
+    Understands the bounded ranges this planner (and oracle_rowsplit.sql) writes: ROWID BETWEEN, KEY >= a AND KEY < b
+    (numbers or TO_DATE) and KEY BETWEEN a AND b (integers). Open ended ranges and hash / mod buckets are not split.
+
+    Returns:
+        A list of queries covering the same rows, or None if the query cannot be split.
+    """
+    match = ROWID_RANGE.search(query)
+    if match:
+        bounds = _split_rowid_range(match.group(1), match.group(2), ways)
+        if not bounds:
+            return None
+        return [query[:match.start()] + f"ROWID BETWEEN '{lo}' AND '{hi}'" + query[match.end():] for lo, hi in bounds]
+
+    match = DATE_RANGE.search(query)
+    if match:
+        key, low, high = match.group(1), _date(match.group(2)), _date(match.group(3))
+        seconds = _split_points(0, int((high - low).total_seconds()), ways)
+        points = [low] + [low + datetime.timedelta(seconds=s) for s in seconds if low + datetime.timedelta(seconds=s) < high] + [high]
+        literal = _date_literal
+    else:
+        match = NUMERIC_RANGE.search(query)
+        if match:
+            key, low, high = match.group(1), _number(match.group(2)), _number(match.group(3))
+            points = [low] + [p for p in _split_points(low, high, ways) if p < high] + [high]
+            literal = _number_literal
+        else:
+            match = NUMERIC_BETWEEN.search(query)
+            if not match:
+                return None
+            # BETWEEN is inclusive on both ends
+            key, low, high = match.group(1), int(match.group(2)), int(match.group(3))
+            points = [low] + [p for p in _split_points(low, high + 1, ways) if p <= high] + [high + 1]
+            if len(points) < 3:
+                return None
+            return [query[:match.start()] + f"{key} BETWEEN {a} AND {b - 1}" + query[match.end():]
+                    for a, b in zip(points, points[1:])]
+
+    if len(points) < 3:
+        return None
+    return [query[:match.start()] + f"{key} >= {literal(a)} AND {key} < {literal(b)}" + query[match.end():]
+            for a, b in zip(points, points[1:])]
+
+
+def load_table_stats(path=None):
+    """
+    Reads per-table statistics (JSON or CSV, by file extension) into a dict keyed by upper case OWNER.TABLE.
+    """
+    path = path or config.PLANNER_STATS_PATH
+    if not path or not os.path.exists(path):
+        logging.warning(f"No planner statistics found at {path}; every table will be planned as one chunk")
+        return {}
+
+    if path.lower().endswith('.json'):
+        with open(path, 'r') as fin:
+            raw = json.load(fin)
+        entries = raw.items() if isinstance(raw, dict) else [(entry.get('table'), entry) for entry in raw]
+    else:
+        with open(path, 'r', newline='') as fin:
+            entries = []
+            for row in csv.DictReader(fin):
+                row = {name.strip().lower(): value.strip() for name, value in row.items() if name and value and value.strip()}
+                if row.get('boundaries'):
+                    row['boundaries'] = row['boundaries'].split(';')
+                entries.append((row.get('table'), row))
+
+    return {table.strip().upper(): entry for table, entry in entries if table}
+
+
+def load_extents(path=None):
+    """
+    Reads a CSV export of dba_extents into a dict of upper case OWNER.TABLE ->
+    {'extents': [(relative_fno, block_id, blocks), ...], 'data_object_id': int or None (if the export has that column)}.
+    """
+    path = path or config.PLANNER_EXTENTS_PATH
+    extents = {}
+    if not path or not os.path.exists(path):
+        return extents
+
+    with open(path, 'r', newline='') as fin:
+        for row in csv.DictReader(fin):
+            row = {name.strip().lower(): (value or '').strip() for name, value in row.items() if name}
+            table = (row['owner'] + '.' + row['segment_name']).upper()
+            tableExtents = extents.setdefault(table, {'extents': [], 'data_object_id': None})
+            tableExtents['extents'].append((int(row['relative_fno']), int(row['block_id']), int(row['blocks'])))
+            if row.get('data_object_id'):
+                tableExtents['data_object_id'] = int(row['data_object_id'])
+    return extents
+
+
+def chunk_count(stats):
+    """
+    Number of chunks for one table: its own 'chunks', else num_rows / PLANNER_ROWS_PER_CHUNK, else PLANNER_CHUNKS_PER_TABLE.
+    """
+    if stats.get('chunks'):
+        return max(1, int(stats['chunks']))
+    if config.PLANNER_ROWS_PER_CHUNK > 0 and stats.get('num_rows'):
+        return max(1, int(math.ceil(int(stats['num_rows']) / config.PLANNER_ROWS_PER_CHUNK)))
+    return max(1, config.PLANNER_CHUNKS_PER_TABLE)
+
+
+def plan_table(table, stats, extents=None):
+    """
+    Plans one table.
+
+    Returns:
+        A list of (query, est_rows, est_bytes), in the order they should be listed.
+    """
+    strategy = (stats.get('strategy') or config.PLANNER_DEFAULT_STRATEGY).lower()
+    if strategy not in STRATEGIES:
+        raise ValueError(f"{table}: unknown planner strategy '{strategy}'. Options: {', '.join(STRATEGIES)}")
+
+    chunks = chunk_count(stats)
+    select = f"SELECT * FROM {table}"
+    num_rows = int(stats['num_rows']) if stats.get('num_rows') else None
+    total_bytes = int(stats['bytes']) if stats.get('bytes') else None
+    key = stats.get('key')
+
+    if strategy == 'rowid':
+        exported = (extents or {}).get(table, {})
+        tableExtents = [tuple(int(v) for v in extent) for extent in stats.get('extents') or []] or exported.get('extents')
+        data_object_id = stats.get('data_object_id') or exported.get('data_object_id')
+        if not tableExtents or data_object_id is None:
+            logging.warning(f"{table}: no extents / data_object_id in the planner statistics; planning it as one chunk")
+            return [(select, num_rows, total_bytes)]
+
+        data_object_id = int(data_object_id)
+        ranges = rowid_ranges(tableExtents, chunks)
+        totalBlocks = sum(r[4] for r in ranges)
+        blockSize = int(stats.get('block_size') or config.PLANNER_BLOCK_SIZE)
+        planned = []
+        for lo_fno, lo_block, hi_fno, hi_block, sum_blocks in ranges:
+            share = sum_blocks / totalBlocks
+            planned.append((f"{select} WHERE ROWID BETWEEN '{rowid_create(data_object_id, lo_fno, lo_block, 0)}'"
+                            f" AND '{rowid_create(data_object_id, hi_fno, hi_block, ROWID_MAX_ROW)}'",
+                            int(num_rows * share) if num_rows is not None else None,
+                            int(total_bytes * share) if total_bytes is not None else sum_blocks * blockSize))
+        return planned
+
+    if not key:
+        logging.warning(f"{table}: strategy '{strategy}' needs a key column in the planner statistics; planning it as one chunk")
+        return [(select, num_rows, total_bytes)]
+
+    if strategy in ('hash', 'mod'):
+        # NVL keeps NULL keys (and a NULL hash) in bucket 0, so every row lands in exactly one bucket
+        if strategy == 'hash':
+            bucket = f"NVL(ORA_HASH({key}, {chunks - 1}), 0)"
+        else:
+            bucket = f"NVL(MOD(ABS({key}), {chunks}), 0)"
+        conditions = [f"{bucket} = {n}" for n in range(chunks)] if chunks > 1 else [None]
+    else:
+        parse, literal = (_number, _number_literal) if strategy == 'numeric' else (_date, _date_literal)
+        if stats.get('boundaries'):
+            points = sorted(set(parse(point) for point in stats['boundaries']))
+        elif stats.get('min') is not None and stats.get('max') is not None:
+            low, high = parse(stats['min']), parse(stats['max'])
+            if strategy == 'date':
+                seconds = _split_points(0, int((high - low).total_seconds()), chunks)
+                points = [low + datetime.timedelta(seconds=s) for s in seconds]
+            else:
+                points = _split_points(low, high, chunks)
+        else:
+            logging.warning(f"{table}: strategy '{strategy}' needs min / max or boundaries in the planner statistics; planning it as one chunk")
+            points = []
+        conditions = _range_conditions(key, points, literal)
+
+    count = len(conditions)
+    return [(select + (f" WHERE {condition}" if condition else ""),
+             int(num_rows / count) if num_rows is not None else None,
+             int(total_bytes / count) if total_bytes is not None else None) for condition in conditions]
+
+
+def target_table(table, stats):
+    if stats.get('target_table'):
+        return stats['target_table']
+    owner, name = table.split('.', 1) if '.' in table else ('', table)
+    return config.PLANNER_TARGET_TABLE_FORMAT.format(owner=owner, table=name)
+
+
+def plan_chunks(table_list=None, stats=None, extents=None):
+    """
+    Plans every table in table_list (default config.TABLE_LIST).
+
+    Returns:
+        A list of new QueryResult rows (no id / status yet), with roworder in plan order.
+    """
+    table_list = table_list if table_list is not None else config.TABLE_LIST
+    stats = stats if stats is not None else load_table_stats()
+    extents = extents if extents is not None else load_extents()
+
+    query_results = []
+    for table in table_list:
+        table = table.strip().upper()
+        tableStats = stats.get(table, {})
+        target = target_table(table, tableStats)
+        planned = plan_table(table, tableStats, extents)
+        logging.info(f"Planned {table}: {len(planned)} chunk(s) -> {target}")
+        for query, est_rows, est_bytes in planned:
+            query_results.append(QueryResult(roworder=len(query_results) + 1, query=query, targettbl=target,
+                                             est_rows=est_rows, est_bytes=est_bytes))
+    return query_results
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, format='%(levelname)s %(message)s')
+
+    # Print the plan in queryfile.txt format (query|target|est_rows|est_bytes|priority)
+    for qry in plan_chunks():
+        print(config.QUERY_FILE_DELIMITER.join([qry.query, qry.targettbl,
+                                                "" if qry.est_rows is None else str(qry.est_rows),
+                                                "" if qry.est_bytes is None else str(qry.est_bytes), ""]))
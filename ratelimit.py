@@ -0,0 +1,43 @@
+import threading
+import time
+
+
+class TokenBucket:
+    """
+    Simple token bucket used to pace deployments against Striim.
+
+    Tokens refill continuously at `rate_per_minute` up to `capacity`. A caller takes one token per deploy;
+    when the bucket is empty the caller should stop deploying for now and try again on a later tick.
+
+    Usage: bucket = TokenBucket(config.DEPLOY_RATE_PER_MINUTE, config.DEPLOY_BURST_MAX)
+           if bucket.try_acquire(): ...deploy...
+    """
+
+    def __init__(self, rate_per_minute, capacity):
+        self.rate_per_second = float(rate_per_minute) / 60.0
+        self.capacity = max(1, int(capacity))
+        self.tokens = float(self.capacity)
+        self.last_refill = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.last_refill) * self.rate_per_second)
+        self.last_refill = now
+
+    def try_acquire(self):
+        with self.lock:
+            self._refill()
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return True
+            return False
+
+    def seconds_until_available(self):
+        with self.lock:
+            self._refill()
+            if self.tokens >= 1:
+                return 0.0
+            if self.rate_per_second <= 0:
+                return float('inf')
+            return (1 - self.tokens) / self.rate_per_second
@@ -0,0 +1,188 @@
+"""
+Per-run reports, printed (and logged) at the end of every run. Run `python reporting.py [run_id]` for any run in the
+state store (default UNIQUE_RUN_ID).
+
+Phase timings: where orchestration time goes, from the <phase>_seconds columns of every chunk (see data.PHASES). For
+each phase: how many chunks have a timing, p50 / p90 / p99 / max, and the total, with its share of all timed seconds.
+load is Striim doing the actual work; everything else is orchestration overhead.
+
+Throughput: from the mon samples kept by throughput.py (config.THROUGHPUT_TRACKING). Per target table: chunks, rows
+(est_rows), median and best chunk rows per second, and rows per second over the wall clock time the table was loading.
+The same per chunk is written to THROUGHPUT_REPORT_PATH as CSV, to size chunks and concurrency for the next run.
+"""
+import csv
+import logging
+import statistics
+import sys
+
+import config
+from data import PHASES, read_data, read_throughput_samples
+from straggler import seconds_between
+
+PERCENTILES = [0.5, 0.9, 0.99]
+
+
+def percentile(values, fraction):
+    """
+    Nearest-rank percentile of values (fraction between 0 and 1), or None if there are none.
+    """
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, int(round(fraction * len(ordered) + 0.5)))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+def phase_summary(query_results):
+    """
+    Returns one dict per phase (in PHASES order): phase, count, p50, p90, p99, max, total and share (of all phases).
+    """
+    summary = []
+    for phase in PHASES:
+        values = [getattr(qry, phase + '_seconds') for qry in query_results if getattr(qry, phase + '_seconds') is not None]
+        entry = {'phase': phase, 'count': len(values), 'total': sum(values), 'max': max(values) if values else None}
+        for fraction in PERCENTILES:
+            entry['p' + str(int(fraction * 100))] = percentile(values, fraction)
+        summary.append(entry)
+
+    allSeconds = sum(entry['total'] for entry in summary)
+    for entry in summary:
+        entry['share'] = entry['total'] / allSeconds if allSeconds > 0 else None
+    return summary
+
+
+def format_summary(summary, title="Phase timings (seconds)"):
+    def cell(value, format_spec):
+        return format(value, format_spec) if value is not None else '-'
+
+    lines = [title,
+             f"{'phase':<10}{'chunks':>8}{'p50':>10}{'p90':>10}{'p99':>10}{'max':>10}{'total':>12}{'share':>8}"]
+    for entry in summary:
+        lines.append(f"{entry['phase']:<10}{entry['count']:>8}{cell(entry['p50'], '>10.2f')}{cell(entry['p90'], '>10.2f')}"
+                     f"{cell(entry['p99'], '>10.2f')}{cell(entry['max'], '>10.2f')}{cell(entry['total'], '>12.1f')}"
+                     f"{cell(entry['share'], '>8.1%')}")
+    return "\n".join(lines)
+
+
+CHUNK_THROUGHPUT_COLUMNS = ['id', 'targettbl', 'status', 'est_rows', 'load_seconds', 'samples', 'mean_rows_per_second',
+                            'peak_rows_per_second', 'mean_cpu_rate', 'estimated_rows_per_second']
+
+
+def chunk_throughput(query_results, samples):
+    """
+    Returns one dict (CHUNK_THROUGHPUT_COLUMNS) per chunk that has samples or a load time, in id order. Rows per second
+    are sourceRate (else rate) from mon; estimated_rows_per_second is est_rows over load_seconds.
+    """
+    byChunk = {}
+    for sample in samples:
+        byChunk.setdefault(sample['chunkid'], []).append(sample)
+
+    chunks = []
+    for qry in sorted(query_results, key=lambda qry: qry.id):
+        chunkSamples = byChunk.get(qry.id, [])
+        if not chunkSamples and qry.load_seconds is None:
+            continue
+        rates = [sample['source_rate'] if sample.get('source_rate') is not None else sample.get('rate') for sample in chunkSamples]
+        rates = [rate for rate in rates if rate is not None]
+        cpuRates = [sample['cpu_rate'] for sample in chunkSamples if sample.get('cpu_rate') is not None]
+        chunks.append({
+            'id': qry.id,
+            'targettbl': qry.targettbl,
+            'status': qry.status,
+            'est_rows': qry.est_rows,
+            'load_seconds': qry.load_seconds,
+            'samples': len(chunkSamples),
+            'mean_rows_per_second': statistics.mean(rates) if rates else None,
+            'peak_rows_per_second': max(rates) if rates else None,
+            'mean_cpu_rate': statistics.mean(cpuRates) if cpuRates else None,
+            'estimated_rows_per_second': qry.est_rows / qry.load_seconds if qry.est_rows and qry.load_seconds else None,
+        })
+    return chunks
+
+
+def table_throughput(query_results, chunks):
+    """
+    Returns one dict per target table of the completed chunks: chunks, rows (est_rows), median and peak chunk rows per
+    second (mon, else est_rows / load_seconds) and rows per second from the first start to the last finish of the table.
+    """
+    completed = {qry.id: qry for qry in query_results if qry.status == 'COMPLETED'}
+    tables = {}
+    for chunk in chunks:
+        qry = completed.get(chunk['id'])
+        if qry is None:
+            continue
+        entry = tables.setdefault(qry.targettbl, {'table': qry.targettbl, 'chunks': 0, 'rows': 0, 'rates': [],
+                                                  'first_start': None, 'last_finish': None})
+        entry['chunks'] = entry['chunks'] + 1
+        entry['rows'] = entry['rows'] + (qry.est_rows or 0)
+        rate = chunk['mean_rows_per_second'] if chunk['mean_rows_per_second'] is not None else chunk['estimated_rows_per_second']
+        if rate is not None:
+            entry['rates'].append(rate)
+        if qry.started_datetime and (entry['first_start'] is None or seconds_between(qry.started_datetime, entry['first_start']) > 0):
+            entry['first_start'] = qry.started_datetime
+        if qry.finished_datetime and (entry['last_finish'] is None or seconds_between(entry['last_finish'], qry.finished_datetime) > 0):
+            entry['last_finish'] = qry.finished_datetime
+
+    summary = []
+    for table in sorted(tables):
+        entry = tables[table]
+        span = seconds_between(entry['first_start'], entry['last_finish']) if entry['first_start'] and entry['last_finish'] else None
+        summary.append({'table': table, 'chunks': entry['chunks'], 'rows': entry['rows'],
+                        'median_chunk_rate': statistics.median(entry['rates']) if entry['rates'] else None,
+                        'peak_chunk_rate': max(entry['rates']) if entry['rates'] else None,
+                        'wall_clock_rate': entry['rows'] / span if entry['rows'] and span else None})
+    return summary
+
+
+def format_table_throughput(summary, title="Throughput per target table (rows/s)"):
+    def cell(value, format_spec):
+        return format(value, format_spec) if value is not None else '-'
+
+    width = max([len('table')] + [len(str(entry['table'])) for entry in summary]) + 2
+    lines = [title, f"{'table':<{width}}{'chunks':>8}{'rows':>14}{'median':>12}{'peak':>12}{'wall clock':>12}"]
+    for entry in summary:
+        lines.append(f"{str(entry['table']):<{width}}{entry['chunks']:>8}{entry['rows']:>14,}{cell(entry['median_chunk_rate'], '>12,.0f')}"
+                     f"{cell(entry['peak_chunk_rate'], '>12,.0f')}{cell(entry['wall_clock_rate'], '>12,.0f')}")
+    return "\n".join(lines)
+
+
+def write_chunk_throughput(path, chunks):
+    with open(path, 'w', newline='') as fout:
+        writer = csv.DictWriter(fout, fieldnames=CHUNK_THROUGHPUT_COLUMNS)
+        writer.writeheader()
+        writer.writerows(chunks)
+
+
+def report_run(uniquerunid=None, query_results=None, samples=None):
+    """
+    Prints and logs the phase summary and the throughput per target table of a run, and writes its per-chunk throughput
+    to THROUGHPUT_REPORT_PATH. Uses query_results / samples if given, else every row (including history rows, e.g.
+    chunks that were split) and throughput sample of the run in the state store.
+    """
+    uniquerunid = uniquerunid if uniquerunid is not None else config.UNIQUE_RUN_ID
+    if query_results is None:
+        query_results = read_data("uniquerunid = " + str(uniquerunid))
+
+    text = format_summary(phase_summary(query_results), f"Phase timings of run {uniquerunid} (seconds)")
+
+    if samples is None and config.THROUGHPUT_TRACKING:
+        try:
+            samples = read_throughput_samples(uniquerunid)
+        except Exception as e:
+            print(f"Could not read the throughput samples of run {uniquerunid}: {e}")
+    if samples is not None:
+        chunks = chunk_throughput(query_results, samples)
+        text += "\n\n" + format_table_throughput(table_throughput(query_results, chunks),
+                                                  f"Throughput of run {uniquerunid} per target table (rows/s)")
+        if config.THROUGHPUT_REPORT_PATH and chunks:
+            path = config.THROUGHPUT_REPORT_PATH.format(run=uniquerunid)
+            write_chunk_throughput(path, chunks)
+            text += f"\nThroughput per chunk written to {path}"
+
+    print(text)
+    logging.info(text)
+    return text
+
+
+if __name__ == '__main__':
+    report_run(int(sys.argv[1]) if len(sys.argv) > 1 else None)
@@ -0,0 +1,94 @@
+import re
+
+import config
+
+
+def source_table(qry):
+    """
+    Returns the source table a chunk reads from (first FROM in its query), falling back to its target table.
+    """
+    match = re.search(r'\bFROM\s+([\w.$#"]+)', qry.query or "", re.IGNORECASE)
+    if match:
+        return match.group(1).replace('"', '').upper()
+    return (qry.targettbl or "").strip().upper()
+
+
+def chunk_weight(qry):
+    """
+    Estimated size of a chunk: est_bytes if given, else est_rows, else None (unknown).
+    """
+    if qry.est_bytes is not None:
+        return qry.est_bytes
+    return qry.est_rows
+
+
+class ChunkScheduler:
+    """
+    Decides the order pending chunks are launched in. QueryResultIndex keeps its pending heap ordered by key(qry),
+    so the launch loops in both engines just take the smallest key.
+
+    Every scheduler runs higher `priority` chunks first (missing priority = 0); they differ in how chunks of equal
+    priority are ordered:
+    -> strict:      roworder (queryfile.txt order)
+    -> lpt:         longest processing time first, by est_bytes or est_rows (chunks without an estimate go last, in roworder)
+    -> round_robin: one chunk per source table in turn, so one large table does not hold every slot
+    """
+
+    def reset(self):
+        pass
+
+    def key(self, qry):
+        return (-(qry.priority or 0), qry.roworder)
+
+
+class LongestFirstScheduler(ChunkScheduler):
+
+    def key(self, qry):
+        weight = chunk_weight(qry)
+        return (-(qry.priority or 0), weight is None, -(weight or 0), qry.roworder)
+
+
+class TableRoundRobinScheduler(ChunkScheduler):
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.turns = {}    # source table -> number of its chunks queued so far
+        self.turn_of = {}  # row id -> its turn, kept when the row is queued again (QueryResultIndex.refresh)
+
+    def key(self, qry):
+        # The n-th queued chunk of each table gets turn n, so tables take turns in roworder within a turn
+        turn = self.turn_of.get(qry.id)
+        if turn is None:
+            table = source_table(qry)
+            turn = self.turn_of[qry.id] = self.turns.get(table, 0)
+            self.turns[table] = turn + 1
+        return (-(qry.priority or 0), turn, qry.roworder)
+
+
+SCHEDULERS = {
+    'strict': ChunkScheduler,
+    'lpt': LongestFirstScheduler,
+    'round_robin': TableRoundRobinScheduler,
+}
+
+
+def get_scheduler(name=None):
+    """
+    Returns a new scheduler for config.CHUNK_SCHEDULER (or name).
+    """
+    name = (name or config.CHUNK_SCHEDULER or 'strict').lower()
+    if name not in SCHEDULERS:
+        raise ValueError(f"Unknown CHUNK_SCHEDULER '{name}'. Options: {', '.join(SCHEDULERS)}")
+    return SCHEDULERS[name]()
+
+
+def schedule_order(query_results, scheduler=None):
+    """
+    Returns query_results sorted in the order the scheduler would launch them.
+    """
+    scheduler = scheduler or get_scheduler()
+    scheduler.reset()
+    keyed = [(scheduler.key(qry), position) for position, qry in enumerate(query_results)]
+    return [query_results[position] for key, position in sorted(keyed)]
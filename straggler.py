@@ -0,0 +1,92 @@
+import datetime
+import logging
+import statistics
+
+import config
+
+
+def seconds_between(start, end):
+    # Rows read back from BigQuery carry UTC timestamps, rows created here are naive local time
+    if start.tzinfo is not None and end.tzinfo is None:
+        end = end.astimezone(start.tzinfo)
+    elif start.tzinfo is None and end.tzinfo is not None:
+        start = start.astimezone(end.tzinfo)
+    return (end - start).total_seconds()
+
+
+class StragglerDetector:
+    """
+    Spots running chunks that will finish far later than their siblings, so they can be stopped and split.
+
+    Rows loaded so far and the current rate come from the throughput tracker (throughput.py), which integrates the
+    rates mon reports each tick. A chunk's predicted duration is elapsed + (est_rows - rows loaded) / current rate when
+    est_rows is known, else just its elapsed time. It is a straggler when that prediction is more than STRAGGLER_FACTOR times the
+    median duration of finished chunks of the same target table (or of all tables, until STRAGGLER_MIN_COMPLETED of
+    that table have finished), it has run at least STRAGGLER_MIN_RUNTIME_SECONDS, and it has been split fewer than
+    STRAGGLER_MAX_SPLIT_DEPTH times.
+
+    Usage: detector = StragglerDetector(tracker)
+           tracker.observe(rows, app)
+           if detector.is_straggler(qry): ...stop the app, split_query(), data.split_record()...
+           detector.completed(qry)
+    """
+
+    def __init__(self, tracker):
+        self.tracker = tracker  # throughput.ThroughputTracker fed with every mon
+        self.durations = {}     # target table -> finished chunk durations in seconds
+        self.depth = {}         # row id -> number of splits that led to this row
+
+    def completed(self, qry):
+        if qry.started_datetime and qry.finished_datetime:
+            seconds = seconds_between(qry.started_datetime, qry.finished_datetime)
+            self.durations.setdefault(qry.targettbl, []).append(seconds)
+
+    def median_duration(self, qry):
+        sameTable = self.durations.get(qry.targettbl, [])
+        if len(sameTable) >= config.STRAGGLER_MIN_COMPLETED:
+            return statistics.median(sameTable)
+        allTables = [seconds for durations in self.durations.values() for seconds in durations]
+        if len(allTables) >= config.STRAGGLER_MIN_COMPLETED:
+            return statistics.median(allTables)
+        return None
+
+    def predicted_duration(self, qry, now=None):
+        now = now or datetime.datetime.now()
+        elapsed = seconds_between(qry.started_datetime, now)
+        rate = self.tracker.current_rate(qry.id)
+        if qry.est_rows and rate is not None and rate > 0:
+            return elapsed + max(0.0, qry.est_rows - self.tracker.loaded.get(qry.id, 0.0)) / rate
+        return elapsed
+
+    def is_straggler(self, qry, now=None):
+        if qry.started_datetime is None or self.depth.get(qry.id, 0) >= config.STRAGGLER_MAX_SPLIT_DEPTH:
+            return False
+
+        now = now or datetime.datetime.now()
+        elapsed = seconds_between(qry.started_datetime, now)
+        median = self.median_duration(qry)
+        if median is None or elapsed < config.STRAGGLER_MIN_RUNTIME_SECONDS:
+            return False
+
+        predicted = self.predicted_duration(qry, now)
+        if predicted <= config.STRAGGLER_FACTOR * median:
+            return False
+
+        message = f"Straggler: id {qry.id} ({qry.appname}) predicted {predicted:.0f}s vs median {median:.0f}s of finished chunks"
+        print(message)
+        logging.info(message)
+        return True
+
+    def split(self, qry, new_rows):
+        """
+        Records that new_rows replaced qry, so their own split depth is known.
+        """
+        depth = self.depth.pop(qry.id, 0) + 1
+        for row in new_rows:
+            self.depth[row.id] = depth
+
+    def skip(self, qry):
+        """
+        Stops reporting a straggler whose range cannot be split.
+        """
+        self.depth[qry.id] = config.STRAGGLER_MAX_SPLIT_DEPTH
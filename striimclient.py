@@ -0,0 +1,108 @@
+import json
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+import config
+import metrics
+
+
+class StriimAuthenticationError(Exception):
+    pass
+
+
+class StriimClient:
+    """
+    Shared client for the Striim REST API.
+
+    A single requests.Session is reused for every call, so connections (and TLS sessions when using https)
+    are pooled and kept alive instead of being opened per tungsten command. The token is fetched lazily on
+    the first call and refreshed when Striim answers with a 'tkn' reason, up to tkn_max_retries times per call.
+
+    Usage: client = StriimClient(config.STRIIM_URL_PREFIX, config.STRIIM_NODE, user, pwd, config.STRIIM_API_TOKEN)
+           result = client.tungsten('mon;')
+    """
+
+    def __init__(self, url_prefix, node, username, password, api_token="",
+                 pool_size=None, connect_timeout=None, read_timeout=None, tkn_max_retries=None):
+        self.base_url = url_prefix + node
+        self.username = username
+        self.password = password
+        self.api_token = api_token
+        self.connect_timeout = connect_timeout if connect_timeout is not None else config.STRIIM_CONNECT_TIMEOUT_SECONDS
+        self.read_timeout = read_timeout if read_timeout is not None else config.STRIIM_READ_TIMEOUT_SECONDS
+        self.tkn_max_retries = tkn_max_retries if tkn_max_retries is not None else config.STRIIM_TKN_MAX_RETRIES
+
+        pool_size = pool_size if pool_size is not None else config.STRIIM_HTTP_POOL_SIZE
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, pool_block=True)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+        self.token = None
+        self.token_lock = threading.Lock()
+
+    def authenticate(self, stale_token=None):
+        """
+        Fetches a new token. When stale_token is given and another thread already replaced it, the
+        newer token is kept instead of authenticating again.
+        """
+        with self.token_lock:
+            if self.token is not None and stale_token is not None and self.token != stale_token:
+                return self.token
+
+            if self.api_token != "":
+                self.token = self.api_token
+            else:
+                start = time.monotonic()
+                try:
+                    resp = self.session.post(self.base_url + '/security/authenticate',
+                                             data={'username': self.username, 'password': self.password},
+                                             timeout=(self.connect_timeout, self.read_timeout))
+                finally:
+                    metrics.REQUEST_SECONDS.observe(time.monotonic() - start, verb='AUTHENTICATE')
+                try:
+                    self.token = json.loads(resp.text)['token']
+                except (ValueError, KeyError, TypeError):
+                    raise StriimAuthenticationError('Unable to authenticate to ' + self.base_url + ': ' + resp.text)
+            return self.token
+
+    def headers(self, token):
+        return {'authorization': 'STRIIM-TOKEN ' + token, 'content-type': 'text/plain'}
+
+    def tungsten(self, data, timeout=None):
+        """
+        Posts a TQL command (or script) to /api/v2/tungsten and returns the parsed JSON response.
+
+        Args:
+            data (str): Command text, for example 'mon;'.
+            timeout (float): Read timeout in seconds for this call. Defaults to STRIIM_READ_TIMEOUT_SECONDS.
+        """
+        read_timeout = timeout if timeout is not None else self.read_timeout
+
+        for attempt in range(self.tkn_max_retries + 1):
+            token = self.token if self.token is not None else self.authenticate()
+
+            start = time.monotonic()
+            try:
+                resp = self.session.post(self.base_url + '/api/v2/tungsten', headers=self.headers(token), data=data,
+                                         timeout=(self.connect_timeout, read_timeout))
+            finally:
+                metrics.observe_request(data, time.monotonic() - start)
+            # If passphrase is needed:
+            # resp = self.session.post(self.base_url + '/api/v2/tungsten?passphrase=1234', ...)
+
+            if 'reason' in resp.text and 'tkn' in resp.text:
+                # Token expired or was rejected; authenticate again (once across threads) and retry
+                time.sleep(1)
+                self.authenticate(stale_token=token)
+                continue
+
+            return json.loads(resp.text)
+
+        raise StriimAuthenticationError(f"Token rejected after {self.tkn_max_retries + 1} attempts")
+
+    def close(self):
+        self.session.close()
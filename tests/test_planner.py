@@ -0,0 +1,220 @@
+"""
+Tests of the chunk range math in planner.py: which rows each planned (or split) chunk loads. A gap or an overlap
+between two chunks silently drops or duplicates rows, so every plan and split is checked for contiguity and coverage.
+
+Run from the repository root: python -m pytest tests (or python -m unittest discover tests)
+"""
+import datetime
+import re
+import unittest
+
+from planner import (ROWID_LAST_BLOCK, ROWID_LAST_ROW, ROWID_MAX_ROW, plan_table, rowid_create, rowid_parts,
+                     rowid_ranges, split_query)
+
+
+def parse_literal(text):
+    match = re.fullmatch(r"TO_DATE\('([0-9: -]+)', 'YYYY-MM-DD HH24:MI:SS'\)", text)
+    if match:
+        return datetime.datetime.strptime(match.group(1), '%Y-%m-%d %H:%M:%S')
+    return float(text) if '.' in text else int(text)
+
+
+def matches(condition, value):
+    """
+    Evaluates one range condition written by the planner for a key value (None = NULL); no condition matches everything.
+    """
+    if condition is None:
+        return True
+    match = re.fullmatch(r"\((\w+) < (.+) OR \1 IS NULL\)", condition)
+    if match:
+        return value is None or value < parse_literal(match.group(2))
+    match = re.fullmatch(r"(\w+) >= (.+) AND \1 < (.+)", condition)
+    if match:
+        return value is not None and parse_literal(match.group(2)) <= value < parse_literal(match.group(3))
+    match = re.fullmatch(r"(\w+) >= (.+)", condition)
+    if match:
+        return value is not None and value >= parse_literal(match.group(2))
+    match = re.fullmatch(r"(\w+) BETWEEN (-?\d+) AND (-?\d+)", condition)
+    if match:
+        return value is not None and int(match.group(2)) <= value <= int(match.group(3))
+    raise AssertionError(f"Unexpected condition: {condition}")
+
+
+def where(query):
+    return query.split(' WHERE ', 1)[1] if ' WHERE ' in query else None
+
+
+class RowidTest(unittest.TestCase):
+    def test_known_rowid_round_trip(self):
+        self.assertEqual(rowid_parts('AAAR3sAAEAAAACXAAA'), (73196, 4, 151, 0))
+        self.assertEqual(rowid_create(73196, 4, 151, 0), 'AAAR3sAAEAAAACXAAA')
+
+    def test_round_trip_limits(self):
+        for parts in [(0, 0, 0, 0), (1, 1, 1, 1), (2 ** 32 - 1, 1023, ROWID_LAST_BLOCK, ROWID_LAST_ROW)]:
+            self.assertEqual(rowid_parts(rowid_create(*parts)), parts)
+
+    def test_grouping_matches_oracle_rowsplit(self):
+        # 64 blocks in 3 chunks: running sums 8, 16, 24, 32, 48, 64 -> trunc((sum - 0.01) / (64 / 3)) = 0, 0, 1, 1, 2, 2
+        extents = [(5, 256, 16), (4, 128, 8), (4, 136, 8), (4, 144, 8), (4, 152, 8), (5, 128, 16)]
+        self.assertEqual(rowid_ranges(extents, 3), [
+            (4, 128, 4, 143, 16),
+            (4, 144, 4, 159, 16),
+            (5, 128, 5, 271, 32),
+        ])
+
+    def test_grouping_more_chunks_than_extents(self):
+        ranges = rowid_ranges([(4, 128, 8), (4, 136, 8)], 10)
+        self.assertEqual(ranges, [(4, 128, 4, 135, 8), (4, 136, 4, 143, 8)])
+
+    def test_plan_table_rowid_queries(self):
+        stats = {'strategy': 'rowid', 'data_object_id': 73196, 'chunks': 2, 'num_rows': 1000,
+                 'extents': [[4, 128, 8], [4, 136, 8]]}
+        planned = plan_table('QATEST.WF_PENDING_ACTIVITY', stats)
+        self.assertEqual([query for query, est_rows, est_bytes in planned], [
+            "SELECT * FROM QATEST.WF_PENDING_ACTIVITY WHERE ROWID BETWEEN '%s' AND '%s'"
+            % (rowid_create(73196, 4, 128, 0), rowid_create(73196, 4, 135, ROWID_MAX_ROW)),
+            "SELECT * FROM QATEST.WF_PENDING_ACTIVITY WHERE ROWID BETWEEN '%s' AND '%s'"
+            % (rowid_create(73196, 4, 136, 0), rowid_create(73196, 4, 143, ROWID_MAX_ROW)),
+        ])
+        self.assertEqual([est_rows for query, est_rows, est_bytes in planned], [500, 500])
+
+
+class PlanTableTest(unittest.TestCase):
+    def assertCovers(self, planned, values):
+        """
+        Every value must be loaded by exactly one planned chunk.
+        """
+        conditions = [where(query) for query, est_rows, est_bytes in planned]
+        for value in values:
+            hits = [condition for condition in conditions if matches(condition, value)]
+            self.assertEqual(len(hits), 1, f"{value!r} matches {hits}")
+
+    def test_numeric(self):
+        planned = plan_table('QATEST.ORDERS', {'strategy': 'numeric', 'key': 'ORDER_ID', 'min': 1, 'max': 1000, 'chunks': 4})
+        self.assertEqual(len(planned), 4)
+        self.assertCovers(planned, [None] + list(range(-10, 1010)))
+
+    def test_numeric_low_plus_one_is_high(self):
+        planned = plan_table('QATEST.ORDERS', {'strategy': 'numeric', 'key': 'ORDER_ID', 'min': 5, 'max': 6, 'chunks': 2})
+        self.assertEqual(len(planned), 2)
+        self.assertCovers(planned, [None] + list(range(0, 10)))
+
+    def test_numeric_more_chunks_than_values(self):
+        planned = plan_table('QATEST.ORDERS', {'strategy': 'numeric', 'key': 'ORDER_ID', 'min': 0, 'max': 3, 'chunks': 10})
+        self.assertCovers(planned, [None] + list(range(-5, 10)))
+
+    def test_numeric_boundaries(self):
+        planned = plan_table('QATEST.ORDERS', {'strategy': 'numeric', 'key': 'ORDER_ID', 'boundaries': ['100', '50', '900']})
+        self.assertEqual(len(planned), 4)
+        self.assertCovers(planned, [None] + list(range(0, 1000)))
+
+    def test_date(self):
+        planned = plan_table('QATEST.EVENTS', {'strategy': 'date', 'key': 'CREATED', 'min': '2020-01-01',
+                                               'max': '2020-12-31', 'chunks': 6})
+        self.assertEqual(len(planned), 6)
+        start = datetime.datetime(2019, 12, 1)
+        self.assertCovers(planned, [None] + [start + datetime.timedelta(hours=13 * n) for n in range(800)])
+
+    def test_single_value_range_is_one_chunk(self):
+        planned = plan_table('QATEST.ORDERS', {'strategy': 'numeric', 'key': 'ORDER_ID', 'min': 5, 'max': 5, 'chunks': 4})
+        self.assertEqual([query for query, est_rows, est_bytes in planned], ["SELECT * FROM QATEST.ORDERS"])
+
+    def test_hash_buckets(self):
+        planned = plan_table('QATEST.NOTES', {'strategy': 'hash', 'key': 'NOTE_ID', 'chunks': 3, 'num_rows': 30})
+        self.assertEqual([query for query, est_rows, est_bytes in planned],
+                         ["SELECT * FROM QATEST.NOTES WHERE NVL(ORA_HASH(NOTE_ID, 2), 0) = %d" % n for n in range(3)])
+        self.assertEqual([est_rows for query, est_rows, est_bytes in planned], [10, 10, 10])
+
+
+class SplitQueryTest(unittest.TestCase):
+    def assertSplitCovers(self, query, ways, values):
+        """
+        The sub-chunks must load exactly the rows of the original chunk, each of them once.
+        """
+        queries = split_query(query, ways)
+        self.assertIsNotNone(queries)
+        for value in values:
+            hits = [subQuery for subQuery in queries if matches(where(subQuery), value)]
+            self.assertEqual(len(hits), 1 if matches(where(query), value) else 0, f"{value!r} matches {hits}")
+        return queries
+
+    def assertRowidSplitContiguous(self, lo, hi, ways):
+        queries = split_query(f"SELECT * FROM T WHERE ROWID BETWEEN '{lo}' AND '{hi}'", ways)
+        self.assertIsNotNone(queries)
+        bounds = [re.search(r"BETWEEN '(\S+)' AND '(\S+)'", query).groups() for query in queries]
+        self.assertEqual(bounds[0][0], lo)
+        self.assertEqual(bounds[-1][1], hi)
+        for (_, end), (start, _) in zip(bounds, bounds[1:]):
+            end_obj, end_fno, end_block, end_row = rowid_parts(end)
+            start_obj, start_fno, start_block, start_row = rowid_parts(start)
+            self.assertEqual(start_row, 0)
+            if start_fno == end_fno:
+                # Same file: the next range starts on the block after the last one of the previous range
+                self.assertEqual((start_block, end_row), (end_block + 1, ROWID_MAX_ROW))
+            else:
+                # Next file: the previous range runs to the end of its file
+                self.assertEqual(start_fno, end_fno + 1)
+                self.assertEqual((start_block, end_block, end_row), (0, ROWID_LAST_BLOCK, ROWID_LAST_ROW))
+        return queries
+
+    def test_rowid_one_file(self):
+        queries = self.assertRowidSplitContiguous(rowid_create(73196, 4, 128, 0), rowid_create(73196, 4, 143, ROWID_MAX_ROW), 2)
+        self.assertEqual(len(queries), 2)
+
+    def test_rowid_several_files(self):
+        queries = self.assertRowidSplitContiguous(rowid_create(73196, 4, 128, 0), rowid_create(73196, 7, 50, ROWID_MAX_ROW), 2)
+        self.assertEqual(len(queries), 2)
+
+    def test_rowid_more_ways_than_blocks(self):
+        queries = self.assertRowidSplitContiguous(rowid_create(73196, 4, 128, 0), rowid_create(73196, 4, 129, ROWID_MAX_ROW), 5)
+        self.assertEqual(len(queries), 2)
+
+    def test_rowid_single_block(self):
+        self.assertIsNone(split_query(f"SELECT * FROM T WHERE ROWID BETWEEN '{rowid_create(73196, 4, 128, 0)}'"
+                                      f" AND '{rowid_create(73196, 4, 128, ROWID_MAX_ROW)}'"))
+
+    def test_numeric(self):
+        queries = self.assertSplitCovers("SELECT * FROM T WHERE ID >= 0 AND ID < 1000", 3, range(-5, 1005))
+        self.assertEqual(len(queries), 3)
+
+    def test_numeric_low_plus_one_is_high(self):
+        self.assertIsNone(split_query("SELECT * FROM T WHERE ID >= 5 AND ID < 6", 2))
+
+    def test_numeric_more_ways_than_values(self):
+        queries = self.assertSplitCovers("SELECT * FROM T WHERE ID >= 5 AND ID < 7", 5, range(0, 10))
+        self.assertEqual(len(queries), 2)
+
+    def test_between(self):
+        queries = self.assertSplitCovers("SELECT * FROM T WHERE ID BETWEEN 2001 AND 3000", 4, range(1990, 3010))
+        self.assertEqual(len(queries), 4)
+
+    def test_between_low_plus_one_is_high(self):
+        queries = self.assertSplitCovers("SELECT * FROM T WHERE ID BETWEEN 5 AND 6", 2, range(0, 10))
+        self.assertEqual(queries, ["SELECT * FROM T WHERE ID BETWEEN 5 AND 5", "SELECT * FROM T WHERE ID BETWEEN 6 AND 6"])
+
+    def test_between_more_ways_than_values(self):
+        queries = self.assertSplitCovers("SELECT * FROM T WHERE ID BETWEEN 5 AND 7", 10, range(0, 10))
+        self.assertEqual(len(queries), 3)
+
+    def test_between_single_value(self):
+        self.assertIsNone(split_query("SELECT * FROM T WHERE ID BETWEEN 5 AND 5", 2))
+
+    def test_date(self):
+        query = ("SELECT * FROM T WHERE CREATED >= TO_DATE('2024-01-01 00:00:00', 'YYYY-MM-DD HH24:MI:SS')"
+                 " AND CREATED < TO_DATE('2024-01-02 00:00:00', 'YYYY-MM-DD HH24:MI:SS')")
+        start = datetime.datetime(2023, 12, 31, 23, 0)
+        queries = self.assertSplitCovers(query, 3, [start + datetime.timedelta(minutes=7 * n) for n in range(300)])
+        self.assertEqual(len(queries), 3)
+
+    def test_date_one_second(self):
+        query = ("SELECT * FROM T WHERE CREATED >= TO_DATE('2024-01-01 00:00:00', 'YYYY-MM-DD HH24:MI:SS')"
+                 " AND CREATED < TO_DATE('2024-01-01 00:00:01', 'YYYY-MM-DD HH24:MI:SS')")
+        self.assertIsNone(split_query(query, 2))
+
+    def test_open_ended_and_bucket_chunks_are_not_split(self):
+        self.assertIsNone(split_query("SELECT * FROM T WHERE ID >= 3000", 2))
+        self.assertIsNone(split_query("SELECT * FROM T WHERE NVL(ORA_HASH(ID, 7), 0) = 3", 2))
+
+
+if __name__ == '__main__':
+    unittest.main()
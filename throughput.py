@@ -0,0 +1,161 @@
+"""
+Throughput history of running chunks, from the rate / sourceRate / cpuRate / latestActivity that mon reports for
+every ILA app (config.THROUGHPUT_TRACKING).
+
+Each mon, observe() adds one sample per running chunk to a ring buffer of its last THROUGHPUT_SAMPLES_PER_CHUNK
+samples, integrates its rows per second (sourceRate, else rate) into an estimate of rows loaded so far, and queues the
+sample to be appended to the state store (data.append_throughput_samples) in batches of THROUGHPUT_FLUSH_ROWS, or
+every THROUGHPUT_FLUSH_INTERVAL_SECONDS. The rows of a packed app share its rates evenly. The rows loaded estimate and
+current rate are also what the straggler detector (straggler.py) predicts durations from, so the engines feed the tracker
+when either THROUGHPUT_TRACKING or STRAGGLER_SPLIT is on; samples are only kept in the state store with THROUGHPUT_TRACKING.
+
+progress() prints the run's current rows per second per target table and an ETA every THROUGHPUT_STATUS_INTERVAL_SECONDS:
+the est_rows not loaded yet over the current rows per second when every unfinished chunk has est_rows, else the
+unfinished chunks over the rate chunks have finished at so far. The samples kept in the state store feed the
+throughput report at the end of the run (reporting.py).
+
+Usage: tracker = ThroughputTracker()
+       tracker.observe(rows, app)       # each mon, for the RUNNING rows of an app
+       tracker.completed(qry)           # when a row is done (or split)
+       tracker.flush()                  # each tick; flush(True) at the end of the run
+       tracker.progress(query_results)  # each tick
+"""
+import collections
+import datetime
+import logging
+import time
+
+import config
+import metrics
+from data import DATETIME_FORMAT, append_throughput_samples
+from monitor import parse_percent, parse_rate
+from straggler import seconds_between
+
+Sample = collections.namedtuple('Sample', ['sampled', 'rate', 'source_rate', 'cpu_rate', 'latest_activity', 'rows_per_second'])
+
+
+class ThroughputTracker:
+    def __init__(self):
+        self.samples = {}     # row id -> deque of the row's last Samples
+        self.loaded = {}      # row id -> rows loaded so far (integrated rows per second)
+        self.tables = {}      # row id -> target table, for rows with samples
+        self.unsaved = []     # samples not yet appended to the state store
+        self.last_flush = time.monotonic()
+        self.last_progress = None
+        self.started = time.monotonic()
+        self.completions = 0  # rows completed since this tracker started, for the ETA without est_rows
+
+    def observe(self, rows, app, now=None):
+        """
+        Records one sample of app (from mon) for each of its running rows.
+        """
+        now = now or datetime.datetime.now()
+        share = 1.0 / len(rows)
+        rate = parse_rate(app.rate)
+        sourceRate = parse_rate(app.source_rate)
+        cpuRate = parse_percent(app.cpu_rate)
+        latestActivity = str(app.latest_activity) if app.latest_activity is not None else None
+
+        for qry in rows:
+            sample = Sample(now, rate * share if rate is not None else None,
+                            sourceRate * share if sourceRate is not None else None, cpuRate, latestActivity, None)
+            sample = sample._replace(rows_per_second=sample.source_rate if sample.source_rate is not None else sample.rate)
+
+            ring = self.samples.get(qry.id)
+            if ring is None:
+                ring = self.samples[qry.id] = collections.deque(maxlen=config.THROUGHPUT_SAMPLES_PER_CHUNK)
+                self.tables[qry.id] = qry.targettbl
+
+            # Trapezoid between the two samples; the first one counts from the start of the chunk at its own rate
+            if sample.rows_per_second is not None:
+                last = ring[-1] if ring else None
+                lastTime = last.sampled if last else (qry.started_datetime or now)
+                lastRate = last.rows_per_second if last and last.rows_per_second is not None else sample.rows_per_second
+                seconds = max(0.0, seconds_between(lastTime, now))
+                self.loaded[qry.id] = self.loaded.get(qry.id, 0.0) + seconds * (sample.rows_per_second + lastRate) / 2.0
+            ring.append(sample)
+
+            if config.THROUGHPUT_TRACKING:
+                self.unsaved.append({'uniquerunid': qry.uniquerunid, 'chunkid': qry.id, 'sampled': now.strftime(DATETIME_FORMAT),
+                                     'rate': sample.rate, 'source_rate': sample.source_rate, 'cpu_rate': cpuRate,
+                                     'latest_activity': latestActivity})
+
+    def completed(self, qry):
+        self.samples.pop(qry.id, None)
+        self.loaded.pop(qry.id, None)
+        self.tables.pop(qry.id, None)
+        if qry.status == 'COMPLETED':
+            self.completions = self.completions + 1
+
+    def current_rate(self, record_id):
+        ring = self.samples.get(record_id)
+        return ring[-1].rows_per_second if ring and ring[-1].rows_per_second is not None else None
+
+    def table_rates(self):
+        """
+        Returns the current rows per second of every target table with running chunks.
+        """
+        rates = {}
+        for record_id, table in self.tables.items():
+            rate = self.current_rate(record_id)
+            if rate is not None:
+                rates[table] = rates.get(table, 0.0) + rate
+        return rates
+
+    def eta_seconds(self, query_results):
+        """
+        Returns the estimated seconds until every row of query_results is done, or None when there is nothing to go on.
+        """
+        unfinished = [qry for qry in query_results if qry.status not in config.DONE_STATUSES]
+        if not unfinished:
+            return 0.0
+
+        rate = sum(self.table_rates().values())
+        if rate > 0 and all(qry.est_rows is not None for qry in unfinished):
+            remaining = sum(max(0.0, qry.est_rows - self.loaded.get(qry.id, 0.0)) for qry in unfinished)
+            return remaining / rate
+
+        elapsed = time.monotonic() - self.started
+        if self.completions > 0 and elapsed > 0:
+            return len(unfinished) / (self.completions / elapsed)
+        return None
+
+    def progress(self, query_results, force=False):
+        """
+        Prints and logs the run's rows per second per target table and its ETA, at most every THROUGHPUT_STATUS_INTERVAL_SECONDS.
+        """
+        if not force and self.last_progress is not None and \
+                time.monotonic() - self.last_progress < config.THROUGHPUT_STATUS_INTERVAL_SECONDS:
+            return
+        self.last_progress = time.monotonic()
+
+        rates = self.table_rates()
+        eta = self.eta_seconds(query_results)
+        metrics.observe_throughput(rates, eta)
+
+        etaText = str(datetime.timedelta(seconds=int(eta))) if eta is not None else "unknown"
+        message = f"Throughput: {sum(rates.values()):,.0f} rows/s across {len(self.samples)} running chunks; ETA {etaText}"
+        if rates:
+            message += " (" + ", ".join(f"{table}: {rate:,.0f} rows/s" for table, rate in sorted(rates.items())) + ")"
+        print(message)
+        logging.info(message)
+
+    def flush(self, force=False):
+        """
+        Appends the buffered samples to the state store once THROUGHPUT_FLUSH_ROWS or THROUGHPUT_FLUSH_INTERVAL_SECONDS
+        is reached (always with force). Samples that cannot be written are dropped: they are history, not run state.
+        """
+        if not self.unsaved:
+            return
+        if not force and len(self.unsaved) < config.THROUGHPUT_FLUSH_ROWS and \
+                time.monotonic() - self.last_flush < config.THROUGHPUT_FLUSH_INTERVAL_SECONDS:
+            return
+
+        batch, self.unsaved = self.unsaved, []
+        self.last_flush = time.monotonic()
+        try:
+            append_throughput_samples(batch)
+        except Exception as e:
+            message = f"Could not save {len(batch)} throughput samples: {e}"
+            print(message)
+            logging.warning(message)
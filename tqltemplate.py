@@ -0,0 +1,89 @@
+import os
+import re
+
+import config
+from packing import pack_template
+
+PLACEHOLDER = re.compile(r'~([A-Z0-9_]+)~')
+
+# Filled in for every chunk; anything else must come from config.TQL_TEMPLATE_VALUES
+CHUNK_PLACEHOLDERS = ['QUERYTEXT', 'TARGETTABLE', 'NAMESPACE']
+
+
+class TQLTemplate:
+    """
+    The TQL template (SOURCE_TQL_FILE), read and checked once and kept split into literal segments and
+    ~PLACEHOLDER~ names, so rendering a chunk's application is a single join in memory.
+
+    Usage: template = get_template()
+           tql = template.render(QUERYTEXT=qry.query, TARGETTABLE=qry.targettbl, NAMESPACE=namespace)
+    """
+
+    def __init__(self, text, name="template", extra_values=None):
+        self.text = text
+        self.name = name
+        self.extra_values = dict(extra_values if extra_values is not None else config.TQL_TEMPLATE_VALUES)
+
+        # re.split with one group alternates literal text and placeholder names: [text, name, text, name, ..., text]
+        parts = PLACEHOLDER.split(text)
+        self.literals = parts[0::2]
+        self.placeholders = parts[1::2]
+
+        if 'QUERYTEXT' not in self.placeholders:
+            raise ValueError(f"TQL template {name} has no ~QUERYTEXT~ placeholder")
+
+        unknown = sorted(set(self.placeholders) - set(CHUNK_PLACEHOLDERS) - set(self.extra_values))
+        if unknown:
+            raise ValueError(f"TQL template {name} uses placeholders with no value: " +
+                             ", ".join('~' + placeholder + '~' for placeholder in unknown) +
+                             " (add them to TQL_TEMPLATE_VALUES)")
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "rt") as fin:
+            return cls(fin.read(), os.path.basename(path))
+
+    def render(self, **values):
+        values = {**self.extra_values, **values}
+        segments = [self.literals[0]]
+        for placeholder, literal in zip(self.placeholders, self.literals[1:]):
+            segments.append(str(values[placeholder]))
+            segments.append(literal)
+        return ''.join(segments)
+
+    def render_app(self, namespace, chunks):
+        """
+        Renders the application for (query text, target table) chunks: the template itself for one chunk, or one
+        copy of its flow per chunk (packing.pack_template) for a packed app.
+        """
+        if len(chunks) == 1:
+            return self.render(QUERYTEXT=chunks[0][0], TARGETTABLE=chunks[0][1], NAMESPACE=namespace)
+        return pack_template(self.render(QUERYTEXT='~QUERYTEXT~', TARGETTABLE='~TARGETTABLE~', NAMESPACE=namespace), chunks)
+
+
+_templates = {}
+
+
+def get_template(path=None):
+    """
+    Returns the compiled template for path (default SOURCE_TQL_PATH / SOURCE_TQL_FILE), loading it on first use.
+    """
+    path = path or os.path.join(config.SOURCE_TQL_PATH, config.SOURCE_TQL_FILE)
+    if path not in _templates:
+        _templates[path] = TQLTemplate.load(path)
+    return _templates[path]
+
+
+def audit_tql(namespace, tql):
+    """
+    Writes a rendered application to TARGET_TQL_PATH (stage/) when TQL_AUDIT is on, for debugging.
+    The file name only depends on the namespace, so a reused namespace overwrites its previous file.
+    """
+    if not config.TQL_AUDIT:
+        return None
+
+    os.makedirs(config.TARGET_TQL_PATH, exist_ok=True)
+    fullTargetPath = os.path.join(config.TARGET_TQL_PATH, namespace + '_' + config.SOURCE_TQL_FILE)
+    with open(fullTargetPath, "wt") as fout:
+        fout.write(tql)
+    return fullTargetPath